@@ -0,0 +1,57 @@
+"""Benchmark article ids de-duplication, to check it stays linear with the number of ids.
+
+Run with `uv run python -m benchmarks.bench_deduplication`.
+"""
+
+import time
+
+from loguru import logger
+
+from src.eutils_retrieval.search import ArticleIds
+from src.packed_article_ids import merge_packed_article_ids, pack_article_ids
+
+NB_IDS = (10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def create_article_ids(nb_ids: int) -> list[ArticleIds]:
+    """Create ids as found across both databases, with a large overlap.
+
+    Half of the articles are complete, a quarter are partial duplicates of complete ones found in
+    the other database, and a quarter are partial ones only found in one database.
+    """
+    nb_articles = nb_ids // 4
+    ids = [
+        *((f"PMC{i}", str(i)) for i in range(1, 2 * nb_articles)),
+        *((f"PMC{i}", None) for i in range(2, nb_articles, 2)),
+        *((None, str(i)) for i in range(1, nb_articles, 2)),
+        *((f"PMC{i}", None) for i in range(2 * nb_articles, 3 * nb_articles, 2)),
+        *((None, str(i)) for i in range(2 * nb_articles + 1, 3 * nb_articles, 2)),
+    ]
+    return [ArticleIds(pmcid=pmcid, pmid=pmid) for pmcid, pmid in ids]
+
+
+def main() -> None:
+    """Log packing and de-duplication time for each number of ids, and time per id."""
+    for nb_ids in NB_IDS:
+        article_ids = create_article_ids(nb_ids)
+
+        start = time.perf_counter()
+        packed_article_ids = pack_article_ids(article_ids)
+        packing_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        merged_article_ids = merge_packed_article_ids(packed_article_ids)
+        merge_duration = time.perf_counter() - start
+
+        nb_bytes = merged_article_ids["pmcids"].nbytes + merged_article_ids["pmids"].nbytes
+        logger.info(
+            f"{len(article_ids):>10} ids packed in {packing_duration:.3f} seconds "
+            f"({packing_duration / len(article_ids) * 1e9:.0f} ns by id), "
+            f"de-duplicated in {merge_duration:.3f} seconds "
+            f"({merge_duration / len(article_ids) * 1e9:.0f} ns by id) "
+            f"into {nb_bytes / 1e6:.1f} MB",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark CLI startup, to check that `--help` and short commands stay fast to start.
+
+Run with `uv run python -m benchmarks.bench_startup`.
+"""
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from loguru import logger
+
+ROOT_FOLDER = Path(__file__).parents[1]
+
+MAIN_IMPORT_TIME_BUDGET = 0.3
+"""Max seconds to import `main`, checked by tests with `CHECK_STARTUP_TIME=1` only"""
+
+MAIN_IMPORT_TIME_LIMIT = 3 * MAIN_IMPORT_TIME_BUDGET
+"""Max seconds to import `main` always checked by tests, loose enough for busy CI runners"""
+
+MAIN_MAX_IMPORTED_MODULES = 300
+"""Max nb of modules imported by `main` (about 250 now), deterministic unlike import time"""
+
+LAZY_MODULES = ("httpx", "httpx_retries", "numpy")
+"""Modules only imported by commands using them, not by `main` itself"""
+
+NB_RUNS = 5
+
+
+def measure_import(module: str) -> tuple[float, set[str]]:
+    """Import a module in a new interpreter, with `-X importtime`.
+
+    Returns:
+        tuple[float, set[str]]: cumulative import time of the module in seconds, and names of
+            all modules imported
+
+    """
+    process = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        check=True,
+        cwd=ROOT_FOLDER,
+        text=True,
+    )
+    cumulative_times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_time, name = line.removeprefix("import time:").split("|")
+        cumulative_times[name.strip()] = int(cumulative_time) / 1e6
+    return cumulative_times[module], set(cumulative_times)
+
+
+def measure_command(*args: str) -> float:
+    """Best wall time of a `main.py` command over `NB_RUNS` runs, in seconds."""
+    durations = []
+    for _ in range(NB_RUNS):
+        start = time.perf_counter()
+        subprocess.run(  # noqa: S603
+            [sys.executable, "main.py", *args],
+            capture_output=True,
+            check=True,
+            cwd=ROOT_FOLDER,
+        )
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def main() -> None:
+    """Log import time of `main`, modules imported too early, and wall time of help commands."""
+    import_time, imported_modules = measure_import("main")
+    logger.info(f"main imported in {import_time:.3f} seconds (budget {MAIN_IMPORT_TIME_BUDGET})")
+    logger.info(f"main imported {len(imported_modules)} modules (max {MAIN_MAX_IMPORTED_MODULES})")
+    if import_time >= MAIN_IMPORT_TIME_BUDGET:
+        logger.warning("main import time is over budget")
+    eager_modules = imported_modules.intersection(LAZY_MODULES)
+    if eager_modules:
+        logger.warning(f"Modules imported by main instead of commands: {sorted(eager_modules)}")
+
+    for args in (("--help",), ("serve", "--help")):
+        logger.info(f"main.py {' '.join(args)} took {measure_command(*args):.3f} seconds")
+
+
+if __name__ == "__main__":
+    main()
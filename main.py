@@ -1,17 +1,15 @@
 from enum import Enum
+from functools import partial
 from pathlib import Path
 from typing import Annotated
 
 import typer
 
-from src.config import (
-    HEMOSTATIC_DEVICES_FLAT,
-    HEMOSTATIC_DEVICES_MINI_FLAT,
-    UROLOGY_INDICATORS_FLAT,
-    UROLOGY_INDICATORS_MINI_FLAT,
-)
+# modules of commands (and their numpy, httpx imports) are only imported by the command run,
+# for `--help` and short commands to start fast, see `benchmarks/bench_startup.py`
+from src import config
 from src.eutils_retrieval.api import NCBIDatabase
-from src.retrieval import ncbi_article_retrieval
+from src.eutils_retrieval.query import MAX_RESULTS_BY_QUERY
 
 SUBMISSION_RESULTS_FOLDER = Path(__file__).parent / "submission_results"
 
@@ -24,6 +22,15 @@ class DbNameArg(Enum):
     PMC = "pmc"
 
 
+class OutputFormatArg(Enum):
+    """CLI format of the results file, as its extension."""
+
+    JSON = "json"
+    NDJSON = "ndjson"
+    NDJSON_GZIP = "ndjson.gz"
+    NDJSON_ZSTD = "ndjson.zst"
+
+
 DB_NAME_MAPPING = {
     DbNameArg.ALL: (
         NCBIDatabase.PUB_MED,
@@ -34,7 +41,26 @@ DB_NAME_MAPPING = {
 }
 
 
-def main(
+app = typer.Typer()
+
+
+def flat_devices_indicators(mini: bool) -> tuple[list[str], list[str]]:
+    """Devices and indicators terms of config, only a small sample of them with `mini`."""
+    if mini:
+        return config.HEMOSTATIC_DEVICES_MINI_FLAT, config.UROLOGY_INDICATORS_MINI_FLAT
+    return config.HEMOSTATIC_DEVICES_FLAT, config.UROLOGY_INDICATORS_FLAT
+
+
+def shards_folder_or_default(shards_folder: Path | None) -> Path:
+    """Shards folder given, or the one in results folder."""
+    from src.sharding import SHARDS_FOLDER_NAME  # noqa: PLC0415
+
+    return shards_folder or SUBMISSION_RESULTS_FOLDER / SHARDS_FOLDER_NAME
+
+
+@app.callback(invoke_without_command=True)
+def main(  # noqa: PLR0913, PLR0917
+    ctx: typer.Context,
     mini: Annotated[
         bool,
         typer.Option(help="Use a small sample of data to build the request query instead of all."),
@@ -49,24 +75,275 @@ def main(
         DbNameArg,
         typer.Option(help="Dbs to call for search. Default to all"),
     ] = DbNameArg.ALL,
+    balance_queries: Annotated[
+        bool,
+        typer.Option(
+            help="Use terms statistics from previous runs to keep the articles estimated for "
+            f"each query under {MAX_RESULTS_BY_QUERY}.",
+        ),
+    ] = False,
+    delta: Annotated[
+        bool,
+        typer.Option(
+            help="Only search devices and indicators added since last run, and merge found "
+            "articles into its results.",
+        ),
+    ] = False,
+    since_last_run: Annotated[
+        bool,
+        typer.Option(
+            help="Only search articles added to databases since last run, and merge them into "
+            "its results. Cannot be used with --delta.",
+        ),
+    ] = False,
+    year_cache: Annotated[
+        bool,
+        typer.Option(
+            help="Cache results by query, database and publication year, to reuse them with any "
+            "other year bounds.",
+        ),
+    ] = False,
+    pmc_ids_csv: Annotated[
+        Path | None,
+        typer.Option(
+            help="Local copy of NCBI bulk PMC-ids CSV file, to fill missing ids of found articles "
+            "offline. Converted once into a binary index in results folder.",
+            exists=True,
+            dir_okay=False,
+        ),
+    ] = None,
+    link_missing_ids: Annotated[
+        bool,
+        typer.Option(
+            help="Resolve ids still missing online with batched ELink requests, cached in results "
+            "folder across runs.",
+        ),
+    ] = False,
+    output_format: Annotated[
+        OutputFormatArg,
+        typer.Option(
+            help="Format of the results file. ndjson formats are streamed one record by line, "
+            "optionally compressed (zstd needs the `zstandard` package).",
+        ),
+    ] = OutputFormatArg.JSON,
+    columnar: Annotated[
+        bool,
+        typer.Option(
+            help="Also store results as sorted uint32 pmcid/pmid columns, memory-mapped by "
+            "`load_columnar_results` for fast membership checks.",
+        ),
+    ] = False,
+    run_delta: Annotated[
+        bool,
+        typer.Option(
+            help="Store article ids added, removed and upgraded since previous run into "
+            "run_delta.json, compared with its columnar results (implies --columnar).",
+        ),
+    ] = False,
+    profiles: Annotated[
+        Path | None,
+        typer.Option(
+            help="Json file listing several profiles (name, devices and indicators as in config), "
+            "retrieved at once searching each identical query once. Results of each profile are "
+            "stored in profiles/<name> of results folder, other retrieval options are ignored.",
+            exists=True,
+            dir_okay=False,
+        ),
+    ] = None,
+    trace: Annotated[
+        Path | None,
+        typer.Option(
+            help="Time steps of the run (planning, searches, summary pages, extraction, "
+            "de-duplication, writing) as nested spans, stored into this Chrome trace-event json "
+            "file to open with Perfetto. Can be given before any command.",
+            dir_okay=False,
+        ),
+    ] = None,
+    profile: Annotated[
+        bool,
+        typer.Option(
+            help="Profile CPU time of each stage of the run (planning, search and fetch, filling "
+            "ids, writing) with cProfile, store their pstats files into cpu_profiles of results "
+            "folder, and log hot functions at the end. Can be given before any command.",
+        ),
+    ] = False,
 ) -> None:
-    """Typer method to allow cli run for `ncbi_article_retrieval`."""
+    """Typer method to allow cli run for `ncbi_article_retrieval`, unless a command is given."""
+    if trace is not None:
+        from src.tracing import start_tracing, stop_and_store_trace  # noqa: PLC0415
+
+        start_tracing()
+        ctx.call_on_close(partial(stop_and_store_trace, trace))
+    if profile:
+        from src.profiling import (  # noqa: PLC0415
+            CPU_PROFILES_FOLDER_NAME,
+            start_profiling,
+            stop_and_store_profiles,
+        )
+
+        start_profiling()
+        ctx.call_on_close(
+            partial(stop_and_store_profiles, SUBMISSION_RESULTS_FOLDER / CPU_PROFILES_FOLDER_NAME),
+        )
+    if ctx.invoked_subcommand is not None:
+        return
+
+    if delta and since_last_run:
+        msg = "--delta and --since-last-run cannot be used together"
+        raise typer.BadParameter(msg)
+
+    from src.batch_retrieval import load_profiles, ncbi_batch_retrieval  # noqa: PLC0415
+    from src.pmc_ids_mapping import (  # noqa: PLC0415
+        PMC_IDS_MAPPING_FOLDER_NAME,
+        load_or_build_pmc_ids_mapping,
+    )
+    from src.retrieval import RESULTS_FILE_STEM, ncbi_article_retrieval  # noqa: PLC0415
+
     db = DB_NAME_MAPPING[db_name]
     # Use mini to choose a small sample of the real data
-    devices_indicators = (HEMOSTATIC_DEVICES_FLAT, UROLOGY_INDICATORS_FLAT)
-    if mini:
-        devices_indicators = (HEMOSTATIC_DEVICES_MINI_FLAT, UROLOGY_INDICATORS_MINI_FLAT)
+    devices_indicators = flat_devices_indicators(mini)
 
     # Check that the folder exists, or creates it
     SUBMISSION_RESULTS_FOLDER.mkdir(exist_ok=True)
+    if profiles:
+        ncbi_batch_retrieval(
+            load_profiles(profiles),
+            year_bounds=(start_year, end_year),
+            db=db,
+            output_folder=SUBMISSION_RESULTS_FOLDER,
+            max_results_by_query=MAX_RESULTS_BY_QUERY if balance_queries else None,
+        )
+        return
+
+    pmc_ids_mapping = None
+    if pmc_ids_csv:
+        pmc_ids_mapping = load_or_build_pmc_ids_mapping(
+            pmc_ids_csv,
+            SUBMISSION_RESULTS_FOLDER / PMC_IDS_MAPPING_FOLDER_NAME,
+        )
     ncbi_article_retrieval(
         devices_indicators=devices_indicators,
         year_bounds=(start_year, end_year),
         db=db,
         output_folder=SUBMISSION_RESULTS_FOLDER,
         store_intermediate_results=intermediate,
+        max_results_by_query=MAX_RESULTS_BY_QUERY if balance_queries else None,
+        delta=delta,
+        since_last_run=since_last_run,
+        year_cache=year_cache,
+        pmc_ids_mapping=pmc_ids_mapping,
+        link_missing_ids=link_missing_ids,
+        results_file_name=f"{RESULTS_FILE_STEM}.{output_format.value}",
+        columnar_results=columnar,
+        run_delta_report=run_delta,
+    )
+
+
+@app.command()
+def plan(  # noqa: PLR0913, PLR0917
+    nb_shards: Annotated[int, typer.Argument(help="Number of shards to split searches into.")],
+    mini: Annotated[
+        bool,
+        typer.Option(help="Use a small sample of data to build the request query instead of all."),
+    ] = False,
+    start_year: Annotated[int, typer.Option(help="Filter articles that only starts after")] = 2023,
+    end_year: Annotated[int, typer.Option(help="Filter articles that only end before")] = 2023,
+    db_name: Annotated[
+        DbNameArg,
+        typer.Option(help="Dbs to call for search. Default to all"),
+    ] = DbNameArg.ALL,
+    shards_folder: Annotated[
+        Path | None,
+        typer.Option(
+            help="Folder of the shard plan and partial results, shared by all nodes. Defaults to "
+            "shards in results folder.",
+        ),
+    ] = None,
+) -> None:
+    """Split searches by sub-query, database and publication year into shards, see `run-shard`."""
+    from src.sharding import create_shard_plan  # noqa: PLC0415
+
+    create_shard_plan(
+        *flat_devices_indicators(mini),
+        year_bounds=(start_year, end_year),
+        db=DB_NAME_MAPPING[db_name],
+        nb_shards=nb_shards,
+        folder=shards_folder_or_default(shards_folder),
+    )
+
+
+@app.command("run-shard")
+def run_shard_command(
+    shard_index: Annotated[int, typer.Argument(help="Index of the shard to run, from 0.")],
+    shards_folder: Annotated[
+        Path | None,
+        typer.Option(
+            help="Folder of the shard plan and partial results, shared by all nodes. Defaults to "
+            "shards in results folder.",
+        ),
+    ] = None,
+) -> None:
+    """Run all searches of a shard on this node, and store its compact partial result."""
+    from src.sharding import run_shard  # noqa: PLC0415
+
+    run_shard(shards_folder_or_default(shards_folder), shard_index)
+
+
+@app.command()
+def merge(
+    shards_folder: Annotated[
+        Path | None,
+        typer.Option(
+            help="Folder of the shard plan and partial results, shared by all nodes. Defaults to "
+            "shards in results folder.",
+        ),
+    ] = None,
+    output_format: Annotated[
+        OutputFormatArg,
+        typer.Option(help="Format of the results file."),
+    ] = OutputFormatArg.JSON,
+) -> None:
+    """Merge partial results of all shards into the results file."""
+    from src.retrieval import RESULTS_FILE_STEM, store_results  # noqa: PLC0415
+    from src.sharding import merge_shards  # noqa: PLC0415
+
+    store_results(
+        merge_shards(shards_folder_or_default(shards_folder)),
+        SUBMISSION_RESULTS_FOLDER / f"{RESULTS_FILE_STEM}.{output_format.value}",
+    )
+
+
+@app.command("serve")
+def serve_command(
+    host: Annotated[
+        str | None,
+        typer.Option(help="Host to listen on. Defaults to 127.0.0.1, local calls only."),
+    ] = None,
+    port: Annotated[
+        int | None,
+        typer.Option(help="Port to listen on. Defaults to 8765, 0 for any free port."),
+    ] = None,
+    max_concurrent_jobs: Annotated[
+        int | None,
+        typer.Option(help="Nb of jobs run at the same time, others wait in queue. Defaults to 1."),
+    ] = None,
+) -> None:
+    """Run a retrieval daemon with a local HTTP/JSON API, keeping connections and caches warm."""
+    from src.daemon import (  # noqa: PLC0415
+        DAEMON_FOLDER_NAME,
+        DEFAULT_HOST,
+        DEFAULT_PORT,
+        MAX_CONCURRENT_JOBS,
+        serve,
+    )
+
+    serve(
+        SUBMISSION_RESULTS_FOLDER / DAEMON_FOLDER_NAME,
+        DEFAULT_HOST if host is None else host,
+        DEFAULT_PORT if port is None else port,
+        max_concurrent_jobs or MAX_CONCURRENT_JOBS,
     )
 
 
 if __name__ == "__main__":
-    typer.run(main)
+    app()
@@ -0,0 +1,96 @@
+from collections.abc import Iterable
+from typing import TypedDict
+
+from src.eutils_retrieval.search import ArticleIds
+from src.packed_article_ids import (
+    PackedArticleIds,
+    count_conflicting_packed_article_ids,
+    create_packed_article_ids,
+    merge_packed_article_ids,
+    pack_article_ids,
+    unpack_article_ids,
+)
+from src.tracing import trace_span
+
+MIN_PENDING_ARTICLES = 100_000
+"""Nb of articles added before merging them into unique ones, if more than unique ones so far"""
+
+
+class ArticleIdsIndex(TypedDict):
+    """Unique article ids found so far, fed as search results arrive.
+
+    An article is either complete (ids known in both databases) or partial (only known in one).
+    A partial article is dropped as soon as a complete one shares its id.
+
+    Attributes:
+        unique (PackedArticleIds): unique articles, as of last merge
+        pending (list[PackedArticleIds]): articles added since last merge
+        nb_pending (int): nb of articles added since last merge
+
+    """
+
+    unique: PackedArticleIds
+    pending: list[PackedArticleIds]
+    nb_pending: int
+
+
+def create_article_ids_index() -> ArticleIdsIndex:
+    """Create an empty index of article ids."""
+    return ArticleIdsIndex(unique=create_packed_article_ids(), pending=[], nb_pending=0)
+
+
+def add_article_ids(index: ArticleIdsIndex, article_ids: Iterable[ArticleIds]) -> None:
+    """Add article ids to the index in place, keeping only unique articles with most infos.
+
+    Args:
+        index (ArticleIdsIndex): index updated in place
+        article_ids (Iterable[ArticleIds]): new article ids, e.g. a page of search results
+
+    Examples:
+        >> index = create_article_ids_index()
+        >> add_article_ids(index, [{"pmcid": "PMC1", "pmid": None}, {"pmcid": None, "pmid": "2"}])
+        >> add_article_ids(index, [{"pmcid": "PMC1", "pmid": "1"}])
+        >> indexed_article_ids(index)
+        [{"pmcid": None, "pmid": "2"}, {"pmcid": "PMC1", "pmid": "1"}]
+
+    Notes:
+        Articles are packed as numeric ids (see `PackedArticleIds`) and merged with unique ones
+        in batches, once there are as many pending articles as unique ones: merges take
+        amortized O(log n) by article, and memory stays within a few times the unique articles.
+
+    """
+    packed_article_ids = pack_article_ids(article_ids)
+    index["pending"].append(packed_article_ids)
+    index["nb_pending"] += packed_article_ids["pmids"].size
+
+    if index["nb_pending"] >= max(MIN_PENDING_ARTICLES, index["unique"]["pmids"].size):
+        merge_pending_article_ids(index)
+
+
+def merge_pending_article_ids(index: ArticleIdsIndex) -> None:
+    """Merge articles added since last merge into unique ones, in place."""
+    if not index["pending"]:
+        return
+
+    with trace_span("deduplicate ids", nb_pending=index["nb_pending"]):
+        index["unique"] = merge_packed_article_ids(index["unique"], *index["pending"])
+    index["pending"] = []
+    index["nb_pending"] = 0
+
+
+def count_unique_article_ids(index: ArticleIdsIndex) -> int:
+    """Count unique articles found so far."""
+    merge_pending_article_ids(index)
+    return int(index["unique"]["pmids"].size)
+
+
+def count_conflicting_article_ids(index: ArticleIdsIndex) -> int:
+    """Count complete articles sharing an id with another complete article."""
+    merge_pending_article_ids(index)
+    return count_conflicting_packed_article_ids(index["unique"])
+
+
+def indexed_article_ids(index: ArticleIdsIndex) -> list[ArticleIds]:
+    """List unique articles found so far, sorted by pmcid then pmid."""
+    merge_pending_article_ids(index)
+    return unpack_article_ids(index["unique"])
@@ -0,0 +1,190 @@
+import sqlite3
+from collections.abc import Iterator
+from itertools import batched
+from pathlib import Path
+from typing import TypedDict
+
+from loguru import logger
+
+from src.eutils_retrieval.api import NCBIDatabase
+from src.eutils_retrieval.search import ArticleIds
+from src.packed_article_ids import PMCID_PREFIX, encode_pmcid, encode_pmid
+
+ARTICLE_STORE_FILE_NAME = "articles.sqlite"
+
+UPSERT_BATCH_SIZE = 10_000
+"""Nb of article ids upserted in a single transaction"""
+
+CREATE_ARTICLES_TABLE = """
+CREATE TABLE IF NOT EXISTS articles (
+    pmcid INTEGER,
+    pmid INTEGER,
+    query_id TEXT,
+    db TEXT,
+    first_seen_run TEXT NOT NULL,
+    last_seen_run TEXT NOT NULL,
+    CHECK (pmcid IS NOT NULL OR pmid IS NOT NULL)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS articles_pmcid ON articles (pmcid);
+CREATE UNIQUE INDEX IF NOT EXISTS articles_pmid ON articles (pmid);
+"""
+
+# articles of a batch are staged in a temporary table, then merged into the store set-wise
+CREATE_UPSERTED_TABLE = """
+CREATE TEMP TABLE IF NOT EXISTS upserted (
+    pmcid INTEGER,
+    pmid INTEGER,
+    query_id TEXT,
+    db TEXT,
+    first_seen_run TEXT NOT NULL
+);
+"""
+INSERT_UPSERTED = """
+INSERT INTO upserted (pmcid, pmid, query_id, db, first_seen_run)
+VALUES (:pmcid, :pmid, :query_id, :db, :run_id)
+"""
+# a complete article merging a pmcid only one and a pmid only one carries the provenance of the
+# pmid only one (kept if older when upserted), which is then dropped
+CARRY_PMID_ONLY_PROVENANCE = """
+UPDATE upserted SET (query_id, db, first_seen_run) = (
+    SELECT query_id, db, first_seen_run FROM articles
+    WHERE pmcid IS NULL AND pmid = upserted.pmid
+)
+WHERE EXISTS (SELECT 1 FROM articles WHERE pmcid = upserted.pmcid AND pmid IS NULL)
+AND EXISTS (SELECT 1 FROM articles WHERE pmcid IS NULL AND pmid = upserted.pmid)
+"""
+DELETE_PMID_ONLY_ARTICLES = """
+DELETE FROM articles
+WHERE pmcid IS NULL AND pmid IN (
+    SELECT pmid FROM upserted
+    WHERE EXISTS (SELECT 1 FROM articles WHERE pmcid = upserted.pmcid AND pmid IS NULL)
+)
+"""
+# complete articles first, so that partial ones of the same batch are known already: known
+# articles get their missing cross-reference (unless used by another one), keep the oldest
+# provenance and get their last seen run updated
+UPSERT_ARTICLES = """
+INSERT INTO articles (pmcid, pmid, query_id, db, first_seen_run, last_seen_run)
+SELECT pmcid, pmid, query_id, db, first_seen_run, :run_id FROM upserted
+WHERE true
+ORDER BY pmcid IS NULL OR pmid IS NULL, rowid
+ON CONFLICT (pmcid) DO UPDATE SET
+    pmid = COALESCE(
+        pmid,
+        IIF(EXISTS (SELECT 1 FROM articles WHERE pmid = excluded.pmid), NULL, excluded.pmid)
+    ),
+    query_id = IIF(excluded.first_seen_run < first_seen_run, excluded.query_id, query_id),
+    db = IIF(excluded.first_seen_run < first_seen_run, excluded.db, db),
+    first_seen_run = MIN(first_seen_run, excluded.first_seen_run),
+    last_seen_run = excluded.last_seen_run
+ON CONFLICT (pmid) DO UPDATE SET
+    pmcid = COALESCE(
+        pmcid,
+        IIF(EXISTS (SELECT 1 FROM articles WHERE pmcid = excluded.pmcid), NULL, excluded.pmcid)
+    ),
+    last_seen_run = excluded.last_seen_run
+"""
+ARTICLE_UPSERT = (CARRY_PMID_ONLY_PROVENANCE, DELETE_PMID_ONLY_ARTICLES, UPSERT_ARTICLES)
+
+
+class ArticleStore(TypedDict):
+    """SQLite database of all article ids found across runs, with their provenance.
+
+    Attributes:
+        connection (sqlite3.Connection): connection to the database
+        run_id (str): id of the current run, stored as first and last run seeing each article
+
+    """
+
+    connection: sqlite3.Connection
+    run_id: str
+
+
+def open_article_store(file_path: Path, run_id: str) -> ArticleStore:
+    """Open the article store (created if needed) in WAL mode, for readers to query it anytime.
+
+    Args:
+        file_path (Path): path of the SQLite database
+        run_id (str): id of the current run, e.g. its start datetime
+
+    Returns:
+        ArticleStore: opened store, to close with `close_article_store`
+
+    Notes:
+        Ids are stored as integers (see `encode_pmcid`) with a unique index on pmcid and pmid,
+        so de-duplication across runs is an index lookup.
+
+    """
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(file_path)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.executescript(CREATE_ARTICLES_TABLE + CREATE_UPSERTED_TABLE)
+    return ArticleStore(connection=connection, run_id=run_id)
+
+
+def close_article_store(article_store: ArticleStore) -> None:
+    """Close the connection to the article store."""
+    article_store["connection"].close()
+
+
+def upsert_article_ids(
+    article_store: ArticleStore,
+    article_ids: list[ArticleIds],
+    query_id: str | None = None,
+    db: NCBIDatabase | None = None,
+) -> None:
+    """Insert new article ids into the store, and fill missing ids of known articles.
+
+    Known articles only get their last seen run updated, and keep the provenance of the first
+    query that found them. Upserts are done set-wise by batches of `UPSERT_BATCH_SIZE` articles,
+    each in a single transaction.
+
+    Args:
+        article_store (ArticleStore): opened store
+        article_ids (list[ArticleIds]): article ids found
+        query_id (str, optional): stable id of the query that found them (see `sub_query_id`)
+        db (NCBIDatabase, optional): database that found them
+
+    Notes:
+        Complete articles are upserted first, so that partial ones found in the same batch are
+        known already. A complete article sharing one of its ids with another complete one (an
+        article with multiple ids in a db) cannot be stored, and is skipped.
+
+    """
+    connection = article_store["connection"]
+    for batch in batched(article_ids, UPSERT_BATCH_SIZE):
+        rows = [
+            {
+                "pmcid": encode_pmcid(article["pmcid"]) or None,
+                "pmid": encode_pmid(article["pmid"]) or None,
+                "query_id": query_id,
+                "db": db.value if db else None,
+                "run_id": article_store["run_id"],
+            }
+            for article in batch
+            if article["pmcid"] or article["pmid"]
+        ]
+        with connection:
+            connection.execute("DELETE FROM upserted")
+            connection.executemany(INSERT_UPSERTED, rows)
+            for statement in ARTICLE_UPSERT:
+                connection.execute(statement, {"run_id": article_store["run_id"]})
+
+    logger.debug(f"Upserted {len(article_ids)} article ids into the article store")
+
+
+def iter_stored_article_ids(article_store: ArticleStore) -> Iterator[ArticleIds]:
+    """Iterate over all article ids in the store, sorted by pmcid then pmid."""
+    cursor = article_store["connection"].execute(
+        "SELECT pmcid, pmid FROM articles ORDER BY pmcid, pmid",
+    )
+    for pmcid, pmid in cursor:
+        yield ArticleIds(
+            pmcid=f"{PMCID_PREFIX}{pmcid}" if pmcid is not None else None,
+            pmid=str(pmid) if pmid is not None else None,
+        )
+
+
+def count_stored_article_ids(article_store: ArticleStore) -> int:
+    """Count unique articles in the store."""
+    return article_store["connection"].execute("SELECT COUNT(*) FROM articles").fetchone()[0]
@@ -0,0 +1,101 @@
+import queue
+import threading
+from pathlib import Path
+from typing import TypedDict
+
+from loguru import logger
+
+from src.utils import store_data_as_json
+
+MAX_PENDING_WRITES = 16
+"""Nb of writes waiting in queue before submitting a new one blocks, to bound memory"""
+
+
+class BackgroundWriter(TypedDict):
+    """Thread storing data into json files, fed through a bounded queue.
+
+    Attributes:
+        queue (queue.Queue): pending writes as (data, file path), None to stop the thread
+        thread (threading.Thread): thread writing pending data
+        errors (list[Exception]): errors raised by writes, raised again once stopped
+
+    """
+
+    queue: queue.Queue
+    thread: threading.Thread
+    errors: list[Exception]
+
+
+def start_background_writer(max_pending_writes: int = MAX_PENDING_WRITES) -> BackgroundWriter:
+    """Start a thread writing json files submitted with `submit_json_write`.
+
+    Args:
+        max_pending_writes (int): nb of pending writes before `submit_json_write` blocks
+
+    Returns:
+        BackgroundWriter: started writer, to stop with `stop_background_writer`
+
+    """
+    pending_writes: queue.Queue = queue.Queue(maxsize=max_pending_writes)
+    errors: list[Exception] = []
+    thread = threading.Thread(
+        target=write_pending_data,
+        args=(pending_writes, errors),
+        name="background-writer",
+        daemon=True,
+    )
+    thread.start()
+    return BackgroundWriter(queue=pending_writes, thread=thread, errors=errors)
+
+
+def write_pending_data(pending_writes: queue.Queue, errors: list[Exception]) -> None:
+    """Write pending data one file at a time, until None is received.
+
+    A failed write is logged and kept in `errors`, without stopping the next ones.
+    """
+    while (pending_write := pending_writes.get()) is not None:
+        data, file_path = pending_write
+        try:
+            store_data_as_json(data, file_path)
+        except Exception as error:  # noqa: BLE001
+            logger.error(f"Could not write {file_path}: {error}")
+            errors.append(error)
+
+
+def submit_json_write(
+    background_writer: BackgroundWriter | None,
+    data: list | dict,
+    file_path: Path,
+) -> None:
+    """Store data into a json file in background, or right away without background writer.
+
+    Blocks while the writer has `max_pending_writes` pending, for memory to stay bounded.
+    Data must not be modified once submitted.
+    """
+    if background_writer is None:
+        store_data_as_json(data, file_path)
+        return
+
+    background_writer["queue"].put((data, file_path))
+
+
+def stop_background_writer(
+    background_writer: BackgroundWriter,
+    *,
+    raise_errors: bool = True,
+) -> None:
+    """Flush all pending writes, then stop the writer thread.
+
+    Args:
+        background_writer (BackgroundWriter): writer to stop
+        raise_errors (bool): raise the first write error, if any. Disable it while another error
+            is raised, not to hide it: write errors are logged anyway.
+
+    Raises:
+        Exception: first error raised by a write, if any and `raise_errors`
+
+    """
+    background_writer["queue"].put(None)
+    background_writer["thread"].join()
+    if raise_errors and background_writer["errors"]:
+        raise background_writer["errors"][0]
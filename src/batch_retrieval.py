@@ -0,0 +1,358 @@
+import math
+import re
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Literal, TypedDict
+
+from loguru import logger
+
+from src.article_ids_index import (
+    add_article_ids,
+    create_article_ids_index,
+    merge_pending_article_ids,
+)
+from src.article_store import (
+    ARTICLE_STORE_FILE_NAME,
+    ArticleStore,
+    close_article_store,
+    open_article_store,
+    upsert_article_ids,
+)
+from src.eutils_retrieval.api import NCBIDatabase
+from src.eutils_retrieval.extract import extract_article_ids_by_uid
+from src.eutils_retrieval.search import (
+    MAX_ALLOWED_SEARCH_UIDS,
+    MAX_ALLOWED_SUMMARY_RETRIEVAL,
+    MAX_UIDS_BY_SUMMARY,
+    ArticleIds,
+    iter_articles_by_uids,
+    iter_stored_articles,
+    search_and_store,
+)
+from src.packed_article_ids import (
+    PackedArticleIds,
+    merge_packed_article_ids,
+    unpack_article_ids,
+)
+from src.query_plan import QUERY_PLANS_FOLDER_NAME, load_or_create_query_plan, sub_query_id
+from src.retrieval import STORE_RESULTS_FILE_NAME
+from src.term_statistics import (
+    TERM_STATISTICS_FILE_NAME,
+    TermStatistics,
+    known_term_counts,
+    load_term_statistics,
+    update_term_statistics,
+)
+from src.tracing import trace_span
+from src.utils import flatten_dict_to_list, load_data_from_json, store_data_as_json
+
+PROFILES_FOLDER_NAME = "profiles"
+
+PROFILE_NAME_PATTERN = re.compile(r"^[\w-]+$")
+"""Profile names are used as folder names"""
+
+type KnownArticleIds = dict[NCBIDatabase, dict[str, ArticleIds]]
+"""Ids of articles whose summary was fetched, by database and uid, empty for articles without ids"""
+
+
+class Profile(TypedDict):
+    """Devices and indicators to find articles about, with results stored apart.
+
+    Attributes:
+        name (str): name of the profile, letters, digits, `_` and `-` only
+        devices (dict[str, list[str]]): devices and their related terms, as in `config.py`
+        indicators (dict[str, list[str]]): indicators and their related terms, as in `config.py`
+
+    """
+
+    name: str
+    devices: dict[str, list[str]]
+    indicators: dict[str, list[str]]
+
+
+def load_profiles(file_path: Path) -> list[Profile]:
+    """Load profiles from a json file, a list of `Profile`.
+
+    Raises:
+        ValueError: if a profile name is invalid or used twice
+
+    """
+    profiles: list[Profile] = load_data_from_json(file_path)
+    names = [profile["name"] for profile in profiles]
+    invalid_names = [name for name in names if not PROFILE_NAME_PATTERN.match(name)]
+    if invalid_names:
+        msg = f"Invalid profile names {invalid_names}, only letters, digits, _ and - are allowed"
+        raise ValueError(msg)
+    if len(set(names)) != len(names):
+        msg = f"Profile names should be unique, got {names}"
+        raise ValueError(msg)
+    return profiles
+
+
+def plan_profiles_queries(  # noqa: PLR0913
+    profiles: list[Profile],
+    year_bounds: tuple[int | None, int | None],
+    db: tuple[NCBIDatabase, ...] | NCBIDatabase,
+    folder: Path,
+    *,
+    term_counts: dict[str, int] | None = None,
+    max_results_by_query: int | None = None,
+) -> dict[str, list[str]]:
+    """Plan queries of all profiles together, each term shared by profiles being packed once.
+
+    Devices are grouped by the profiles searching them, then indicators by the profiles searching
+    them along with each device group. A query plan is created for each couple of groups, and its
+    queries are searched for all these profiles: profiles sharing devices but only some of their
+    indicators share the queries of their common indicators.
+
+    Args:
+        profiles (list[Profile]): devices and indicators of each profile
+        year_bounds (tuple[int, int]): start and end year of publication
+        db (tuple[NCBIDatabase, ...] | NCBIDatabase): databases searched
+        folder (Path): folder storing query plans, one json file by plan key
+        term_counts (dict[str, int], optional): number of articles matching each lowercase term
+        max_results_by_query (int, optional): max number of articles estimated for a query
+
+    Returns:
+        dict[str, list[str]]: queries to search by profile name, each query of a single group
+
+    """
+    indicator_profiles = profiles_by_term(profiles, "indicators")
+    queries_by_profile: dict[str, list[str]] = {profile["name"]: [] for profile in profiles}
+    for device_profiles, devices in group_terms(profiles_by_term(profiles, "devices")).items():
+        indicator_groups = group_terms(
+            {term: names & device_profiles for term, names in indicator_profiles.items()},
+        )
+        for names, indicators in indicator_groups.items():
+            if not names:
+                continue
+            query_plan = load_or_create_query_plan(
+                devices,
+                indicators,
+                year_bounds=year_bounds,
+                db=db,
+                folder=folder,
+                term_counts=term_counts,
+                max_results_by_query=max_results_by_query,
+            )
+            for name in names:
+                queries_by_profile[name].extend(q["query"] for q in query_plan["sub_queries"])
+    return queries_by_profile
+
+
+def profiles_by_term(
+    profiles: list[Profile],
+    field: Literal["devices", "indicators"],
+) -> dict[str, frozenset[str]]:
+    """Names of profiles searching each term of `field`, first spelling of a term being kept."""
+    names_by_term: dict[str, set[str]] = {}
+    spellings: dict[str, str] = {}
+    for profile in profiles:
+        for term in flatten_dict_to_list(profile[field]):
+            spelling = spellings.setdefault(term.lower(), term)
+            names_by_term.setdefault(spelling, set()).add(profile["name"])
+    return {term: frozenset(names) for term, names in names_by_term.items()}
+
+
+def group_terms(names_by_term: dict[str, frozenset[str]]) -> dict[frozenset[str], list[str]]:
+    """Group terms searched by the same profiles, in their original order."""
+    terms_by_names: dict[frozenset[str], list[str]] = {}
+    for term, names in names_by_term.items():
+        terms_by_names.setdefault(names, []).append(term)
+    return terms_by_names
+
+
+def search_query_article_ids(
+    query: str,
+    db: tuple[NCBIDatabase, ...] | NCBIDatabase,
+    *,
+    term_statistics: TermStatistics | None = None,
+    article_store: ArticleStore | None = None,
+    known_article_ids: KnownArticleIds | None = None,
+) -> PackedArticleIds:
+    """Search a single query across databases, and keep its unique article ids packed.
+
+    Packed ids of a query take 8 bytes by article, to be kept for all queries and merged by
+    any set of queries sharing them (see `merge_packed_article_ids`).
+
+    Args:
+        query (str): Search query string
+        db (tuple[NCBIDatabase, ...] | NCBIDatabase): databases to search
+        term_statistics (TermStatistics, optional): if given, updated with query terms counts
+        article_store (ArticleStore, optional): if given, found ids are upserted into it
+        known_article_ids (KnownArticleIds, optional): ids of articles already summarized, by
+            previous queries sharing it. Updated in place, only unknown articles are summarized.
+
+    Returns:
+        PackedArticleIds: unique articles found
+
+    """
+    known_article_ids = {} if known_article_ids is None else known_article_ids
+    article_ids_index = create_article_ids_index()
+    dbs = db if isinstance(db, tuple) else (db,)
+    with trace_span("query", query_id=sub_query_id(query)):
+        # PMC first, articles found with their pmid do not need their PubMed summary
+        for searched_db in sorted(dbs, key=lambda d: d != NCBIDatabase.PMC):
+            article_ids = search_db_article_ids(
+                query,
+                searched_db,
+                known_article_ids,
+                term_statistics=term_statistics,
+            )
+            add_article_ids(article_ids_index, article_ids)
+            if article_store is not None and article_ids:
+                upsert_article_ids(
+                    article_store,
+                    article_ids,
+                    query_id=sub_query_id(query),
+                    db=searched_db,
+                )
+    merge_pending_article_ids(article_ids_index)
+    return article_ids_index["unique"]
+
+
+def search_db_article_ids(
+    query: str,
+    db: NCBIDatabase,
+    known_article_ids: KnownArticleIds,
+    *,
+    term_statistics: TermStatistics | None = None,
+) -> list[ArticleIds]:
+    """Search a query in a database, only fetching summaries of articles not known yet.
+
+    Uids of found articles are given by the search request itself. Summaries of unknown ones are
+    fetched by uid, unless fetching all stored articles takes less requests (or the search found
+    more than `MAX_ALLOWED_SEARCH_UIDS` articles).
+
+    Returns:
+        list[ArticleIds]: ids of all articles found, known or fetched
+
+    """
+    storage_infos = search_and_store(query, db=db, nb_uids=MAX_ALLOWED_SEARCH_UIDS)
+    if storage_infos is None:
+        return []
+    if term_statistics is not None:
+        update_term_statistics(term_statistics, db, storage_infos.get("term_counts", {}))
+    if storage_infos["total_results"] == 0:
+        return []
+
+    db_known_article_ids = known_article_ids.setdefault(db, {})
+    uids = storage_infos.get("uids")
+    unknown_uids = [uid for uid in uids or [] if uid not in db_known_article_ids]
+    if uids is not None and math.ceil(len(unknown_uids) / MAX_UIDS_BY_SUMMARY) <= math.ceil(
+        storage_infos["total_results"] / MAX_ALLOWED_SUMMARY_RETRIEVAL,
+    ):
+        logger.info(
+            f"Skipping summaries of {len(uids) - len(unknown_uids)}/{len(uids)} articles found "
+            f"in {db.value} and already known",
+        )
+        pages = iter_articles_by_uids(db, unknown_uids)
+    else:
+        pages = iter_stored_articles(storage_infos)
+
+    fetched_article_ids: dict[str, ArticleIds] = {}
+    for page in pages:
+        with trace_span("extract ids", db=db.value):
+            fetched_article_ids.update(extract_article_ids_by_uid(page, db))
+    add_known_article_ids(known_article_ids, db, fetched_article_ids)
+
+    found_article_ids = (
+        fetched_article_ids.values()
+        if uids is None
+        else (db_known_article_ids.get(uid) for uid in uids)
+    )
+    return [article_ids for article_ids in found_article_ids if article_ids]
+
+
+def add_known_article_ids(
+    known_article_ids: KnownArticleIds,
+    db: NCBIDatabase,
+    article_ids_by_uid: dict[str, ArticleIds],
+) -> None:
+    """Keep ids of summarized articles, a PMC article with a pmid being known in PubMed as well."""
+    known_article_ids.setdefault(db, {}).update(article_ids_by_uid)
+    if db == NCBIDatabase.PMC:
+        known_pmids = known_article_ids.setdefault(NCBIDatabase.PUB_MED, {})
+        for article_ids in article_ids_by_uid.values():
+            if article_ids and article_ids["pmid"]:
+                known_pmids.setdefault(article_ids["pmid"], article_ids)
+
+
+def ncbi_batch_retrieval(
+    profiles: list[Profile],
+    year_bounds: tuple[int | None, int | None],
+    db: tuple[NCBIDatabase, ...] | NCBIDatabase,
+    output_folder: Path,
+    *,
+    max_results_by_query: int | None = None,
+) -> None:
+    """Retrieve article ids of several profiles at once, searching shared terms once.
+
+    Queries of all profiles are planned together (see `plan_profiles_queries`): a query needed by
+    several profiles is searched a single time, and its unique article ids are shared by all of
+    them. Each article found by several queries is only summarized once. Term statistics, query
+    plans and the article store are shared as well.
+
+    Args:
+        profiles (list[Profile]): devices and indicators of each profile
+        year_bounds (tuple[int, int]): filters to apply to search query, both optionals
+        db (tuple[NCBIDatabase, ...] | NCBIDatabase): databases source for article search
+        output_folder (Path): folder storing shared files, and results of each profile in
+            `profiles/<name>/retrieved_ids.json`
+        max_results_by_query (int, optional): balance queries so that their estimated number of
+            articles stays below this limit
+
+    """
+    start = time.time()
+    term_statistics_file = output_folder / TERM_STATISTICS_FILE_NAME
+    term_statistics = load_term_statistics(term_statistics_file)
+
+    # 1. plan queries of all profiles together
+    queries_by_profile = plan_profiles_queries(
+        profiles,
+        year_bounds,
+        db,
+        output_folder / QUERY_PLANS_FOLDER_NAME,
+        term_counts=known_term_counts(term_statistics, db),
+        max_results_by_query=max_results_by_query,
+    )
+    unique_queries = list(dict.fromkeys(q for qs in queries_by_profile.values() for q in qs))
+    nb_queries = sum(len(queries) for queries in queries_by_profile.values())
+    logger.info(
+        f"Planned {len(unique_queries)} unique queries for {len(profiles)} profiles, "
+        f"{nb_queries} queries counted by profile",
+    )
+
+    # 2. search each unique query once, summarizing each article once, keeping ids packed
+    article_ids_by_query: dict[str, PackedArticleIds] = {}
+    known_article_ids: KnownArticleIds = {}
+    article_store = open_article_store(
+        output_folder / ARTICLE_STORE_FILE_NAME,
+        run_id=datetime.fromtimestamp(start, UTC).isoformat(),
+    )
+    try:
+        for query in unique_queries:
+            article_ids_by_query[query] = search_query_article_ids(
+                query,
+                db,
+                term_statistics=term_statistics,
+                article_store=article_store,
+                known_article_ids=known_article_ids,
+            )
+    finally:
+        close_article_store(article_store)
+    store_data_as_json(term_statistics, term_statistics_file)
+
+    # 3. merge article ids of each profile queries
+    for name, queries in queries_by_profile.items():
+        article_ids = unpack_article_ids(
+            merge_packed_article_ids(*(article_ids_by_query[query] for query in queries)),
+        )
+        logger.success(f"Found {len(article_ids)} total results for profile {name}")
+        store_data_as_json(
+            article_ids,
+            output_folder / PROFILES_FOLDER_NAME / name / STORE_RESULTS_FILE_NAME,
+        )
+
+    logger.success(f"Retrieved {len(profiles)} profiles, took {time.time() - start} seconds")
@@ -0,0 +1,171 @@
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TypedDict
+
+import numpy as np
+from loguru import logger
+
+from src.packed_article_ids import (
+    ID_DTYPE,
+    NULL_ID,
+    PackedArticleIds,
+    encode_pmcid,
+    encode_pmid,
+    is_in_sorted,
+)
+from src.pmc_ids_mapping import BY_PMCID_FILE_NAME, BY_PMID_FILE_NAME, lookup_ids
+from src.utils import load_data_from_json, store_data_as_json
+
+COLUMNAR_RESULTS_FOLDER_NAME = "retrieved_ids_columns"
+MANIFEST_FILE_NAME = "manifest.json"
+
+COLUMNAR_RESULTS_VERSION = 1
+"""Version of columns layout, bumped on any change for readers to reject other versions"""
+
+
+class ColumnarResultsManifest(TypedDict):
+    """Description of columnar results, written last: columns are complete once it exists.
+
+    Attributes:
+        version (int): version of columns layout, see `COLUMNAR_RESULTS_VERSION`
+        nb_articles (int): nb of unique articles
+        nb_pmcids (int): nb of articles with a pmcid
+        nb_pmids (int): nb of articles with a pmid
+
+    """
+
+    version: int
+    nb_articles: int
+    nb_pmcids: int
+    nb_pmids: int
+
+
+class ColumnarResults(TypedDict):
+    """Found article ids as sorted uint32 columns, memory-mapped from disk.
+
+    Same layout as `PmcIdsMapping`: ids sorted in first row, the other id of each article in
+    second row (`NULL_ID` if missing).
+
+    Attributes:
+        by_pmcid (np.ndarray): pmcids sorted, and their pmid, as a (2, n) array
+        by_pmid (np.ndarray): pmids sorted, and their pmcid, as a (2, n) array
+        manifest (ColumnarResultsManifest): description of columns
+
+    """
+
+    by_pmcid: np.ndarray
+    by_pmid: np.ndarray
+    manifest: ColumnarResultsManifest
+
+
+def store_columnar_results(packed_article_ids: PackedArticleIds, folder: Path) -> None:
+    """Store unique article ids as sorted columns, to read them with `load_columnar_results`.
+
+    Args:
+        packed_article_ids (PackedArticleIds): unique article ids, e.g. from an index
+        folder (Path): folder to store columns and their manifest into
+
+    """
+    pmcids, pmids = packed_article_ids["pmcids"], packed_article_ids["pmids"]
+    has_pmcid, has_pmid = pmcids != NULL_ID, pmids != NULL_ID
+    by_pmcid = np.stack([pmcids[has_pmcid], pmids[has_pmcid]])
+    by_pmid = np.stack([pmids[has_pmid], pmcids[has_pmid]])
+
+    columns = {
+        BY_PMCID_FILE_NAME: by_pmcid[:, np.argsort(by_pmcid[0], kind="stable")],
+        BY_PMID_FILE_NAME: by_pmid[:, np.argsort(by_pmid[0], kind="stable")],
+    }
+    manifest = ColumnarResultsManifest(
+        version=COLUMNAR_RESULTS_VERSION,
+        nb_articles=int(pmcids.size),
+        nb_pmcids=int(has_pmcid.sum()),
+        nb_pmids=int(has_pmid.sum()),
+    )
+
+    folder.mkdir(parents=True, exist_ok=True)
+    # each file is written aside then replaces the previous one, manifest last: readers never see
+    # a partial file, and those still mapping previous columns keep reading them
+    for file_name, column in columns.items():
+        temporary_path = folder / f".tmp-{file_name}"
+        np.save(temporary_path, column)
+        temporary_path.replace(folder / file_name)
+    temporary_path = folder / f".tmp-{MANIFEST_FILE_NAME}"
+    store_data_as_json(manifest, temporary_path)
+    temporary_path.replace(folder / MANIFEST_FILE_NAME)
+    logger.info(f"Stored {pmcids.size} article ids as columns into {folder}")
+
+
+def load_columnar_results(folder: Path) -> ColumnarResults:
+    """Memory-map columnar results, in milliseconds whatever their size.
+
+    Raises:
+        ValueError: if columns are incomplete, being replaced or of another version
+
+    """
+    manifest_file = folder / MANIFEST_FILE_NAME
+    if not manifest_file.exists():
+        msg = f"No complete columnar results in {folder}"
+        raise ValueError(msg)
+
+    manifest = load_data_from_json(manifest_file)
+    if manifest["version"] != COLUMNAR_RESULTS_VERSION:
+        msg = f"Columnar results of version {manifest['version']} cannot be read"
+        raise ValueError(msg)
+
+    by_pmcid = np.load(folder / BY_PMCID_FILE_NAME, mmap_mode="r")
+    by_pmid = np.load(folder / BY_PMID_FILE_NAME, mmap_mode="r")
+    if (by_pmcid.shape[1], by_pmid.shape[1]) != (manifest["nb_pmcids"], manifest["nb_pmids"]):
+        msg = f"Columnar results in {folder} are being replaced, load them again"
+        raise ValueError(msg)
+
+    return ColumnarResults(by_pmcid=by_pmcid, by_pmid=by_pmid, manifest=manifest)
+
+
+def as_pmcid_array(pmcids: np.ndarray | Iterable[str]) -> np.ndarray:
+    """Convert PMC ids ("PMC9848274" or 9848274) to a numeric array."""
+    if isinstance(pmcids, np.ndarray):
+        return pmcids.astype(ID_DTYPE)
+    return np.fromiter(map(encode_pmcid, pmcids), dtype=ID_DTYPE)
+
+
+def as_pmid_array(pmids: np.ndarray | Iterable[str]) -> np.ndarray:
+    """Convert PubMed ids ("36645057" or 36645057) to a numeric array."""
+    if isinstance(pmids, np.ndarray):
+        return pmids.astype(ID_DTYPE)
+    return np.fromiter(map(encode_pmid, pmids), dtype=ID_DTYPE)
+
+
+def contains_pmcids(results: ColumnarResults, pmcids: np.ndarray | Iterable[str]) -> np.ndarray:
+    """Check if each PMC id was found, with a binary search in O(log n) by id.
+
+    Args:
+        results (ColumnarResults): loaded results
+        pmcids (np.ndarray | Iterable[str]): numeric array or PMC ids with prefix
+
+    Returns:
+        np.ndarray: boolean array, True for found ids
+
+    Examples:
+        >> results = load_columnar_results(Path("submission_results/retrieved_ids_columns"))
+        >> contains_pmcids(results, ["PMC9848274", "PMC1"])
+        array([ True, False])
+
+    """
+    pmcids = as_pmcid_array(pmcids)
+    return is_in_sorted(pmcids, results["by_pmcid"][0]) & (pmcids != NULL_ID)
+
+
+def contains_pmids(results: ColumnarResults, pmids: np.ndarray | Iterable[str]) -> np.ndarray:
+    """Check if each PubMed id was found, see `contains_pmcids`."""
+    pmids = as_pmid_array(pmids)
+    return is_in_sorted(pmids, results["by_pmid"][0]) & (pmids != NULL_ID)
+
+
+def lookup_pmids(results: ColumnarResults, pmcids: np.ndarray | Iterable[str]) -> np.ndarray:
+    """Find the PubMed id of each PMC id, `NULL_ID` if not found or without PubMed id."""
+    return lookup_ids(results["by_pmcid"], as_pmcid_array(pmcids))
+
+
+def lookup_pmcids(results: ColumnarResults, pmids: np.ndarray | Iterable[str]) -> np.ndarray:
+    """Find the PMC id (numeric part) of each PubMed id, `NULL_ID` if not found or without one."""
+    return lookup_ids(results["by_pmid"], as_pmid_array(pmids))
@@ -31,13 +31,8 @@ HEMOSTATIC_DEVICES = {
     "Cryoseal": ["Fibrin system", "FS", "Thermogenesis"],
 }
 
-HEMOSTATIC_DEVICES_FLAT = flatten_dict_to_list(HEMOSTATIC_DEVICES)
-
-
 HEMOSTATIC_DEVICES_MINI = dict(list(HEMOSTATIC_DEVICES.items())[:10])
 
-HEMOSTATIC_DEVICES_MINI_FLAT = flatten_dict_to_list(HEMOSTATIC_DEVICES_MINI)
-
 
 UROLOGY_INDICATORS = {
     "Urology Indicators": [
@@ -186,7 +181,23 @@ UROLOGY_INDICATORS = {
     ],
 }
 
-UROLOGY_INDICATORS_FLAT = flatten_dict_to_list(UROLOGY_INDICATORS)
-
 UROLOGY_INDICATORS_MINI = {k: v[:10] for k, v in UROLOGY_INDICATORS.items()}
-UROLOGY_INDICATORS_MINI_FLAT = flatten_dict_to_list(UROLOGY_INDICATORS_MINI)
+
+
+TERMS_BY_FLAT_NAME = {
+    "HEMOSTATIC_DEVICES_FLAT": HEMOSTATIC_DEVICES,
+    "HEMOSTATIC_DEVICES_MINI_FLAT": HEMOSTATIC_DEVICES_MINI,
+    "UROLOGY_INDICATORS_FLAT": UROLOGY_INDICATORS,
+    "UROLOGY_INDICATORS_MINI_FLAT": UROLOGY_INDICATORS_MINI,
+}
+"""Terms flattened on first access of their `*_FLAT` name only, see `__getattr__`"""
+
+
+def __getattr__(name: str) -> list[str]:
+    """Flatten terms on first access, then keep them as a module attribute."""
+    if name not in TERMS_BY_FLAT_NAME:
+        msg = f"module {__name__!r} has no attribute {name!r}"
+        raise AttributeError(msg)
+    flat_terms = flatten_dict_to_list(TERMS_BY_FLAT_NAME[name])
+    globals()[name] = flat_terms
+    return flat_terms
@@ -1,40 +1,71 @@
-from collections import Counter
 from collections.abc import Callable
 from pathlib import Path
 from typing import TYPE_CHECKING
 
 from loguru import logger
 
+from src.article_ids_index import (
+    ArticleIdsIndex,
+    add_article_ids,
+    count_conflicting_article_ids,
+    count_unique_article_ids,
+    create_article_ids_index,
+    indexed_article_ids,
+)
+from src.article_store import ArticleStore, upsert_article_ids
+from src.background_writer import BackgroundWriter, submit_json_write
 from src.eutils_retrieval.api import NCBIDatabase
 from src.eutils_retrieval.extract import extract_all_db_article_ids
 from src.eutils_retrieval.search import (
+    MAX_ALLOWED_SEARCH_UIDS,
     ArticleIds,
     StorageInfos,
-    fetch_all_stored_articles,
+    iter_articles_by_uids,
+    iter_stored_articles,
     search_and_store,
 )
-from src.utils import add_timer_and_logger, store_data_as_json
+from src.query_plan import sub_query_id
+from src.term_statistics import TermStatistics, update_term_statistics
+from src.tracing import trace_span
+from src.utils import add_timer_and_logger
 
 if TYPE_CHECKING:
     from collections.abc import Callable  # pragma: no cover
 
 
-def ncbi_search_and_fetch(
+def ncbi_search_and_fetch(  # noqa: PLR0913
     queries: tuple[str, ...],
     db: tuple[NCBIDatabase, ...] | NCBIDatabase,
     folder: Path | None = None,
+    term_statistics: TermStatistics | None = None,
+    entry_date_range: tuple[str, str] | None = None,
+    *,
+    article_ids_index: ArticleIdsIndex | None = None,
+    article_store: ArticleStore | None = None,
+    intermediate_writer: BackgroundWriter | None = None,
 ) -> list[ArticleIds]:
     """Search for all articles and fetch summary based on queries given.
 
-    Will de-duplicate results to avoid redundancy across databases.
+    Will de-duplicate results to avoid redundancy across databases, as they arrive.
 
     Args:
         queries (list[str]): queries to find specific articles across databases.
         db (tuple[NCBIDatabase, ...] | NCBIDatabase): Databases source for article search.
-        folder (Path, optional): can be given to store intermediate findings for each query.
+        folder (Path, optional): can be given to store intermediate findings for each query,
+            in a sub folder named by the query stable id.
+        term_statistics (TermStatistics, optional): updated in place with the number of articles
+            matching each term of queries, given by search responses.
+        entry_date_range (tuple[str, str], optional): only search articles added to databases
+            between those dates (YYYY/MM/DD).
+        article_ids_index (ArticleIdsIndex, optional): index fed with found article ids, can be
+            given to de-duplicate them with articles previously found.
+        article_store (ArticleStore, optional): if given, found article ids are upserted into it,
+            with the query and database that found them.
+        intermediate_writer (BackgroundWriter, optional): if given, intermediate findings are
+            stored by this background writer, not to delay next queries.
 
     Returns:
-        list[ArticleIds]: all article ids found based on queries.
+        list[ArticleIds]: all article ids found based on queries, and already in the index.
 
     """
     search_method_by_db: Callable = {
@@ -42,104 +73,274 @@ def ncbi_search_and_fetch(
         NCBIDatabase.PUB_MED: pub_med_search_and_fetch,
     }.get(db, pubmed_pmc_cross_search)
 
-    results = []
+    if article_ids_index is None:
+        article_ids_index = create_article_ids_index()
     db_label = db.value if not isinstance(db, tuple) else tuple(d.value for d in db)
     logger.info(
         f"Will run {len(queries)} queries on {db_label}",
     )
     for counter, query in enumerate(queries):
         prefix_log = f"({counter + 1}/{len(queries)}) "
-        query_folder = folder / str(counter) if folder else None
+        query_folder = folder / sub_query_id(query) if folder else None
 
-        partial_results = search_method_by_db(query, query_folder, prefix_log=prefix_log)
-        results.extend(partial_results)
+        with trace_span("query", query_id=sub_query_id(query)):
+            search_method_by_db(
+                query,
+                query_folder,
+                term_statistics=term_statistics,
+                entry_date_range=entry_date_range,
+                article_ids_index=article_ids_index,
+                article_store=article_store,
+                intermediate_writer=intermediate_writer,
+                prefix_log=prefix_log,
+            )
+        logger.info(f"{count_unique_article_ids(article_ids_index)} unique articles found so far")
 
-    return merge_article_ids(results)
+    log_conflicting_article_ids(article_ids_index)
+    return indexed_article_ids(article_ids_index)
 
 
 @add_timer_and_logger(task_description="PubMed and PMC databases cross-search")
-def pubmed_pmc_cross_search(query: str, folder: Path | None = None) -> list[ArticleIds]:
+def pubmed_pmc_cross_search(  # noqa: PLR0913
+    query: str,
+    folder: Path | None = None,
+    term_statistics: TermStatistics | None = None,
+    entry_date_range: tuple[str, str] | None = None,
+    *,
+    article_ids_index: ArticleIdsIndex | None = None,
+    article_store: ArticleStore | None = None,
+    intermediate_writer: BackgroundWriter | None = None,
+) -> list[ArticleIds]:
     """Search for articles matching the query and optional date range.
 
     Args:
         query (str): Search query string
         folder (Path, optional): if given, store intermediate search from each db before merging
+        term_statistics (TermStatistics, optional): if given, updated with query terms counts
+        entry_date_range (tuple[str, str], optional): only search articles added between dates
+        article_ids_index (ArticleIdsIndex, optional): if given, fed with found ids page by page
+        article_store (ArticleStore, optional): if given, found ids are upserted into it
+        intermediate_writer (BackgroundWriter, optional): if given, stores intermediate search in it
 
     Returns:
         list[ArticleIds]: List of dictionaries containing article information
 
     """
-    pmc_article_ids = pmc_search_and_fetch(query, folder=folder)
-    pub_med_article_ids = pub_med_search_and_fetch(query, folder=folder)
+    pmc_article_ids = pmc_search_and_fetch(
+        query,
+        folder=folder,
+        term_statistics=term_statistics,
+        entry_date_range=entry_date_range,
+        article_ids_index=article_ids_index,
+        article_store=article_store,
+        intermediate_writer=intermediate_writer,
+    )
+    # articles found in PMC with their pmid do not need their PubMed summary
+    pub_med_article_ids = pub_med_search_and_fetch(
+        query,
+        folder=folder,
+        term_statistics=term_statistics,
+        entry_date_range=entry_date_range,
+        article_ids_index=article_ids_index,
+        article_store=article_store,
+        intermediate_writer=intermediate_writer,
+        known_pmids={a["pmid"] for a in pmc_article_ids if a["pmid"]},
+    )
 
     return [*pmc_article_ids, *pub_med_article_ids]
 
 
 @add_timer_and_logger(task_description="PMC database search and fetch")
-def pmc_search_and_fetch(query: str, folder: Path | None = None) -> list[ArticleIds]:
+def pmc_search_and_fetch(  # noqa: PLR0913
+    query: str,
+    folder: Path | None = None,
+    term_statistics: TermStatistics | None = None,
+    entry_date_range: tuple[str, str] | None = None,
+    *,
+    article_ids_index: ArticleIdsIndex | None = None,
+    article_store: ArticleStore | None = None,
+    intermediate_writer: BackgroundWriter | None = None,
+) -> list[ArticleIds]:
     """Search PMC database for articles matching the given query.
 
     Args:
         query (str): Search query string
         folder (Path, optional): if given, store intermediate search from each db before merging
+        term_statistics (TermStatistics, optional): if given, updated with query terms counts
+        entry_date_range (tuple[str, str], optional): only search articles added between dates
+        article_ids_index (ArticleIdsIndex, optional): if given, fed with found ids page by page
+        article_store (ArticleStore, optional): if given, found ids are upserted into it
+        intermediate_writer (BackgroundWriter, optional): if given, stores intermediate search in it
 
     Returns:
         list: List of dictionaries containing 'pmcid' and 'pmid' (when available)
 
     """
-    storage_infos: StorageInfos = search_and_store(query, db=NCBIDatabase.PMC)
-    if storage_infos is None or storage_infos["total_results"] == 0:
+    storage_infos: StorageInfos | None = search_and_store(
+        query,
+        db=NCBIDatabase.PMC,
+        entry_date_range=entry_date_range,
+    )
+    if storage_infos is None:
         logger.info("Found no articles in PMC")
         return []
 
-    result_set = fetch_all_stored_articles(storage_infos)
+    if term_statistics is not None:
+        update_term_statistics(
+            term_statistics,
+            NCBIDatabase.PMC,
+            storage_infos.get("term_counts", {}),
+        )
 
-    if not result_set:
+    if storage_infos["total_results"] == 0:
         logger.info("Found no articles in PMC")
         return []
 
-    pmc_article_ids = extract_all_db_article_ids(result_set, db=NCBIDatabase.PMC)
+    pmc_article_ids = fetch_and_index_article_ids(storage_infos, article_ids_index)
+
+    if not pmc_article_ids:
+        logger.info("Found no articles in PMC")
+        return []
 
     logger.info(f"Found {len(pmc_article_ids)} articles in PMC")
 
     if folder:
-        store_data_as_json(pmc_article_ids, folder / f"{NCBIDatabase.PMC.value}.json")
+        submit_json_write(
+            intermediate_writer,
+            pmc_article_ids,
+            folder / f"{NCBIDatabase.PMC.value}.json",
+        )
+    if article_store is not None:
+        upsert_article_ids(
+            article_store,
+            pmc_article_ids,
+            query_id=sub_query_id(query),
+            db=NCBIDatabase.PMC,
+        )
 
     return pmc_article_ids
 
 
 @add_timer_and_logger(task_description="PubMed database search adn fetch")
-def pub_med_search_and_fetch(query: str, folder: Path | None = None) -> list[ArticleIds]:
+def pub_med_search_and_fetch(  # noqa: PLR0913
+    query: str,
+    folder: Path | None = None,
+    term_statistics: TermStatistics | None = None,
+    entry_date_range: tuple[str, str] | None = None,
+    *,
+    article_ids_index: ArticleIdsIndex | None = None,
+    article_store: ArticleStore | None = None,
+    intermediate_writer: BackgroundWriter | None = None,
+    known_pmids: set[str] | None = None,
+) -> list[ArticleIds]:
     """Search Pub Med database for articles matching the given query.
 
     Args:
         query (str): Search query string
         folder (Path, optional): if given, store intermediate search from each db before merging
+        term_statistics (TermStatistics, optional): if given, updated with query terms counts
+        entry_date_range (tuple[str, str], optional): only search articles added between dates
+        article_ids_index (ArticleIdsIndex, optional): if given, fed with found ids page by page
+        article_store (ArticleStore, optional): if given, found ids are upserted into it
+        intermediate_writer (BackgroundWriter, optional): if given, stores intermediate search in it
+        known_pmids (set[str], optional): pmids of articles already known with their pmcid, e.g.
+            found in PMC by the same query. Their summary is not fetched, nor returned.
 
     Returns:
         list: List of dictionaries containing 'pmcid' and 'pmid' (when available)
 
+    Notes:
+        With `known_pmids`, uids of found articles are returned by the search request itself, to
+        only fetch summaries of unknown ones. If there are more than `MAX_ALLOWED_SEARCH_UIDS`,
+        all summaries are fetched.
+
     """
-    storage_infos: StorageInfos = search_and_store(query, db=NCBIDatabase.PUB_MED)
-    if storage_infos is None or storage_infos["total_results"] == 0:
+    storage_infos: StorageInfos | None = search_and_store(
+        query,
+        db=NCBIDatabase.PUB_MED,
+        entry_date_range=entry_date_range,
+        nb_uids=MAX_ALLOWED_SEARCH_UIDS if known_pmids else None,
+    )
+    if storage_infos is None:
         logger.info("Found no articles in PubMed")
         return []
 
-    result_set = fetch_all_stored_articles(storage_infos)
+    if term_statistics is not None:
+        update_term_statistics(
+            term_statistics,
+            NCBIDatabase.PUB_MED,
+            storage_infos.get("term_counts", {}),
+        )
 
-    if not result_set:
+    if storage_infos["total_results"] == 0:
+        logger.info("Found no articles in PubMed")
+        return []
+
+    if known_pmids and "uids" in storage_infos:
+        storage_infos["uids"] = [uid for uid in storage_infos["uids"] if uid not in known_pmids]
+        logger.info(
+            f"Skipping summaries of {storage_infos['total_results'] - len(storage_infos['uids'])}"
+            f"/{storage_infos['total_results']} articles found in PubMed and already known",
+        )
+
+    pub_med_article_ids = fetch_and_index_article_ids(storage_infos, article_ids_index)
+
+    if not pub_med_article_ids:
         logger.info("Found no articles in PubMed")
         return []
 
-    pub_med_article_ids = extract_all_db_article_ids(result_set, db=NCBIDatabase.PUB_MED)
     logger.info(f"Found {len(pub_med_article_ids)} articles in PubMed")
 
     if folder:
-        store_data_as_json(pub_med_article_ids, folder / f"{NCBIDatabase.PUB_MED.value}.json")
+        submit_json_write(
+            intermediate_writer,
+            pub_med_article_ids,
+            folder / f"{NCBIDatabase.PUB_MED.value}.json",
+        )
+    if article_store is not None:
+        upsert_article_ids(
+            article_store,
+            pub_med_article_ids,
+            query_id=sub_query_id(query),
+            db=NCBIDatabase.PUB_MED,
+        )
 
     return pub_med_article_ids
 
 
+def fetch_and_index_article_ids(
+    storage_infos: StorageInfos,
+    article_ids_index: ArticleIdsIndex | None = None,
+) -> list[ArticleIds]:
+    """Fetch stored articles page by page, and extract their ids.
+
+    Args:
+        storage_infos (StorageInfos): Minimal infos needed to retrieve previously queried articles,
+            only articles of its `uids` are fetched if given
+        article_ids_index (ArticleIdsIndex, optional): if given, fed with ids of each page as soon
+            as it arrives
+
+    Returns:
+        list[ArticleIds]: ids of all stored articles
+
+    """
+    if "uids" in storage_infos:
+        pages = iter_articles_by_uids(storage_infos["db"], storage_infos["uids"])
+    else:
+        pages = iter_stored_articles(storage_infos)
+
+    article_ids = []
+    for stored_articles in pages:
+        with trace_span("extract ids", db=storage_infos["db"].value):
+            page_article_ids = extract_all_db_article_ids(stored_articles, db=storage_infos["db"])
+        if article_ids_index is not None:
+            with trace_span("index ids", nb_article_ids=len(page_article_ids)):
+                add_article_ids(article_ids_index, page_article_ids)
+        article_ids.extend(page_article_ids)
+
+    return article_ids
+
+
 @add_timer_and_logger("Merging and de-duplicating article ids from multiple sources")
 def merge_article_ids(*article_ids_collections: list[ArticleIds]) -> list[ArticleIds]:
     """Retrieve when possible, all unique couple ids that identifies an article in both databases.
@@ -153,117 +354,33 @@ def merge_article_ids(*article_ids_collections: list[ArticleIds]) -> list[Articl
         )
         [
             {'id_1': 1, 'id_2': a},
-            {'id_1': 3, 'id_2': Null},
             {'id_1': 2, 'id_2': b},
+            {'id_1': 3, 'id_2': Null},
             {'id_1': Null, 'id_2': c}
         ]
 
     Returns:
         list (ArticleIds): unique couples of article identifiers in both databases
 
+    Notes:
+        See `add_article_ids` to de-duplicate articles as they arrive instead.
+
     """
-    all_article_ids = []
+    article_ids_index = create_article_ids_index()
+    original_nb_articles = 0
     for article_ids_collection in article_ids_collections:
-        all_article_ids.extend(article_ids_collection)
-
-    original_nb_articles = len(all_article_ids)
-
-    # using tuples to be able to hash when using set. unique hash is assured via
-    # positioning and str type
-    unique_article_ids: set = {
-        (a["pmcid"], a["pmid"])
-        for a in all_article_ids
-        if (a["pmcid"] is not None or a["pmid"] is not None)
-    }
-    unique_article_ids = keep_tuple_with_most_infos(unique_article_ids)
-
-    nb_unique_article_ids = len(unique_article_ids)
-    if nb_unique_article_ids != original_nb_articles:
-        logger.debug(
-            f"Deduplication moved nb of articles from {original_nb_articles} "
-            f"to {nb_unique_article_ids}",
-        )
-        return [ArticleIds(pmcid=t[0], pmid=t[1]) for t in unique_article_ids]
-
-    logger.debug("No duplication detected.")
-    return all_article_ids
-
-
-def keep_tuple_with_most_infos(data: set[tuple[str | None, str | None]]) -> set[tuple[str, str]]:
-    """Will deduplicate a collection of unique tuples with 2 elements.
-
-     Keeping the one with no None value in it.
+        add_article_ids(article_ids_index, article_ids_collection)
+        original_nb_articles += len(article_ids_collection)
 
-    Args:
-        data (set[tuple]): data to deduplicate
-
-    Returns:
-        set[tuple]: data deduplicated
+    log_conflicting_article_ids(article_ids_index)
+    logger.debug(
+        f"Deduplication moved nb of articles from {original_nb_articles} "
+        f"to {count_unique_article_ids(article_ids_index)}",
+    )
+    return indexed_article_ids(article_ids_index)
 
-    Examples:
-        >> data = {
-            ("a", "b"), ("a", None),  # duplicated first key
-            ("aa", "bb"), ("aa", None),  # duplicated first key
-            ("1", None), #  not duplicated
-            ("c", "d"), (None, "d"),  # duplicated second key
-            ("cc", "dd"), (None, "dd"), # duplicated second key
-            (None, "2"),  #  not duplicated
-            ("zz", "zz"),  #  not duplicated
-        }
-        >> keep_tuple_with_most_infos(data)
-        {("a", "b"), ("aa", "bb"), ("c", "d"), ("cc", "dd"), ("1", None), (None, "2"), ("zz", "zz")}
 
-    """
-    # identify all first keys that are duplicated
-    duplicated_first_elements = [
-        e for e, count in Counter(e[0] for e in data if e[0] is not None).items() if count > 1
-    ]
-
-    # identify all second keys that are duplicated
-    duplicated_second_elements = [
-        e for e, count in Counter(e[1] for e in data if e[1] is not None).items() if count > 1
-    ]
-
-    duplicated_element_by_first = {e: [] for e in duplicated_first_elements}
-    duplicated_element_by_second = {e: [] for e in duplicated_second_elements}
-
-    # Iterate only once to classify and identify whole tuple duplicates
-    for element in data:
-        if element[0] in duplicated_first_elements:
-            duplicated_element_by_first[element[0]].append(element)
-        if element[1] in duplicated_second_elements:
-            duplicated_element_by_second[element[1]].append(element)
-
-    # 1. Remove duplicates for 1st key
-    max_duplicates_allowed = 2
-    # since tuples are all unique, if the number of duplicates is greater than 2,
-    # there are multiple ids for the same article in a db ?!
-    for duplicated_first_element, duplicates in duplicated_element_by_first.items():
-        # since tuples are all unique, there are multiple ids for the same article in a db ?!
-        if len(duplicates) > max_duplicates_allowed:
-            msg = f"Too many duplicates for 1st key={duplicated_first_element}\n{duplicates}"
-            raise ValueError(msg)
-
-        # will choose duplicates that has the most values i.e.
-        # for [(value, None), (value, other_value)] we will choose (value, other_value)
-        # if duplicated, has only 2 duplicates
-        if duplicates[0][1] is None:
-            data.remove(duplicates[0])
-        else:
-            data.remove(duplicates[1])
-
-    # 1. Remove duplicates for 2st key
-    for duplicated_second_element, duplicates in duplicated_element_by_second.items():
-        if len(duplicates) > max_duplicates_allowed:
-            msg = (f"Too many duplicates for 2nd key={duplicated_second_element}\n{duplicates}",)
-            raise ValueError(msg)
-
-        # will choose duplicates that has the most values i.e.
-        # for [(None, other_value), (value, other_value)] we will choose (value, other_value)
-        # if duplicated, has only 2 duplicates
-        if duplicates[0][0] is None:
-            data.remove(duplicates[0])
-        else:
-            data.remove(duplicates[1])
-
-    return data
+def log_conflicting_article_ids(article_ids_index: ArticleIdsIndex) -> None:
+    """Warn about articles with multiple ids in the same database, all kept by the index."""
+    if nb_conflicts := count_conflicting_article_ids(article_ids_index):
+        logger.warning(f"Found {nb_conflicts} articles with multiple ids in the same database")
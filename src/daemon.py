@@ -0,0 +1,473 @@
+import json
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from functools import partial
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, NotRequired, TypedDict
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+from src.batch_retrieval import search_query_article_ids
+from src.eutils_retrieval.api import NCBIDatabase, close_eutils_clients, nb_coalesced_calls
+from src.packed_article_ids import PackedArticleIds, merge_packed_article_ids, unpack_article_ids
+from src.query_plan import QUERY_PLANS_FOLDER_NAME, db_names, load_or_create_query_plan
+from src.term_statistics import (
+    TERM_STATISTICS_FILE_NAME,
+    TermStatistics,
+    known_term_counts,
+    load_term_statistics,
+    merge_term_statistics,
+)
+from src.utils import store_data_as_json
+
+DAEMON_FOLDER_NAME = "daemon"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+MAX_CONCURRENT_JOBS = 1
+"""Nb of jobs run at the same time, others wait in queue"""
+
+QUERY_CACHE_MAX_AGE = 3600.0
+"""Seconds during which articles found by a query are reused by next jobs, evicted after"""
+
+MAX_FINISHED_JOBS = 100
+"""Nb of finished jobs kept with their results, the oldest ones being evicted first"""
+
+PROGRESS_TIMEOUT = 30.0
+"""Max seconds between two progress lines, the same progress being sent again after"""
+
+
+class JobStatus(str, Enum):
+    """Status of a retrieval job."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class JobRequest(TypedDict):
+    """Retrieval job, as posted to the daemon.
+
+    Attributes:
+        devices (list[str]): devices and related terms
+        indicators (list[str]): indicators and related terms
+        start_year (int, optional): first year of publication
+        end_year (int, optional): last year of publication
+        db (list[str], optional): names of databases to search, all by default
+
+    """
+
+    devices: list[str]
+    indicators: list[str]
+    start_year: NotRequired[int | None]
+    end_year: NotRequired[int | None]
+    db: NotRequired[list[str]]
+
+
+class Job(TypedDict):
+    """Retrieval job and its progress.
+
+    Attributes:
+        id (str): job identifier
+        status (JobStatus): status of the job
+        nb_queries (int): nb of queries planned, 0 until planned
+        nb_done_queries (int): nb of queries done, searched or reused from cache
+        nb_cached_queries (int): nb of queries reused from cache
+        nb_results (int): nb of unique articles found, once done
+        error (str | None): error raised, if failed
+        article_ids (PackedArticleIds | None): unique articles found, once done
+
+    """
+
+    id: str
+    status: JobStatus
+    nb_queries: int
+    nb_done_queries: int
+    nb_cached_queries: int
+    nb_results: int
+    error: str | None
+    article_ids: PackedArticleIds | None
+
+
+class CachedQuery(TypedDict):
+    """Articles found by a query, kept in memory by the daemon.
+
+    Attributes:
+        cached_at (float): monotonic time of the search, in seconds
+        article_ids (PackedArticleIds): unique articles found
+
+    """
+
+    cached_at: float
+    article_ids: PackedArticleIds
+
+
+class DaemonState(TypedDict):
+    """State kept warm by the daemon across jobs.
+
+    Attributes:
+        folder (Path): folder of query plans and term statistics
+        term_statistics (TermStatistics): statistics updated by all jobs
+        query_cache (dict[tuple[str, tuple[str, ...]], CachedQuery]): articles found by query and
+            databases, for `QUERY_CACHE_MAX_AGE`
+        jobs (dict[str, Job]): all jobs by id, up to `MAX_FINISHED_JOBS` finished ones
+        executor (ThreadPoolExecutor): runs jobs, `MAX_CONCURRENT_JOBS` at a time by default
+        condition (threading.Condition): guards jobs and cache, notified on any job change
+
+    """
+
+    folder: Path
+    term_statistics: TermStatistics
+    query_cache: dict[tuple[str, tuple[str, ...]], CachedQuery]
+    jobs: dict[str, Job]
+    executor: ThreadPoolExecutor
+    condition: threading.Condition
+
+
+def create_daemon_state(
+    folder: Path,
+    max_concurrent_jobs: int = MAX_CONCURRENT_JOBS,
+) -> DaemonState:
+    """Create daemon state, with term statistics stored by previous runs."""
+    return DaemonState(
+        folder=folder,
+        term_statistics=load_term_statistics(folder / TERM_STATISTICS_FILE_NAME),
+        query_cache={},
+        jobs={},
+        executor=ThreadPoolExecutor(max_workers=max_concurrent_jobs),
+        condition=threading.Condition(),
+    )
+
+
+def validate_job_request(payload: Any) -> JobRequest:  # noqa: ANN401
+    """Check a posted job request.
+
+    Raises:
+        TypeError: if request is not a json object, or a year is not an integer
+        ValueError: if a field is missing or invalid
+
+    """
+    if not isinstance(payload, dict):
+        msg = "Job request should be a json object"
+        raise TypeError(msg)
+    for field in ("devices", "indicators"):
+        terms = payload.get(field)
+        if not terms or not isinstance(terms, list) or not all(isinstance(t, str) for t in terms):
+            msg = f"Field {field} should be a non empty list of terms"
+            raise ValueError(msg)
+    unknown_dbs = set(payload.get("db", [])) - {d.value for d in NCBIDatabase}
+    if unknown_dbs:
+        msg = f"Unknown databases {sorted(unknown_dbs)}"
+        raise ValueError(msg)
+    for field in ("start_year", "end_year"):
+        year = payload.get(field)
+        if year is not None and (not isinstance(year, int) or isinstance(year, bool)):
+            msg = f"Field {field} should be an integer year"
+            raise TypeError(msg)
+    start_year, end_year = payload.get("start_year"), payload.get("end_year")
+    if start_year is not None and end_year is not None and start_year > end_year:
+        msg = f"Start year {start_year} is after end year {end_year}"
+        raise ValueError(msg)
+    return payload
+
+
+def submit_job(state: DaemonState, job_request: JobRequest) -> dict:
+    """Queue a retrieval job, run as soon as a worker is available.
+
+    Returns:
+        dict: summary of the queued job, see `job_summary`
+
+    """
+    job = Job(
+        id=uuid.uuid4().hex[:12],
+        status=JobStatus.QUEUED,
+        nb_queries=0,
+        nb_done_queries=0,
+        nb_cached_queries=0,
+        nb_results=0,
+        error=None,
+        article_ids=None,
+    )
+    with state["condition"]:
+        evict_finished_jobs(state)
+        state["jobs"][job["id"]] = job
+        summary = job_summary(job)
+    state["executor"].submit(run_job, state, job["id"], job_request)
+    logger.info(f"Queued job {job['id']}")
+    return summary
+
+
+def update_job(state: DaemonState, job_id: str, **changes: Any) -> None:  # noqa: ANN401
+    """Update a job in place, and notify all waiting for its progress."""
+    with state["condition"]:
+        state["jobs"][job_id].update(changes)
+        state["condition"].notify_all()
+
+
+def evict_finished_jobs(state: DaemonState) -> None:
+    """Drop the oldest finished jobs beyond `MAX_FINISHED_JOBS`, with their results.
+
+    Must be called holding `state["condition"]`.
+    """
+    finished_job_ids = [job_id for job_id, job in state["jobs"].items() if is_finished(job)]
+    for job_id in finished_job_ids[: max(len(finished_job_ids) - MAX_FINISHED_JOBS, 0)]:
+        del state["jobs"][job_id]
+
+
+def evict_outdated_queries(state: DaemonState) -> None:
+    """Drop articles of queries searched more than `QUERY_CACHE_MAX_AGE` ago.
+
+    Must be called holding `state["condition"]`.
+    """
+    now = time.monotonic()
+    outdated_keys = [
+        cache_key
+        for cache_key, cached_query in state["query_cache"].items()
+        if now - cached_query["cached_at"] >= QUERY_CACHE_MAX_AGE
+    ]
+    for cache_key in outdated_keys:
+        del state["query_cache"][cache_key]
+
+
+def search_query_with_cache(
+    state: DaemonState,
+    query: str,
+    db: tuple[NCBIDatabase, ...] | NCBIDatabase,
+    term_statistics: TermStatistics,
+) -> tuple[PackedArticleIds, bool]:
+    """Search a query across databases, unless searched by a job less than an hour ago.
+
+    Args:
+        state (DaemonState): daemon state, with the query cache
+        query (str): query to search
+        db (tuple[NCBIDatabase, ...] | NCBIDatabase): databases to search
+        term_statistics (TermStatistics): statistics of the job, updated with query terms counts
+
+    Returns:
+        tuple[PackedArticleIds, bool]: unique articles found, and whether they come from cache
+
+    """
+    cache_key = (query, tuple(db_names(db)))
+    with state["condition"]:
+        cached_query = state["query_cache"].get(cache_key)
+    if cached_query and time.monotonic() - cached_query["cached_at"] < QUERY_CACHE_MAX_AGE:
+        return cached_query["article_ids"], True
+
+    article_ids = search_query_article_ids(query, db, term_statistics=term_statistics)
+    with state["condition"]:
+        evict_outdated_queries(state)
+        state["query_cache"][cache_key] = CachedQuery(
+            cached_at=time.monotonic(),
+            article_ids=article_ids,
+        )
+    return article_ids, False
+
+
+def run_job(state: DaemonState, job_id: str, job_request: JobRequest) -> None:
+    """Run a retrieval job, reusing articles found by queries of previous jobs.
+
+    Queries are planned as `ncbi_article_retrieval` does (terms known to match no article are
+    pruned), and each query not in cache (or
+    outdated, see `QUERY_CACHE_MAX_AGE`) is searched across databases. Term statistics are
+    gathered by job, then merged into the shared ones and stored under lock.
+    """
+    update_job(state, job_id, status=JobStatus.RUNNING)
+    try:
+        dbs = tuple(NCBIDatabase(name) for name in job_request.get("db", [])) or tuple(
+            NCBIDatabase,
+        )
+        db = dbs[0] if len(dbs) == 1 else dbs
+        with state["condition"]:
+            term_counts = known_term_counts(state["term_statistics"], db)
+        query_plan = load_or_create_query_plan(
+            job_request["devices"],
+            job_request["indicators"],
+            year_bounds=(job_request.get("start_year"), job_request.get("end_year")),
+            db=db,
+            folder=state["folder"] / QUERY_PLANS_FOLDER_NAME,
+            term_counts=term_counts,
+        )
+        queries = [sub_query["query"] for sub_query in query_plan["sub_queries"]]
+        update_job(state, job_id, nb_queries=len(queries))
+
+        article_ids_by_query = []
+        term_statistics: TermStatistics = {}
+        for query in queries:
+            article_ids, is_cached = search_query_with_cache(state, query, db, term_statistics)
+            article_ids_by_query.append(article_ids)
+            job = state["jobs"][job_id]
+            update_job(
+                state,
+                job_id,
+                nb_done_queries=job["nb_done_queries"] + 1,
+                nb_cached_queries=job["nb_cached_queries"] + is_cached,
+            )
+
+        article_ids = merge_packed_article_ids(*article_ids_by_query)
+        with state["condition"]:
+            merge_term_statistics(state["term_statistics"], term_statistics)
+            store_data_as_json(
+                state["term_statistics"],
+                state["folder"] / TERM_STATISTICS_FILE_NAME,
+            )
+        update_job(
+            state,
+            job_id,
+            status=JobStatus.DONE,
+            article_ids=article_ids,
+            nb_results=int(article_ids["pmids"].size),
+        )
+        logger.success(
+            f"Job {job_id} found {article_ids['pmids'].size} unique articles "
+            f"({nb_coalesced_calls()} identical NCBI calls saved by coalescing so far)",
+        )
+    except Exception as error:  # noqa: BLE001
+        logger.exception(f"Job {job_id} failed")
+        update_job(state, job_id, status=JobStatus.FAILED, error=str(error))
+
+
+def job_summary(job: Job) -> dict:
+    """Job as sent by the API, without its articles."""
+    return {key: value for key, value in job.items() if key != "article_ids"}
+
+
+def is_finished(job: Job | dict) -> bool:
+    """Check if a job, or its summary, is done or failed."""
+    return job["status"] in {JobStatus.DONE, JobStatus.FAILED}
+
+
+def iter_job_progress(state: DaemonState, job_id: str) -> Iterator[dict]:
+    """Yield job summary each time it changes, until job is finished."""
+    with state["condition"]:
+        job = state["jobs"][job_id]  # updated in place, even once evicted
+        summary = job_summary(job)
+    yield summary
+    while not is_finished(summary):
+        with state["condition"]:
+            state["condition"].wait_for(
+                lambda previous=summary: job_summary(job) != previous,
+                timeout=PROGRESS_TIMEOUT,
+            )
+            summary = job_summary(job)
+        yield summary
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """Local HTTP/JSON API of the daemon, see `serve`.
+
+    Routes:
+        POST /jobs: queue a job (`JobRequest`), returns its summary
+        GET /jobs: summaries of all jobs
+        GET /jobs/<id>: summary of a job
+        GET /jobs/<id>/progress: ndjson stream of job summaries, until finished
+        GET /jobs/<id>/results: ndjson stream of article ids found, once done
+    """
+
+    def __init__(self, *args: Any, state: DaemonState, **kwargs: Any) -> None:  # noqa: ANN401
+        """Handle a request with the daemon state."""
+        self.state = state
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002, ANN401
+        """Log requests with loguru instead of stderr."""
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def send_json(self, status: HTTPStatus, data: dict | list) -> None:
+        """Send a json response."""
+        body = json.dumps(data, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_ndjson(self, records: Iterator[dict]) -> None:
+        """Stream records one by line, flushed as they come."""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for record in records:
+            self.wfile.write(f"{json.dumps(record, default=str)}\n".encode())
+            self.wfile.flush()
+
+    def do_POST(self) -> None:
+        """Queue a job."""
+        if urlsplit(self.path).path != "/jobs":
+            self.send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            job_request = validate_job_request(payload)
+        except (ValueError, TypeError) as error:
+            self.send_json(HTTPStatus.BAD_REQUEST, {"error": str(error)})
+            return
+        self.send_json(HTTPStatus.ACCEPTED, submit_job(self.state, job_request))
+
+    def do_GET(self) -> None:
+        """Send jobs, their progress or their results."""
+        path = urlsplit(self.path).path
+        _, resource, *parts = path.split("/")
+        job_id, action = [*parts, None, None][:2]
+        with self.state["condition"]:
+            jobs = self.state["jobs"]
+            summaries = [job_summary(job) for job in jobs.values()] if job_id is None else []
+            job = jobs.get(job_id) if job_id is not None else None
+        if resource != "jobs" or len(parts) > 2:  # noqa: PLR2004
+            self.send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {path}"})
+        elif job_id is None:
+            self.send_json(HTTPStatus.OK, summaries)
+        elif job is None:
+            self.send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown job {job_id}"})
+        elif action is None:
+            self.send_json(HTTPStatus.OK, job_summary(job))
+        elif action == "progress":
+            self.send_ndjson(iter_job_progress(self.state, job_id))
+        elif action == "results" and job["status"] == JobStatus.DONE:
+            self.send_ndjson(iter(unpack_article_ids(job["article_ids"])))
+        elif action == "results":
+            self.send_json(HTTPStatus.CONFLICT, {"error": f"Job {job_id} is not done"})
+        else:
+            self.send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {path}"})
+
+
+def create_daemon_server(
+    state: DaemonState,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+) -> ThreadingHTTPServer:
+    """Create the HTTP server of the daemon, each request handled in its own thread."""
+    return ThreadingHTTPServer((host, port), partial(DaemonRequestHandler, state=state))
+
+
+def serve(
+    folder: Path,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    max_concurrent_jobs: int = MAX_CONCURRENT_JOBS,
+) -> None:  # pragma: no cover
+    """Run the retrieval daemon until interrupted.
+
+    Connections to NCBI (see `eutils_client`), articles found by each query, query plans and
+    term statistics stay warm across jobs, so that jobs only pay for queries never searched.
+    """
+    state = create_daemon_state(folder, max_concurrent_jobs)
+    server = create_daemon_server(state, host, port)
+    logger.info(f"Retrieval daemon listening on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info(
+            f"Stopping retrieval daemon, {nb_coalesced_calls()} identical NCBI calls saved",
+        )
+    finally:
+        server.server_close()
+        state["executor"].shutdown(cancel_futures=True)
+        close_eutils_clients()
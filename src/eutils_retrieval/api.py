@@ -1,11 +1,17 @@
+import json
+import threading
 from enum import Enum
 from http import HTTPStatus
-from typing import Literal, TypedDict
+from operator import itemgetter
+from typing import TYPE_CHECKING, Literal, NotRequired, TypedDict
 
-import httpx
-from httpx_retries import Retry, RetryTransport
 from loguru import logger
 
+from src.tracing import trace_span
+
+if TYPE_CHECKING:
+    import httpx
+
 NCBI_EUTILS_BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
 """NCBI E-utilities api url"""
 
@@ -22,6 +28,7 @@ class NCBIEndpoint(str, Enum):
 
     SEARCH = "esearch.fcgi"
     SUMMARY = "esummary.fcgi"
+    LINK = "elink.fcgi"
 
     def full_url(self) -> str:
         """Build full URL as : base_url + endpoint."""
@@ -41,14 +48,17 @@ class SummaryEndpointParams(TypedDict):
 
     Attributes:
         db: Database from which to retrieve records
+        query_key (str): stored search to retrieve records from, needs `WebEnv`
+        id (str): comma separated uids of records to retrieve, instead of a stored search
 
     """
 
     db: NCBIDatabase
-    query_key: str
-    WebEnv: str
-    retstart: int
-    retmax: int
+    query_key: NotRequired[str]
+    WebEnv: NotRequired[str]
+    id: NotRequired[str]
+    retstart: NotRequired[int]
+    retmax: NotRequired[int]
     retmode: Literal["json"]
 
 
@@ -63,6 +73,10 @@ class SearchEndpointParams(TypedDict):
         db: Database from which to retrieve records
         usehistory ("y" | "n"): store search result to be queried later
         term (str): Entrez text query
+        retmax (int): nb of uids to return in `idlist` (20 by default, 10 000 max)
+        datetype ("edat" | "pdat" | "mdat"): type of date used to limit the search
+        mindate (str): start of the date range (YYYY/MM/DD), needs `maxdate`
+        maxdate (str): end of the date range (YYYY/MM/DD), needs `mindate`
 
     """
 
@@ -70,11 +84,38 @@ class SearchEndpointParams(TypedDict):
     term: str
     usehistory: Literal["y", "n"]
     retmode: Literal["json"]
+    retmax: NotRequired[int]
+    datetype: NotRequired[Literal["edat", "pdat", "mdat"]]
+    mindate: NotRequired[str]
+    maxdate: NotRequired[str]
+
+
+class LinkEndpointParams(TypedDict):
+    """Expected params when calling link endpoint.
+
+    Notes:
+        See https://www.ncbi.nlm.nih.gov/books/NBK25499/#chapter4.ELink for all
+        attributes documentations
+
+    Attributes:
+        dbfrom: Database of given uids
+        db: Database of linked uids
+        linkname (str): link to retrieve, e.g. `pubmed_pmc`
+        id (list[str]): uids, each sent as a separate `id` parameter to get links by uid
+
+    """
+
+    dbfrom: NCBIDatabase
+    db: NCBIDatabase
+    linkname: str
+    id: list[str]
+    retmode: Literal["json"]
 
 
 PARAMS_BY_ENDPOINT = {
     NCBIEndpoint.SEARCH: SearchEndpointParams,
     NCBIEndpoint.SUMMARY: SummaryEndpointParams,
+    NCBIEndpoint.LINK: LinkEndpointParams,
 }
 
 
@@ -82,16 +123,153 @@ DEFAULT_RETRY = 3
 """Nb of allowed retry for each call"""
 
 
+EUTILS_CLIENTS: dict[int, "httpx.Client"] = {}
+"""HTTP clients shared by all calls, by nb of allowed retry"""
+EUTILS_CLIENTS_LOCK = threading.Lock()
+
+
+def eutils_client(retry: int = DEFAULT_RETRY) -> "httpx.Client":
+    """HTTP client shared by all calls with the same retry, to reuse its pooled connections.
+
+    Clients are thread safe, and kept open until `close_eutils_clients` is called. The network
+    stack (`httpx`, `httpx_retries`) is only imported by the first call, not to slow down
+    commands that never call NCBI.
+    """
+    import httpx  # noqa: PLC0415
+    from httpx_retries import Retry, RetryTransport  # noqa: PLC0415
+
+    with EUTILS_CLIENTS_LOCK:
+        if retry not in EUTILS_CLIENTS:
+            retry_transport = RetryTransport(
+                retry=Retry(total=retry, backoff_factor=0.5, allowed_methods=["GET", "POST"]),
+            )
+            EUTILS_CLIENTS[retry] = httpx.Client(
+                transport=retry_transport,
+                timeout=httpx.Timeout(10.0, read=None),
+            )
+        return EUTILS_CLIENTS[retry]
+
+
+def close_eutils_clients() -> None:
+    """Close all shared HTTP clients, next calls create new ones."""
+    with EUTILS_CLIENTS_LOCK:
+        for client in EUTILS_CLIENTS.values():
+            client.close()
+        EUTILS_CLIENTS.clear()
+
+
+class InFlightCall(TypedDict):
+    """E-utilities call being sent, awaited by identical calls made meanwhile.
+
+    Attributes:
+        done (threading.Event): set once the call returned or raised
+        content (bytes | None): raw json response, if the call succeeded, decoded by each caller
+        error (Exception | None): error raised, if the call failed
+
+    """
+
+    done: threading.Event
+    content: bytes | None
+    error: Exception | None
+
+
+IN_FLIGHT_CALLS: dict[tuple, InFlightCall] = {}
+"""Calls being sent, by endpoint, method and normalized params"""
+IN_FLIGHT_CALLS_LOCK = threading.Lock()
+
+COALESCED_CALLS_COUNTS: dict[NCBIEndpoint, int] = dict.fromkeys(NCBIEndpoint, 0)
+"""Nb of calls not sent since an identical one was in flight, by endpoint"""
+
+
+def normalized_params(params: dict) -> tuple[tuple[str, str], ...]:
+    """Params as sent by httpx, ordered by name, to identify identical calls.
+
+    Values of a same param (e.g. uids of `id`) keep their order.
+    """
+    import httpx  # noqa: PLC0415
+
+    return tuple(sorted(httpx.QueryParams(params).multi_items(), key=itemgetter(0)))
+
+
+def nb_coalesced_calls() -> int:
+    """Nb of E-utilities calls saved so far, waiting for an identical in-flight call instead."""
+    return sum(COALESCED_CALLS_COUNTS.values())
+
+
 def call_eutils(
     endpoint: NCBIEndpoint,
     params: dict,
     retry: int = DEFAULT_RETRY,
+    method: Literal["GET", "POST"] = "GET",
 ) -> dict | list:
-    """Make HTTP call to NCBI E-utilities endpoints, handles error and retry."""
-    retry_transport = RetryTransport(retry=Retry(total=retry, backoff_factor=0.5))
-    timeout = httpx.Timeout(10.0, read=None)
-    with httpx.Client(transport=retry_transport, timeout=timeout) as client:
-        response = client.get(endpoint.full_url(), params=endpoint.validated_params(params))
+    """Make HTTP call to NCBI E-utilities endpoints, handles error and retry.
+
+    POST sends params in the request body instead of the URL, for long lists of uids.
+
+    Identical calls (same endpoint, method and params) made by several threads at the same
+    time are sent once: the first one is sent, the others wait for its response (or error),
+    counted in `COALESCED_CALLS_COUNTS`. The raw response is shared, each caller decoding its own
+    data: callers can modify it (e.g. `extract_all_db_article_ids`) without affecting others.
+    """
+    validated_params = endpoint.validated_params(params)
+    key = (endpoint, method, normalized_params(validated_params))
+    with IN_FLIGHT_CALLS_LOCK:
+        in_flight_call = IN_FLIGHT_CALLS.get(key)
+        is_leader = in_flight_call is None
+        if is_leader:
+            in_flight_call = InFlightCall(done=threading.Event(), content=None, error=None)
+            IN_FLIGHT_CALLS[key] = in_flight_call
+        else:
+            COALESCED_CALLS_COUNTS[endpoint] += 1
+
+    if not is_leader:
+        logger.debug(f"Waiting for identical in-flight call to {endpoint.value}")
+        with trace_span("wait for identical call", endpoint=endpoint.value):
+            in_flight_call["done"].wait()
+        if in_flight_call["error"] is not None:
+            raise in_flight_call["error"]
+        return decode_eutils_response(in_flight_call["content"])
+
+    try:
+        in_flight_call["content"] = send_eutils_request(
+            endpoint,
+            validated_params,
+            retry,
+            method,
+        )
+    except Exception as error:
+        in_flight_call["error"] = error
+        raise
+    finally:
+        with IN_FLIGHT_CALLS_LOCK:
+            del IN_FLIGHT_CALLS[key]
+        in_flight_call["done"].set()
+    return decode_eutils_response(in_flight_call["content"])
+
+
+def send_eutils_request(
+    endpoint: NCBIEndpoint,
+    validated_params: dict,
+    retry: int,
+    method: Literal["GET", "POST"],
+) -> bytes:
+    """Send a request to NCBI E-utilities endpoint, handles error and retry.
+
+    Connections are reused across requests, see `eutils_client`.
+
+    Returns:
+        bytes: raw json response, see `decode_eutils_response`
+
+    """
+    client = eutils_client(retry)
+    with trace_span(f"{method} {endpoint.value}") as span_attributes:
+        if method == "POST":
+            response = client.post(endpoint.full_url(), data=validated_params)
+        else:
+            response = client.get(endpoint.full_url(), params=validated_params)
+        span_attributes["status_code"] = response.status_code
+        span_attributes["bytes"] = len(response.content)
+        span_attributes["retries"] = getattr(response.extensions.get("retry"), "attempts_made", 0)
 
     if response.status_code == HTTPStatus.REQUEST_URI_TOO_LONG:
         logger.error(
@@ -106,4 +284,10 @@ def call_eutils(
         )
         response.raise_for_status()
 
-    return response.json()
+    return response.content
+
+
+def decode_eutils_response(content: bytes) -> dict | list:
+    """Decode a raw json response of E-utilities into new data."""
+    with trace_span("decode json", bytes=len(content)):
+        return json.loads(content)
@@ -33,6 +33,28 @@ def extract_all_db_article_ids(articles: dict, db: NCBIDatabase) -> list[Article
     return list(filter(None, results))
 
 
+def extract_article_ids_by_uid(articles: dict, db: NCBIDatabase) -> dict[str, ArticleIds]:
+    """Extract PubMed and PMC ids of each article, by uid, without changing `articles`.
+
+    Args:
+        articles (dict): all articles data in database, as given to `extract_all_db_article_ids`
+        db (NCBIDatabase): Database giving its ids
+
+    Returns:
+        dict[str, ArticleIds]: ids by uid, empty for articles without any id
+
+    """
+    extract_article_ids_method = {
+        NCBIDatabase.PUB_MED: extract_ids_from_pub_med_article,
+        NCBIDatabase.PMC: extract_ids_from_pcm_article,
+    }[db]
+    return {
+        uid: extract_article_ids_method(articles[uid])
+        for uid in articles.get("uids", [])
+        if uid in articles
+    }
+
+
 def extract_ids_from_pcm_article(article_data: dict) -> ArticleIds:
     """Extract and format PubMed and PMC ids for a given article in PCM database.
 
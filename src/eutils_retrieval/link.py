@@ -0,0 +1,70 @@
+from itertools import batched
+
+from loguru import logger
+
+from src.eutils_retrieval.api import NCBIDatabase, NCBIEndpoint, call_eutils
+
+MAX_UIDS_BY_LINK = 500
+"""Nb of uids to find links of in a single request"""
+
+LINK_NAME_BY_DBS = {
+    (NCBIDatabase.PUB_MED, NCBIDatabase.PMC): "pubmed_pmc",
+    (NCBIDatabase.PMC, NCBIDatabase.PUB_MED): "pmc_pubmed",
+}
+
+
+def link_uids(
+    uids: list[str],
+    dbfrom: NCBIDatabase,
+    db: NCBIDatabase,
+    batch_size: int = MAX_UIDS_BY_LINK,
+) -> dict[str, str | None]:
+    """Find the uid of the same article in another database, for each of given uids.
+
+    Args:
+        uids (list[str]): uids of articles in `dbfrom` (pmids, or PMC uids without `PMC` prefix)
+        dbfrom (NCBIDatabase): database of given uids
+        db (NCBIDatabase): database to find linked uids in
+        batch_size (int): nb of uids to find links of in a single request
+
+    Returns:
+        dict[str, str | None]: linked uid by uid, None if the article is not in `db`. Uids
+            missing from the response are left out, so that they are linked again later.
+
+    Notes:
+        Uids are posted as separate `id` parameters, for the response to give links uid by uid:
+        {...
+        'linksets': [
+            {'dbfrom': 'pubmed', 'ids': ['36645057'],
+             'linksetdbs': [{'dbto': 'pmc', 'linkname': 'pubmed_pmc', 'links': ['9848274']}]},
+            {'dbfrom': 'pubmed', 'ids': ['111111111']},  # not in PMC
+        ]
+        ...}
+
+    """
+    links: dict[str, str | None] = {}
+    linkname = LINK_NAME_BY_DBS[dbfrom, db]
+    for batch in batched(uids, batch_size):
+        logger.debug(f"Calling {dbfrom.value} database for {linkname} links of {len(batch)} uids.")
+        link_data = call_eutils(
+            NCBIEndpoint.LINK,
+            {
+                "dbfrom": dbfrom.value,
+                "db": db.value,
+                "linkname": linkname,
+                "id": list(batch),
+                "retmode": "json",
+            },
+            method="POST",
+        )
+        for linkset in link_data.get("linksets", []):
+            linked_uids = [
+                link
+                for linkset_db in linkset.get("linksetdbs", [])
+                if linkset_db["linkname"] == linkname
+                for link in linkset_db["links"]
+            ]
+            for uid in linkset["ids"]:
+                links[uid] = linked_uids[0] if linked_uids else None
+
+    return links
@@ -1,5 +1,8 @@
+import functools
 import itertools
-from collections.abc import Generator, Iterable
+from collections.abc import Callable, Generator, Iterable
+from typing import TypedDict
+from urllib.parse import quote_plus
 
 from loguru import logger
 
@@ -7,16 +10,24 @@ from loguru import logger
 # little of room error. Server does not seem to specify their max URI, not following HTTP 1.1.
 PMC_API_MAX_URI_LENGTH = 4000
 
+# PubMed only gives access to the first 10 000 articles found by a search
+MAX_RESULTS_BY_QUERY = 10_000
 
-def create_e_queries(
+
+def create_e_queries(  # noqa: PLR0913
     devices: Iterable[str],
     indicators: Iterable[str],
     year_bounds: tuple[int | None, int | None] = (None, None),
     query_max_length: int = PMC_API_MAX_URI_LENGTH,
+    remove_redundancies: bool = True,
+    *,
+    term_counts: dict[str, int] | None = None,
+    max_results_by_query: int | None = None,
 ) -> tuple[str, ...]:
     """Create all search queries combining hemostatic devices and urology indicators.
 
-    Queries are sized based on endpoint URI length allowed.
+    Queries are sized based on endpoint URI length allowed, packing terms by their actual length
+    (see `create_packed_combinations_queries`).
 
     Args:
         devices (list): List of hemostatic devices and related terms
@@ -25,6 +36,12 @@ def create_e_queries(
             Both are optionals.
         query_max_length (int): Max char size allowed for URL construction.
             Since query is used in URL construction, we need to limit the size.
+        remove_redundancies (bool): Remove duplicated terms and terms already covered by a
+            shorter one before building queries (see `remove_redundant_terms`).
+        term_counts (dict[str, int], optional): Number of articles matching each lowercase term,
+            known from previous searches. Terms matching no article are not searched.
+        max_results_by_query (int, optional): Balance device groups so that their estimated
+            number of articles stays below this limit, using `term_counts`.
 
     Returns:
         tuple[str]: All combination search queries
@@ -35,15 +52,131 @@ def create_e_queries(
     )
 
     year_bound_query = create_year_bound_query(*year_bounds)
-    queries = create_complete_combinations_queries(
-        devices,
-        indicators,
+    if remove_redundancies:
+        devices, removed_devices = remove_redundant_terms(devices)
+        indicators, removed_indicators = remove_redundant_terms(indicators)
+        log_removed_terms({**removed_devices, **removed_indicators})
+
+    if term_counts:
+        devices, dead_devices = prune_dead_terms(devices, term_counts)
+        indicators, dead_indicators = prune_dead_terms(indicators, term_counts)
+        log_dead_terms([*dead_devices, *dead_indicators])
+
+    if not devices or not indicators:
+        logger.warning("No device or indicator left to search, no query created")
+        return ()
+
+    packed_queries = create_packed_combinations_queries(
+        list(devices),
+        list(indicators),
         query_max_length=query_max_length,
+        term_counts=term_counts,
+        max_results_by_query=max_results_by_query,
+    )
+    queries = packed_queries["queries"]
+    logger.info(
+        f"Packed all devices and indicators into {len(queries)} queries "
+        f"(fill ratio {packed_queries['fill_ratio']:.1%})",
     )
 
+    return tuple(add_year_bound_query(q, year_bound_query) for q in queries)
+
+
+def add_year_bound_query(query: str, year_bound_query: str) -> str:
+    """Restrict a query with a year bound condition, if any (see `create_year_bound_query`)."""
     if year_bound_query != "":
-        return tuple(f"({q}) AND {year_bound_query}" for q in queries)
-    return tuple(queries)
+        return f"({query}) AND {year_bound_query}"
+    return query
+
+
+def remove_redundant_terms(terms: Iterable[str]) -> tuple[list[str], dict[str, str]]:
+    """Remove terms that would not change the results of `("term" OR ... "term")`.
+
+    A term is redundant when it is a duplicate (case-insensitive) of another term, or when its
+    words contain the words of another term, in the same order: an exact phrase search on
+    "vascular graft" already finds every article matching "vascular graft placement".
+
+    Args:
+        terms (Iterable[str]): terms OR'd together in a query
+
+    Returns:
+        tuple: terms kept in their original order, and removed terms with the term covering them
+
+    Examples:
+        >> remove_redundant_terms(["AMP Plus", "Human thrombin", "AMP", "human Thrombin"])
+        (
+            ["Human thrombin", "AMP"],
+            {"AMP Plus": "AMP", "human Thrombin": "Human thrombin"},
+        )
+
+    """
+    terms = list(terms)
+    kept_words: dict[int, tuple[str, ...]] = {}
+    removed: dict[str, str] = {}
+
+    # shortest terms first so that the term covering others is always kept
+    for index in sorted(range(len(terms)), key=lambda i: len(terms[i].split())):
+        words = tuple(terms[index].lower().split())
+        covering_index = next(
+            (kept for kept, sub_words in kept_words.items() if contains_words(words, sub_words)),
+            None,
+        )
+        if covering_index is None:
+            kept_words[index] = words
+        else:
+            removed[terms[index]] = terms[covering_index]
+
+    return [term for index, term in enumerate(terms) if index in kept_words], removed
+
+
+def contains_words(words: tuple[str, ...], sub_words: tuple[str, ...]) -> bool:
+    """Check if `sub_words` appear contiguously, in the same order, in `words`."""
+    nb_sub_words = len(sub_words)
+    return any(
+        words[start : start + nb_sub_words] == sub_words
+        for start in range(len(words) - nb_sub_words + 1)
+    )
+
+
+def log_removed_terms(removed: dict[str, str]) -> None:
+    """Report terms removed from queries, with the term covering them."""
+    if not removed:
+        logger.debug("No redundant term found.")
+        return
+
+    logger.info(f"Removed {len(removed)} redundant terms from queries")
+    for term, covering_term in removed.items():
+        logger.debug(f'"{term}" is already covered by "{covering_term}"')
+
+
+def prune_dead_terms(
+    terms: Iterable[str],
+    term_counts: dict[str, int],
+) -> tuple[list[str], list[str]]:
+    """Remove terms known to match no article at all.
+
+    Args:
+        terms (Iterable[str]): terms OR'd together in a query
+        term_counts (dict[str, int]): number of articles matching each lowercase term
+
+    Returns:
+        tuple: terms kept, and terms removed, in their original order
+
+    """
+    kept, dead = [], []
+    for term in terms:
+        (dead if term_counts.get(term.lower()) == 0 else kept).append(term)
+    return kept, dead
+
+
+def log_dead_terms(dead: list[str]) -> None:
+    """Report terms removed from queries since they match no article."""
+    if not dead:
+        logger.debug("No dead term found.")
+        return
+
+    logger.info(f"Removed {len(dead)} terms matching no article from queries")
+    logger.info(f"Terms matching no article: {dead}")
 
 
 def create_one_combination_query(devices: Iterable[str], indicators: Iterable[str]) -> str:
@@ -214,3 +347,261 @@ def biggest_nb_words_possible(
     # we want to strictly resolve the inequation, thus f the result is exactly an int i.e.
     # resolving `=`, we decrement it
     return int(solution) if float(int(solution)) != solution else int(solution) - 1
+
+
+class PackedQueries(TypedDict):
+    """Queries created by packing devices and indicators groups into the length allowed.
+
+    Attributes:
+        device_groups (list[list[str]]): devices OR'd together in a query
+        indicator_groups (list[list[str]]): indicators OR'd together in a query
+        queries (list[str]): one query for each couple (device group, indicator group)
+        fill_ratio (float): mean ratio of the length used by queries on the max length allowed
+
+    """
+
+    device_groups: list[list[str]]
+    indicator_groups: list[list[str]]
+    queries: list[str]
+    fill_ratio: float
+
+
+def url_encoded_length(text: str) -> int:
+    """Length taken by `text` once encoded as a parameter in an URL."""
+    return len(quote_plus(text))
+
+
+def quoted_term_length(term: str, measure: Callable[[str], int] = len) -> int:
+    """Length of a term once quoted for an exact search in query."""
+    return measure(f'"{term}"')
+
+
+def pack_terms(
+    terms: list[str],
+    capacity: int,
+    measure: Callable[[str], int] = len,
+    term_counts: dict[str, int] | None = None,
+    max_group_count: int | None = None,
+) -> list[list[str]]:
+    """Pack terms into the fewest groups `("term" OR ... "term")` not longer than `capacity`.
+
+    Uses first-fit decreasing: terms are taken from the longest to the shortest and put in the
+    first group that can still hold them. Terms keep their original order inside and across groups.
+
+    When `max_group_count` is given, terms are taken from the one matching the most articles to
+    the least, and a group also needs its total number of articles to stay below this limit: terms
+    matching many articles open groups that are then filled with rarer ones.
+
+    Args:
+        terms (list[str]): terms to pack
+        capacity (int): max length allowed for one group, parenthesis included
+        measure (Callable): how to compute the length of a piece of query. Must be additive.
+        term_counts (dict[str, int], optional): number of articles matching each lowercase term,
+            unknown terms are counted as 0
+        max_group_count (int, optional): max number of articles matched by the terms of a group.
+            A term matching more articles is alone in its group.
+
+    Returns:
+        list[list[str]]: groups of terms
+
+    """
+    parenthesis_length = measure("(") + measure(")")
+    or_length = measure(OR_QUERY)
+    term_counts = term_counts or {}
+
+    def term_length(term: str) -> int:
+        return quoted_term_length(term, measure)
+
+    def term_count(term: str) -> int:
+        return term_counts.get(term.lower(), 0)
+
+    def sort_key(term: str) -> tuple[int, ...]:
+        if max_group_count is None:
+            return (term_length(term),)
+        return term_count(term), term_length(term)
+
+    max_count = float("inf") if max_group_count is None else max_group_count
+
+    groups: list[list[str]] = []
+    groups_length: list[int] = []
+    groups_count: list[int] = []
+    # sort is stable, terms with same key keep their order
+    for term in sorted(terms, key=sort_key, reverse=True):
+        length, count = term_length(term), term_count(term)
+        for index, group_length in enumerate(groups_length):
+            if (
+                group_length + or_length + length <= capacity
+                and groups_count[index] + count <= max_count
+            ):
+                groups[index].append(term)
+                groups_length[index] += or_length + length
+                groups_count[index] += count
+                break
+        else:
+            if parenthesis_length + length > capacity:
+                msg = f"Term {term} cannot fit in a group of max length {capacity}"
+                raise ValueError(msg)
+            groups.append([term])
+            groups_length.append(parenthesis_length + length)
+            groups_count.append(count)
+
+    position = {term: index for index, term in enumerate(terms)}
+    groups = [sorted(group, key=position.__getitem__) for group in groups]
+    return sorted(groups, key=lambda group: position[group[0]])
+
+
+def create_packed_combinations_queries(  # noqa: PLR0913
+    devices: list[str],
+    indicators: list[str],
+    query_max_length: int,
+    measure: Callable[[str], int] = len,
+    *,
+    term_counts: dict[str, int] | None = None,
+    max_results_by_query: int | None = None,
+) -> PackedQueries:
+    """Create the fewest queries combining all devices and indicators, packing terms by length.
+
+    Unlike `create_complete_combinations_queries`, which sizes every group on the longest device
+    and the longest indicator, each term only takes its own quoted length.
+
+    Args:
+        devices (list): List of devices to combine
+        indicators (list): List of indicators to combine
+        query_max_length (int): forces one query to be smaller that a max length of chars allowed.
+        measure (Callable): how to compute the length of a piece of query, `len` by default, or
+            `url_encoded_length` when `query_max_length` is a limit on the encoded URL parameter.
+        term_counts (dict[str, int], optional): number of articles matching each lowercase term
+        max_results_by_query (int, optional): max number of articles estimated for a query.
+            Articles found by `(device group) AND (indicator group)` are at most the ones matched
+            by the device group, so device groups are packed to match less articles than this
+            limit (see `pack_terms`).
+
+    Returns:
+        PackedQueries: groups used and queries following the pattern
+            (`device` OR ... `device`) AND (`indicator` OR ... `indicator`)
+
+    Notes:
+        This is a 2-D bin packing: the number of queries is
+        `nb_device_groups * nb_indicator_groups`, and a device group of length `Ld` can only be
+        combined with indicator groups of length `Li` if `Ld + length_of_and_query + Li`
+        < query_max_length`.
+
+        For each number of device groups reachable, we look for the smallest device group
+        capacity giving it, leaving the rest of the length to pack indicators, and keep the split
+        that creates the fewest queries.
+
+        The split used by `create_complete_combinations_queries` is always tried as well: first-fit
+        never opens a new group while one has room left for the longest term, so the number of
+        queries can never be greater than with that method (unless `max_results_by_query` is used).
+
+    Examples:
+        >> create_packed_combinations_queries(['a', 'b', 'c'], ['1', '2', '3'], 39)["queries"]
+        [
+            '("a" OR "b") AND ("1" OR "2" OR "3")',  # 36 chars
+            '("c") AND ("1" OR "2" OR "3")',
+        ]
+
+    """
+    parenthesis_length = measure("(") + measure(")")
+    or_length = measure(OR_QUERY)
+    # sum of both groups length must be strictly smaller than the max length allowed
+    groups_budget = query_max_length - 1 - measure(AND_QUERY)
+
+    biggest_device_length = max(quoted_term_length(device, measure) for device in devices)
+    biggest_indicator_length = max(quoted_term_length(ind, measure) for ind in indicators)
+    smallest_device_capacity = parenthesis_length + biggest_device_length
+    biggest_device_capacity = groups_budget - parenthesis_length - biggest_indicator_length
+
+    if smallest_device_capacity > biggest_device_capacity:
+        msg = (
+            f"Cannot build query since the maximum length allowed ({query_max_length}) is not "
+            f"sufficient to combine one by one the biggest words in either devices or indicators"
+        )
+        raise ValueError(msg)
+
+    pack_devices = functools.partial(
+        pack_terms,
+        measure=measure,
+        term_counts=term_counts,
+        max_group_count=max_results_by_query,
+    )
+    device_capacities = smallest_capacity_by_nb_groups(
+        devices,
+        smallest_device_capacity,
+        biggest_device_capacity,
+        pack=pack_devices,
+    )
+
+    # capacity for as many devices and indicators in each group (see `biggest_nb_words_possible`)
+    nb_words = (groups_budget - 2 * parenthesis_length + 2 * or_length) // (
+        biggest_device_length + biggest_indicator_length + 2 * or_length
+    )
+    device_capacities.append(
+        nb_words * (biggest_device_length + or_length) - or_length + parenthesis_length,
+    )
+
+    all_groups = [
+        (
+            pack_devices(devices, device_capacity),
+            pack_terms(indicators, groups_budget - device_capacity, measure),
+        )
+        for device_capacity in device_capacities
+    ]
+    # min keeps the first split found for equal number of queries
+    device_groups, indicator_groups = min(all_groups, key=lambda g: len(g[0]) * len(g[1]))
+    queries = [
+        create_one_combination_query(device_group, indicator_group)
+        for device_group in device_groups
+        for indicator_group in indicator_groups
+    ]
+    fill_ratio = sum(measure(query) for query in queries) / (len(queries) * query_max_length)
+
+    return PackedQueries(
+        device_groups=device_groups,
+        indicator_groups=indicator_groups,
+        queries=queries,
+        fill_ratio=fill_ratio,
+    )
+
+
+def smallest_capacity_by_nb_groups(
+    terms: list[str],
+    smallest_capacity: int,
+    biggest_capacity: int,
+    pack: Callable[[list[str], int], list[list[str]]] = pack_terms,
+) -> list[int]:
+    """Find, for each number of groups reachable, the smallest capacity to pack terms into it.
+
+    Args:
+        terms (list[str]): terms to pack
+        smallest_capacity (int): smallest capacity allowed, must fit the longest term
+        biggest_capacity (int): biggest capacity allowed
+        pack (Callable): method packing terms into groups for a given capacity
+
+    Returns:
+        list[int]: capacities, from the one creating the most groups to the fewest
+
+    Notes:
+        Number of groups decreases with capacity, each capacity is found by binary search.
+
+    """
+    capacities = []
+    capacity = smallest_capacity
+    nb_groups = len(pack(terms, capacity))
+    nb_groups_with_biggest = len(pack(terms, biggest_capacity))
+
+    while True:
+        capacities.append(capacity)
+        if nb_groups <= nb_groups_with_biggest:
+            return capacities
+
+        # smallest capacity in (capacity, biggest_capacity] giving less groups
+        low, high = capacity + 1, biggest_capacity
+        while low < high:
+            middle = (low + high) // 2
+            if len(pack(terms, middle)) < nb_groups:
+                high = middle
+            else:
+                low = middle + 1
+        capacity = low
+        nb_groups = len(pack(terms, capacity))
@@ -1,12 +1,21 @@
+from collections.abc import Iterator
+from itertools import batched
 from typing import NotRequired, TypedDict
 
 from loguru import logger
 
 from src.eutils_retrieval.api import NCBIDatabase, NCBIEndpoint, call_eutils
+from src.tracing import trace_span
 
 # Given by API endpoint when trying to retrieve more than 500 elements at once
 MAX_ALLOWED_SUMMARY_RETRIEVAL = 500
 
+MAX_ALLOWED_SEARCH_UIDS = 10_000
+"""Max nb of uids returned by search endpoint at once (`retmax`)"""
+
+MAX_UIDS_BY_SUMMARY = 200
+"""Nb of uids to fetch summaries for in a single request, keeping the URL short enough"""
+
 
 class StorageInfos(TypedDict):
     """Minimal PMC search result needed to fetch stored articles."""
@@ -15,6 +24,8 @@ class StorageInfos(TypedDict):
     total_results: int
     web_env: NotRequired[str]
     query_key: NotRequired[str]
+    term_counts: NotRequired[dict[str, int]]
+    uids: NotRequired[list[str]]
 
 
 class ArticleIds(TypedDict):
@@ -30,12 +41,21 @@ class ArticleIds(TypedDict):
     pmid: str | None
 
 
-def search_and_store(query: str, db: NCBIDatabase) -> StorageInfos | None:
+def search_and_store(
+    query: str,
+    db: NCBIDatabase,
+    entry_date_range: tuple[str, str] | None = None,
+    nb_uids: int | None = None,
+) -> StorageInfos | None:
     """Search `db` for articles based on query and ask to store them for later retrieval.
 
     Args:
         query (str): Search query string
         db (NCBIDatabase): database to search from
+        entry_date_range (tuple[str, str], optional): only search articles added to the database
+            between those dates (YYYY/MM/DD), both included
+        nb_uids (int, optional): also return up to `nb_uids` uids of found articles (at most
+            `MAX_ALLOWED_SEARCH_UIDS`), kept in `uids` if all found articles fit
 
     Returns:
         StorageInfos: Information to retrieve requested data in storage
@@ -51,23 +71,70 @@ def search_and_store(query: str, db: NCBIDatabase) -> StorageInfos | None:
         "usehistory": "y",  # here ask to store data
         "retmode": "json",
     }
+    if entry_date_range is not None:
+        search_params["datetype"] = "edat"
+        search_params["mindate"], search_params["maxdate"] = entry_date_range
+    if nb_uids is not None:
+        search_params["retmax"] = nb_uids
 
     logger.debug(f"Calling {db.value} database for search and store.")
-    search_data = call_eutils(NCBIEndpoint.SEARCH, search_params)
-    total_results = int(search_data["esearchresult"]["count"])
+    with trace_span("esearch", db=db.value) as span_attributes:
+        search_data = call_eutils(NCBIEndpoint.SEARCH, search_params)
+        total_results = int(search_data["esearchresult"]["count"])
+        span_attributes["total_results"] = total_results
+    term_counts = extract_term_counts(search_data["esearchresult"])
 
     if total_results == 0:
         logger.debug(f"No results found in {db.value}.")
-        return StorageInfos(total_results=0, db=db)
+        return StorageInfos(total_results=0, db=db, term_counts=term_counts)
 
     logger.debug(f"Found {total_results} results in {db.value}. Storing them for future querying")
 
-    return StorageInfos(
+    storage_infos = StorageInfos(
         db=db,
         total_results=total_results,
         web_env=search_data["esearchresult"]["webenv"],
         query_key=search_data["esearchresult"]["querykey"],
+        term_counts=term_counts,
     )
+    if nb_uids is not None and total_results <= nb_uids:
+        storage_infos["uids"] = search_data["esearchresult"]["idlist"]
+
+    return storage_infos
+
+
+def extract_term_counts(search_result: dict) -> dict[str, int]:
+    """Extract the number of articles found in database for each term of a search query.
+
+    Args:
+        search_result (dict): `esearchresult` part of the search endpoint response
+
+    Returns:
+        dict[str, int]: number of articles matching each term, by lowercase term
+
+    Notes:
+        {...
+        'translationstack': [
+            {'term': '"Hemoblast"[All Fields]', 'field': 'All Fields', 'count': '40', ...},
+            {'term': '"Gelfoam"[All Fields]', 'field': 'All Fields', 'count': '2450', ...},
+            'OR',
+            'GROUP',
+            {'term': '2023[PubDate]', 'field': 'PubDate', 'count': '0', 'explode': 'N'},
+            ...
+        ]
+        ...}
+
+    """
+    term_counts = {}
+    for element in search_result.get("translationstack", []):
+        # operators are given as plain strings, date filters are not searched terms
+        if not isinstance(element, dict) or element.get("field") != "All Fields":
+            continue
+
+        term = element["term"].removesuffix("[All Fields]").strip('"')
+        term_counts[term.lower()] = int(element["count"])
+
+    return term_counts
 
 
 def fetch_all_stored_articles(
@@ -86,6 +153,32 @@ def fetch_all_stored_articles(
     """
     all_articles: dict = {}
 
+    for stored_summaries in iter_stored_articles(storage_infos, max_allowed_elements):
+        all_articles = {
+            **all_articles,
+            **stored_summaries,
+            "uids": [*all_articles.get("uids", []), *stored_summaries.get("uids", [])],
+        }
+
+    return all_articles
+
+
+def iter_stored_articles(
+    storage_infos: StorageInfos,
+    max_allowed_elements: int = MAX_ALLOWED_SUMMARY_RETRIEVAL,
+) -> Iterator[dict]:
+    """Fetch stored articles data requested in previous db query, one page at a time.
+
+    Only one page of summaries is held in memory at once, unlike `fetch_all_stored_articles`.
+
+    Args:
+        storage_infos (StorageInfos): Minimal infos needed to retrieve previously queried articles
+        max_allowed_elements (int): Max number of elements allowed by the api endpoint to fetch data
+
+    Yields:
+        dict of page articles data, by uid + one key 'uids' that contains all uids used as key
+
+    """
     total_elements = storage_infos["total_results"]
     limit = min(max_allowed_elements, total_elements)
 
@@ -101,13 +194,7 @@ def fetch_all_stored_articles(
             offset=offset,
             limit=limit,
         ):
-            all_articles = {
-                **all_articles,
-                **stored_summaries,
-                "uids": [*all_articles.get("uids", []), *stored_summaries.get("uids", [])],
-            }
-
-    return all_articles
+            yield stored_summaries
 
 
 def fetch_stored_articles_by_batch(
@@ -134,10 +221,42 @@ def fetch_stored_articles_by_batch(
         "retmax": limit,
         "retmode": "json",
     }
-    summary_data = call_eutils(NCBIEndpoint.SUMMARY, summary_params)
+    with trace_span("esummary page", db=summary_params["db"], offset=offset, limit=limit):
+        summary_data = call_eutils(NCBIEndpoint.SUMMARY, summary_params)
 
     if "result" not in summary_data:
         logger.error(f"Unexpected response format\n{summary_data}")
         return None
 
     return summary_data.get("result")
+
+
+def iter_articles_by_uids(
+    db: NCBIDatabase,
+    uids: list[str],
+    batch_size: int = MAX_UIDS_BY_SUMMARY,
+) -> Iterator[dict]:
+    """Fetch articles data of given uids, one page at a time.
+
+    Args:
+        db (NCBIDatabase): database to fetch from
+        uids (list[str]): uids of articles in database
+        batch_size (int): nb of uids to fetch summaries for in a single request
+
+    Yields:
+        dict of page articles data, by uid + one key 'uids' that contains all uids used as key
+
+    """
+    for batch in batched(uids, batch_size):
+        logger.debug(f"Calling {db.value} database for summary fetching of {len(batch)} uids.")
+        with trace_span("esummary uids", db=db.value, nb_uids=len(batch)):
+            summary_data = call_eutils(
+                NCBIEndpoint.SUMMARY,
+                {"db": db.value, "id": ",".join(batch), "retmode": "json"},
+            )
+
+        if "result" not in summary_data:
+            logger.error(f"Unexpected response format\n{summary_data}")
+            continue
+
+        yield summary_data["result"]
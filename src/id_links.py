@@ -0,0 +1,98 @@
+from pathlib import Path
+from typing import TypedDict
+
+import numpy as np
+from loguru import logger
+
+from src.article_ids_index import ArticleIdsIndex, merge_pending_article_ids
+from src.eutils_retrieval.api import NCBIDatabase
+from src.eutils_retrieval.link import link_uids
+from src.packed_article_ids import ID_DTYPE, NULL_ID
+from src.pmc_ids_mapping import PmcIdsMapping, fill_missing_indexed_article_ids
+from src.utils import load_data_from_json, store_data_as_json
+
+ID_LINKS_FILE_NAME = "id_links.json"
+
+
+class IdLinks(TypedDict):
+    """Links between PubMed and PMC uids already resolved online, cached across runs.
+
+    Uids are numeric strings (PMC uids without `PMC` prefix). Articles without link are cached
+    too, as None, not to be resolved again.
+
+    Attributes:
+        pubmed_pmc (dict[str, str | None]): PMC uid by pmid
+        pmc_pubmed (dict[str, str | None]): pmid by PMC uid
+
+    """
+
+    pubmed_pmc: dict[str, str | None]
+    pmc_pubmed: dict[str, str | None]
+
+
+def load_id_links(file_path: Path) -> IdLinks:
+    """Load cached id links, empty if not cached yet."""
+    if not file_path.exists():
+        return IdLinks(pubmed_pmc={}, pmc_pubmed={})
+    return load_data_from_json(file_path)
+
+
+def id_links_to_mapping(id_links: IdLinks) -> PmcIdsMapping:
+    """Convert id links into sorted arrays, to look them up like a `PmcIdsMapping`."""
+
+    def to_sorted_array(links: dict[str, str | None]) -> np.ndarray:
+        couples = np.array(
+            [(int(uid), int(linked_uid)) for uid, linked_uid in links.items() if linked_uid],
+            dtype=ID_DTYPE,
+        ).reshape(-1, 2)
+        return np.ascontiguousarray(couples[np.argsort(couples[:, 0])].T)
+
+    return PmcIdsMapping(
+        by_pmcid=to_sorted_array(id_links["pmc_pubmed"]),
+        by_pmid=to_sorted_array(id_links["pubmed_pmc"]),
+    )
+
+
+def fill_missing_indexed_article_ids_by_links(
+    article_ids_index: ArticleIdsIndex,
+    cache_file: Path,
+) -> None:
+    """Fill missing ids of indexed articles in place, resolving them online with ELink.
+
+    Only ids missing from the cache are resolved, by large batches (see `link_uids`), instead
+    of one summary record by article. The cache is updated with new links before filling.
+
+    Args:
+        article_ids_index (ArticleIdsIndex): index updated in place
+        cache_file (Path): JSON file caching id links across runs, see `IdLinks`
+
+    """
+    merge_pending_article_ids(article_ids_index)
+    pmcids, pmids = article_ids_index["unique"]["pmcids"], article_ids_index["unique"]["pmids"]
+    id_links = load_id_links(cache_file)
+
+    uncached_pmc_uids = [
+        uid
+        for uid in map(str, pmcids[(pmids == NULL_ID) & (pmcids != NULL_ID)].tolist())
+        if uid not in id_links["pmc_pubmed"]
+    ]
+    uncached_pmids = [
+        uid
+        for uid in map(str, pmids[(pmcids == NULL_ID) & (pmids != NULL_ID)].tolist())
+        if uid not in id_links["pubmed_pmc"]
+    ]
+    logger.info(
+        f"Resolving links of {len(uncached_pmc_uids)} PMC articles and "
+        f"{len(uncached_pmids)} PubMed articles missing from {cache_file}",
+    )
+    if uncached_pmc_uids or uncached_pmids:
+        id_links["pmc_pubmed"].update(
+            link_uids(uncached_pmc_uids, NCBIDatabase.PMC, NCBIDatabase.PUB_MED),
+        )
+        id_links["pubmed_pmc"].update(
+            link_uids(uncached_pmids, NCBIDatabase.PUB_MED, NCBIDatabase.PMC),
+        )
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        store_data_as_json(id_links, cache_file)
+
+    fill_missing_indexed_article_ids(article_ids_index, id_links_to_mapping(id_links))
@@ -0,0 +1,159 @@
+from datetime import UTC, date, datetime
+from pathlib import Path
+from typing import TypedDict
+
+from loguru import logger
+
+from src.eutils_retrieval.api import NCBIDatabase
+from src.query_plan import db_names
+from src.utils import load_data_from_json, store_data_as_json
+
+LAST_RUN_FILE_NAME = "last_run.json"
+
+ENTRY_DATE_FORMAT = "%Y/%m/%d"
+"""Date format expected by search endpoint for `mindate` and `maxdate`"""
+
+
+class RunState(TypedDict):
+    """Inputs of a successful run, to compare next runs with.
+
+    Attributes:
+        devices (list[str]): devices and related terms searched
+        indicators (list[str]): indicators and related terms searched
+        year_bounds (list[int | None]): start and end year of publication
+        db (list[str]): names of databases searched
+        query_plan_keys (list[str]): keys of query plans used
+        started_at (str): ISO 8601 datetime (UTC) of the start of the run, before any search
+
+    """
+
+    devices: list[str]
+    indicators: list[str]
+    year_bounds: list[int | None]
+    db: list[str]
+    query_plan_keys: list[str]
+    started_at: str
+
+
+def load_last_run(folder: Path) -> RunState | None:
+    """Load inputs of the last successful run stored in `folder`, if any."""
+    file_path = folder / LAST_RUN_FILE_NAME
+    if not file_path.exists():
+        logger.debug(f"No previous run stored in {folder}")
+        return None
+    return load_data_from_json(file_path)
+
+
+def store_last_run(  # noqa: PLR0913
+    devices_indicators: tuple[list[str], list[str]],
+    year_bounds: tuple[int | None, int | None],
+    db: tuple[NCBIDatabase, ...] | NCBIDatabase,
+    *,
+    query_plan_keys: list[str],
+    folder: Path,
+    started_at: datetime | None = None,
+) -> None:
+    """Store inputs of a successful run in `folder`, for next runs to compare with."""
+    started_at = started_at or datetime.now(UTC)
+    run_state = RunState(
+        devices=devices_indicators[0],
+        indicators=devices_indicators[1],
+        year_bounds=list(year_bounds),
+        db=db_names(db),
+        query_plan_keys=query_plan_keys,
+        started_at=started_at.isoformat(),
+    )
+    store_data_as_json(run_state, folder / LAST_RUN_FILE_NAME)
+
+
+def delta_combinations(
+    devices_indicators: tuple[list[str], list[str]],
+    year_bounds: tuple[int | None, int | None],
+    db: tuple[NCBIDatabase, ...] | NCBIDatabase,
+    last_run: RunState,
+) -> list[tuple[list[str], list[str]]] | None:
+    """Find devices and indicators combinations not searched by the last run.
+
+    Args:
+        devices_indicators (tuple of list): devices and indicators to search
+        year_bounds (tuple[int, int]): start and end year of publication
+        db (tuple[NCBIDatabase, ...] | NCBIDatabase): databases to search
+        last_run (RunState): inputs of the last successful run
+
+    Returns:
+        list of (devices, indicators) to combine: new devices with all indicators, and previous
+        devices with new indicators. None if the last run results cannot be completed, since
+        searched on other years or databases, or since terms were removed.
+
+    Examples:
+        >> delta_combinations((["a", "b"], ["1", "2"]), ..., last_run={"devices": ["a"], ...})
+        [(["b"], ["1", "2"])]
+
+    """
+    devices, indicators = devices_indicators
+    if list(year_bounds) != last_run["year_bounds"] or db_names(db) != last_run["db"]:
+        logger.warning("Last run searched other years or databases, cannot be completed")
+        return None
+
+    removed_terms = {*last_run["devices"], *last_run["indicators"]} - {*devices, *indicators}
+    if removed_terms:
+        logger.warning(
+            f"Terms {sorted(removed_terms)} were removed since last run, "
+            "its results cannot be completed",
+        )
+        return None
+
+    last_devices, last_indicators = set(last_run["devices"]), set(last_run["indicators"])
+    previous_devices = [d for d in devices if d in last_devices]
+    new_devices = [d for d in devices if d not in last_devices]
+    new_indicators = [i for i in indicators if i not in last_indicators]
+    logger.info(
+        f"Found {len(new_devices)} new devices and {len(new_indicators)} new indicators "
+        "since last run",
+    )
+
+    combinations = []
+    if new_devices:
+        combinations.append((new_devices, indicators))
+    if previous_devices and new_indicators:
+        combinations.append((previous_devices, new_indicators))
+    return combinations
+
+
+def entry_dates_since_last_run(
+    devices_indicators: tuple[list[str], list[str]],
+    year_bounds: tuple[int | None, int | None],
+    db: tuple[NCBIDatabase, ...] | NCBIDatabase,
+    last_run: RunState,
+    today: date | None = None,
+) -> tuple[str, str] | None:
+    """Find the entry date range of articles added to databases since the last run.
+
+    Args:
+        devices_indicators (tuple of list): devices and indicators to search
+        year_bounds (tuple[int, int]): start and end year of publication
+        db (tuple[NCBIDatabase, ...] | NCBIDatabase): databases to search
+        last_run (RunState): inputs of the last successful run
+        today (date, optional): end of the range, today (UTC) by default
+
+    Returns:
+        tuple[str, str]: (day of last run start, today) as YYYY/MM/DD, both included. The day of
+        the last run is searched again since dates have no time, duplicates are removed when
+        merging. Articles added while the last run was searching are thus searched again as well.
+        None if the last run did not search the same terms, years and databases.
+
+    """
+    devices, indicators = devices_indicators
+    if (
+        devices != last_run["devices"]
+        or indicators != last_run["indicators"]
+        or list(year_bounds) != last_run["year_bounds"]
+        or db_names(db) != last_run["db"]
+    ):
+        logger.warning("Last run searched other terms, years or databases, cannot be refreshed")
+        return None
+
+    since = datetime.fromisoformat(last_run["started_at"]).date()
+    until = today or datetime.now(UTC).date()
+    logger.info(f"Searching articles added since last run ({since} - {until})")
+    return since.strftime(ENTRY_DATE_FORMAT), until.strftime(ENTRY_DATE_FORMAT)
@@ -0,0 +1,115 @@
+import gzip
+import json
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from itertools import batched
+from pathlib import Path
+from typing import IO
+
+from loguru import logger
+
+NDJSON_SUFFIX = ".ndjson"
+GZIP_SUFFIX = ".gz"
+ZSTD_SUFFIX = ".zst"
+
+WRITE_BATCH_SIZE = 10_000
+"""Nb of records serialized before being written at once"""
+
+
+def is_ndjson_file(file_path: Path) -> bool:
+    """Check if file is newline-delimited JSON, optionally compressed (`.ndjson[.gz|.zst]`)."""
+    suffixes = file_path.suffixes
+    if suffixes and suffixes[-1] in {GZIP_SUFFIX, ZSTD_SUFFIX}:
+        suffixes = suffixes[:-1]
+    return bool(suffixes) and suffixes[-1] == NDJSON_SUFFIX
+
+
+def open_text_file(file_path: Path, mode: str) -> IO[str]:
+    """Open a text file, compressed or decompressed on the fly according to its extension.
+
+    Args:
+        file_path (Path): path of file, `.gz` for gzip and `.zst` for zstd compression
+        mode (str): "r" or "w"
+
+    Returns:
+        IO[str]: opened text file
+
+    Raises:
+        ValueError: if zstd compression is asked but `zstandard` package is not installed
+
+    """
+    if file_path.suffix == GZIP_SUFFIX:
+        # low compression level: 3-4x smaller for a fraction of the time of the default level
+        return gzip.open(file_path, f"{mode}t", compresslevel=1, encoding="utf-8")
+    if file_path.suffix == ZSTD_SUFFIX:
+        try:
+            import zstandard  # noqa: PLC0415
+        except ImportError as error:
+            msg = f"Package `zstandard` is needed to read or write {file_path}"
+            raise ValueError(msg) from error
+        return zstandard.open(file_path, f"{mode}t", encoding="utf-8")  # pragma: no cover
+    return file_path.open(mode, encoding="utf-8")
+
+
+@contextmanager
+def open_ndjson_writer(file_path: Path) -> Iterator[IO[str]]:
+    """Open a newline-delimited JSON file to append records to, see `write_ndjson_records`.
+
+    Records are written into a temporary file next to `file_path`, which replaces it atomically
+    once closed: readers never see a partially written file, and an error leaves the previous
+    file untouched.
+
+    Args:
+        file_path (Path): path of file to write into (`.ndjson`, `.ndjson.gz` or `.ndjson.zst`)
+
+    Yields:
+        IO[str]: opened temporary file
+
+    Raises:
+        ValueError: if file is not of ndjson extension
+
+    Examples:
+        >> with open_ndjson_writer(Path("results.ndjson.gz")) as writer:
+        >>     write_ndjson_records(writer, [{"pmcid": "PMC1", "pmid": "1"}])
+
+    """
+    if not is_ndjson_file(file_path):
+        msg = f"File name {file_path} should be of ndjson extension"
+        raise ValueError(msg)
+
+    logger.debug(f"Writing records into {file_path}")
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    # temporary file keeps the extension, for the same compression to be used
+    temporary_path = file_path.with_name(f".tmp-{file_path.name}")
+    try:
+        with open_text_file(temporary_path, "w") as writer:
+            yield writer
+        temporary_path.replace(file_path)
+    finally:
+        temporary_path.unlink(missing_ok=True)
+
+
+def write_ndjson_records(writer: IO[str], records: Iterable[dict]) -> None:
+    """Append records to an ndjson file, one compact JSON object by line.
+
+    Records are serialized by batches of `WRITE_BATCH_SIZE`, so that neither the records nor
+    the whole file content have to be held in memory.
+    """
+    for batch in batched(records, WRITE_BATCH_SIZE):
+        writer.writelines(f"{json.dumps(record, separators=(',', ':'))}\n" for record in batch)
+
+
+def store_data_as_ndjson(records: Iterable[dict], file_path: Path) -> None:
+    """Store records into an ndjson file at once, see `open_ndjson_writer`."""
+    with open_ndjson_writer(file_path) as writer:
+        write_ndjson_records(writer, records)
+
+
+def iter_ndjson_records(file_path: Path) -> Iterator[dict]:
+    """Iterate over records of an ndjson file, without loading it whole."""
+    logger.debug(f"Reading records from {file_path}")
+
+    with open_text_file(file_path, "r") as reader:
+        for line in reader:
+            if line.strip():
+                yield json.loads(line)
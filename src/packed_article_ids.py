@@ -0,0 +1,168 @@
+from collections.abc import Iterable
+from typing import TypedDict
+
+import numpy as np
+
+from src.eutils_retrieval.search import ArticleIds
+
+NULL_ID = 0
+"""Stands for a missing id in packed columns, no article has id 0 in NCBI databases"""
+
+PMCID_PREFIX = "PMC"
+
+ID_DTYPE = np.uint32
+"""Ids are below 10^8 in both databases, far from 2^32"""
+
+
+class PackedArticleIds(TypedDict):
+    """Article ids from both PMC and PubMed databases, stored as numeric columns.
+
+    Takes 8 bytes by article instead of 300+ for a list of `ArticleIds`.
+
+    Attributes:
+        pmcids (np.ndarray): numeric part of PMC ids (uint32), `NULL_ID` if missing
+        pmids (np.ndarray): PubMed ids (uint32), `NULL_ID` if missing
+
+    """
+
+    pmcids: np.ndarray
+    pmids: np.ndarray
+
+
+def encode_pmcid(pmcid: str | None) -> int:
+    """Convert a PMC id to its number ("PMC9848274" -> 9848274), `NULL_ID` if missing."""
+    return int(pmcid.removeprefix(PMCID_PREFIX)) if pmcid else NULL_ID
+
+
+def encode_pmid(pmid: str | None) -> int:
+    """Convert a PubMed id to its number ("36645057" -> 36645057), `NULL_ID` if missing."""
+    return int(pmid) if pmid else NULL_ID
+
+
+def create_packed_article_ids(nb_articles: int = 0) -> PackedArticleIds:
+    """Create packed article ids, with all ids missing."""
+    return PackedArticleIds(
+        pmcids=np.full(nb_articles, NULL_ID, dtype=ID_DTYPE),
+        pmids=np.full(nb_articles, NULL_ID, dtype=ID_DTYPE),
+    )
+
+
+def pack_article_ids(article_ids: Iterable[ArticleIds]) -> PackedArticleIds:
+    """Convert article ids into numeric columns.
+
+    Args:
+        article_ids (Iterable[ArticleIds]): article ids as found in databases
+
+    Returns:
+        PackedArticleIds: same article ids, in the same order
+
+    Raises:
+        ValueError: if an id is not numeric (besides PMC prefix)
+
+    """
+    article_ids = list(article_ids)
+    return PackedArticleIds(
+        pmcids=np.fromiter(
+            (encode_pmcid(a["pmcid"]) for a in article_ids),
+            dtype=ID_DTYPE,
+            count=len(article_ids),
+        ),
+        pmids=np.fromiter(
+            (encode_pmid(a["pmid"]) for a in article_ids),
+            dtype=ID_DTYPE,
+            count=len(article_ids),
+        ),
+    )
+
+
+def unpack_article_ids(packed_article_ids: PackedArticleIds) -> list[ArticleIds]:
+    """Convert numeric columns back into article ids, only meant to be used on output."""
+    return [
+        ArticleIds(
+            pmcid=f"{PMCID_PREFIX}{pmcid}" if pmcid != NULL_ID else None,
+            pmid=str(pmid) if pmid != NULL_ID else None,
+        )
+        for pmcid, pmid in zip(
+            packed_article_ids["pmcids"].tolist(),
+            packed_article_ids["pmids"].tolist(),
+            strict=True,
+        )
+    ]
+
+
+def concatenate_packed_article_ids(*packed_article_ids: PackedArticleIds) -> PackedArticleIds:
+    """Concatenate packed article ids, keeping duplicates."""
+    if not packed_article_ids:
+        return create_packed_article_ids()
+
+    return PackedArticleIds(
+        pmcids=np.concatenate([p["pmcids"] for p in packed_article_ids]),
+        pmids=np.concatenate([p["pmids"] for p in packed_article_ids]),
+    )
+
+
+def sorted_unique(values: np.ndarray) -> np.ndarray:
+    """Sort values and remove duplicates, faster than `np.unique` on large integer arrays."""
+    values = np.sort(values)
+    is_first = np.ones(values.size, dtype=bool)
+    is_first[1:] = values[1:] != values[:-1]
+    return values[is_first]
+
+
+def is_in_sorted(values: np.ndarray, sorted_values: np.ndarray) -> np.ndarray:
+    """Check if each value is in sorted values, with a binary search (faster than `np.isin`)."""
+    if not sorted_values.size:
+        return np.zeros(values.size, dtype=bool)
+
+    positions = np.searchsorted(sorted_values, values)
+    positions[positions == sorted_values.size] = 0
+    return sorted_values[positions] == values
+
+
+def merge_packed_article_ids(*packed_article_ids: PackedArticleIds) -> PackedArticleIds:
+    """Merge packed article ids, keeping only unique articles with most infos.
+
+    Full duplicates are removed, as well as partial articles (pmcid or pmid only) sharing their
+    id with a complete one. Complete articles sharing an id with another complete one (an article
+    with multiple ids in a db) are all kept.
+
+    Args:
+        *packed_article_ids (PackedArticleIds): article ids to merge
+
+    Returns:
+        PackedArticleIds: unique article ids, sorted by pmcid then pmid
+
+    Notes:
+        Vectorized: both ids are combined into a single uint64 key to sort and remove full
+        duplicates at once, then partial articles are looked up among complete ones with a binary
+        search, in O(n log n) without any Python loop.
+
+    """
+    all_ids = concatenate_packed_article_ids(*packed_article_ids)
+
+    keys = (all_ids["pmcids"].astype(np.uint64) << np.uint64(32)) | all_ids["pmids"]
+    keys = sorted_unique(keys[keys != NULL_ID])
+    pmcids = (keys >> np.uint64(32)).astype(ID_DTYPE)
+    pmids = (keys & np.uint64(0xFFFFFFFF)).astype(ID_DTYPE)
+
+    is_complete = (pmcids != NULL_ID) & (pmids != NULL_ID)
+    is_kept = is_complete.copy()
+    # partial articles without pmid, kept if their pmcid is not in a complete article
+    # (keys are sorted by pmcid first, so are complete pmcids)
+    is_kept |= (pmids == NULL_ID) & ~is_in_sorted(pmcids, pmcids[is_complete])
+    # partial articles without pmcid, kept if their pmid is not in a complete article
+    is_kept |= (pmcids == NULL_ID) & ~is_in_sorted(pmids, np.sort(pmids[is_complete]))
+
+    return PackedArticleIds(pmcids=pmcids[is_kept], pmids=pmids[is_kept])
+
+
+def count_conflicting_packed_article_ids(packed_article_ids: PackedArticleIds) -> int:
+    """Count complete articles sharing an id with another complete one, in merged article ids."""
+    pmcids, pmids = packed_article_ids["pmcids"], packed_article_ids["pmids"]
+    is_complete = (pmcids != NULL_ID) & (pmids != NULL_ID)
+    nb_complete = int(is_complete.sum())
+    nb_unique_ids = min(
+        sorted_unique(pmcids[is_complete]).size,
+        sorted_unique(pmids[is_complete]).size,
+    )
+    return nb_complete - nb_unique_ids
@@ -0,0 +1,185 @@
+import csv
+from itertools import batched
+from pathlib import Path
+from typing import TypedDict
+
+import numpy as np
+from loguru import logger
+
+from src.article_ids_index import ArticleIdsIndex, merge_pending_article_ids
+from src.packed_article_ids import (
+    ID_DTYPE,
+    NULL_ID,
+    PackedArticleIds,
+    encode_pmcid,
+    encode_pmid,
+    merge_packed_article_ids,
+)
+from src.utils import load_data_from_json, store_data_as_json
+
+PMC_IDS_MAPPING_FOLDER_NAME = "pmc_ids_mapping"
+BY_PMCID_FILE_NAME = "by_pmcid.npy"
+BY_PMID_FILE_NAME = "by_pmid.npy"
+SOURCE_FILE_NAME = "source.json"
+
+PMC_IDS_CSV_BATCH_SIZE = 1_000_000
+"""Nb of CSV rows converted to numeric ids at once"""
+
+
+class PmcIdsMapping(TypedDict):
+    """Mapping between PMC and PubMed ids, from NCBI bulk PMC-ids file.
+
+    Both arrays are memory-mapped from disk: only pages read by lookups are loaded in memory.
+    Ids and mapped ids are stored as 2 rows, each contiguous for binary searches to not copy them.
+
+    Attributes:
+        by_pmcid (np.ndarray): pmcids (uint32) sorted, and their pmid, as a (2, n) array
+        by_pmid (np.ndarray): pmids (uint32) sorted, and their pmcid, as a (2, n) array
+
+    """
+
+    by_pmcid: np.ndarray
+    by_pmid: np.ndarray
+
+
+class PmcIdsSource(TypedDict):
+    """CSV file a mapping was built from, to build it again once the file changes.
+
+    Attributes:
+        file_name (str): name of the CSV file
+        size (int): size of the CSV file, in bytes
+        modified_at (float): last modification timestamp of the CSV file
+
+    """
+
+    file_name: str
+    size: int
+    modified_at: float
+
+
+def pmc_ids_source(csv_path: Path) -> PmcIdsSource:
+    """Describe a PMC-ids CSV file, see `PmcIdsSource`."""
+    stat = csv_path.stat()
+    return PmcIdsSource(file_name=csv_path.name, size=stat.st_size, modified_at=stat.st_mtime)
+
+
+def build_pmc_ids_mapping(csv_path: Path, folder: Path) -> None:
+    """Convert NCBI bulk PMC-ids CSV file into sorted binary arrays, for fast offline lookups.
+
+    Args:
+        csv_path (Path): local copy of https://ftp.ncbi.nlm.nih.gov/pub/pmc/PMC-ids.csv.gz
+            (uncompressed), with at least `PMCID` and `PMID` columns
+        folder (Path): folder to store the mapping into
+
+    Notes:
+        Articles without PMID are skipped, they have nothing to map. CSV rows are converted by
+        batches of `PMC_IDS_CSV_BATCH_SIZE` to keep memory low, to two uint32 columns (8 bytes
+        by article) sorted in both directions.
+
+    """
+    logger.info(f"Building PMC ids mapping from {csv_path}")
+    batches = []
+    with csv_path.open(newline="") as csv_reader:
+        for rows in batched(csv.DictReader(csv_reader), PMC_IDS_CSV_BATCH_SIZE):
+            batch = np.array(
+                [
+                    (encode_pmcid(row["PMCID"]), encode_pmid(row["PMID"]))
+                    for row in rows
+                    if row["PMCID"] and row["PMID"]
+                ],
+                dtype=ID_DTYPE,
+            )
+            batches.append(batch.reshape(-1, 2))
+
+    couples = np.concatenate(batches) if batches else np.empty((0, 2), dtype=ID_DTYPE)
+    by_pmcid = couples[np.argsort(couples[:, 0])].T
+    by_pmid = couples[np.argsort(couples[:, 1])][:, ::-1].T
+
+    folder.mkdir(parents=True, exist_ok=True)
+    np.save(folder / BY_PMCID_FILE_NAME, np.ascontiguousarray(by_pmcid))
+    np.save(folder / BY_PMID_FILE_NAME, np.ascontiguousarray(by_pmid))
+    store_data_as_json(pmc_ids_source(csv_path), folder / SOURCE_FILE_NAME)
+    logger.info(f"Stored mapping of {len(couples)} articles into {folder}")
+
+
+def load_pmc_ids_mapping(folder: Path) -> PmcIdsMapping:
+    """Memory-map a mapping built by `build_pmc_ids_mapping`."""
+    return PmcIdsMapping(
+        by_pmcid=np.load(folder / BY_PMCID_FILE_NAME, mmap_mode="r"),
+        by_pmid=np.load(folder / BY_PMID_FILE_NAME, mmap_mode="r"),
+    )
+
+
+def load_or_build_pmc_ids_mapping(csv_path: Path, folder: Path) -> PmcIdsMapping:
+    """Load the mapping stored in `folder`, built again first if `csv_path` changed since."""
+    source_file = folder / SOURCE_FILE_NAME
+    if not source_file.exists() or load_data_from_json(source_file) != pmc_ids_source(csv_path):
+        build_pmc_ids_mapping(csv_path, folder)
+    return load_pmc_ids_mapping(folder)
+
+
+def lookup_ids(mapping: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Find the id mapped to each of `ids`, with a binary search in O(log n) by id.
+
+    Args:
+        mapping (np.ndarray): sorted ids and their mapped id, as a (2, n) array
+        ids (np.ndarray): ids to look for
+
+    Returns:
+        np.ndarray: mapped ids, `NULL_ID` if not found
+
+    """
+    sorted_ids, mapped_ids = mapping
+    if not sorted_ids.size:
+        return np.full(ids.size, NULL_ID, dtype=ID_DTYPE)
+
+    positions = np.searchsorted(sorted_ids, ids)
+    positions[positions == sorted_ids.size] = 0
+    is_found = (sorted_ids[positions] == ids) & (ids != NULL_ID)
+    return np.where(is_found, mapped_ids[positions], NULL_ID).astype(ID_DTYPE)
+
+
+def fill_missing_article_ids(
+    packed_article_ids: PackedArticleIds,
+    pmc_ids_mapping: PmcIdsMapping,
+) -> PackedArticleIds:
+    """Fill missing pmid of articles from their pmcid, and missing pmcid from their pmid.
+
+    Args:
+        packed_article_ids (PackedArticleIds): articles, some with a missing id
+        pmc_ids_mapping (PmcIdsMapping): mapping to look ids in
+
+    Returns:
+        PackedArticleIds: same articles, with ids found in mapping filled. Might contain
+            duplicates, to merge with `merge_packed_article_ids`.
+
+    """
+    pmcids, pmids = packed_article_ids["pmcids"], packed_article_ids["pmids"]
+    is_missing_pmid = (pmids == NULL_ID) & (pmcids != NULL_ID)
+    is_missing_pmcid = (pmcids == NULL_ID) & (pmids != NULL_ID)
+
+    pmids = pmids.copy()
+    pmids[is_missing_pmid] = lookup_ids(pmc_ids_mapping["by_pmcid"], pmcids[is_missing_pmid])
+    pmcids = pmcids.copy()
+    pmcids[is_missing_pmcid] = lookup_ids(pmc_ids_mapping["by_pmid"], pmids[is_missing_pmcid])
+
+    logger.info(
+        f"Filled {int((pmids[is_missing_pmid] != NULL_ID).sum())}/{int(is_missing_pmid.sum())} "
+        f"missing pmids and {int((pmcids[is_missing_pmcid] != NULL_ID).sum())}/"
+        f"{int(is_missing_pmcid.sum())} missing pmcids from PMC ids mapping",
+    )
+    return PackedArticleIds(pmcids=pmcids, pmids=pmids)
+
+
+def fill_missing_indexed_article_ids(
+    article_ids_index: ArticleIdsIndex,
+    pmc_ids_mapping: PmcIdsMapping,
+) -> None:
+    """Fill missing ids of indexed articles in place, see `fill_missing_article_ids`.
+
+    Partial articles completed this way are merged with complete ones already in the index.
+    """
+    merge_pending_article_ids(article_ids_index)
+    article_ids_index["unique"] = merge_packed_article_ids(
+        fill_missing_article_ids(article_ids_index["unique"], pmc_ids_mapping),
+    )
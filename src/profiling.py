@@ -0,0 +1,167 @@
+import cProfile
+import pstats
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TypedDict
+
+from loguru import logger
+
+CPU_PROFILES_FOLDER_NAME = "cpu_profiles"
+
+RUN_STAGE = "run"
+"""Stage of everything run while profiling, outside of any other stage"""
+
+NB_TOP_FUNCTIONS = 15
+"""Nb of hot functions logged at the end of a profiled run"""
+
+
+class FunctionProfile(TypedDict):
+    """CPU time spent in a function, across all stages.
+
+    Attributes:
+        function (str): file, line and name of the function
+        nb_calls (int): nb of calls
+        own_time (float): seconds spent in the function itself, without its callees
+        cumulative_time (float): seconds spent in the function and its callees, within stages
+
+    """
+
+    function: str
+    nb_calls: int
+    own_time: float
+    cumulative_time: float
+
+
+STAGE_PROFILERS: dict[str, cProfile.Profile] = {}
+"""Deterministic profiler of each stage, since `start_profiling`"""
+ACTIVE_STAGES: list[str] = []
+"""Stages entered and not exited yet, only the innermost one being profiled"""
+PROFILING = threading.Event()
+"""Set while profiling, stages are not profiled otherwise"""
+
+
+def start_profiling() -> None:
+    """Profile from now on, until `stop_profiling`, in the `RUN_STAGE` stage."""
+    STAGE_PROFILERS.clear()
+    ACTIVE_STAGES.clear()
+    PROFILING.set()
+    enter_stage(RUN_STAGE)
+
+
+def stop_profiling() -> dict[str, cProfile.Profile]:
+    """Stop profiling.
+
+    Returns:
+        dict[str, cProfile.Profile]: profiler of each stage, by stage name
+
+    """
+    if ACTIVE_STAGES:
+        STAGE_PROFILERS[ACTIVE_STAGES[-1]].disable()
+    PROFILING.clear()
+    ACTIVE_STAGES.clear()
+    profilers = STAGE_PROFILERS.copy()
+    STAGE_PROFILERS.clear()
+    return profilers
+
+
+def enter_stage(stage: str) -> None:
+    """Pause profiler of the current stage, and profile `stage` instead."""
+    if ACTIVE_STAGES:
+        STAGE_PROFILERS[ACTIVE_STAGES[-1]].disable()
+    ACTIVE_STAGES.append(stage)
+    STAGE_PROFILERS.setdefault(stage, cProfile.Profile()).enable()
+
+
+def exit_stage() -> None:
+    """Stop profiling the current stage, and resume profiler of the stage it was entered from."""
+    STAGE_PROFILERS[ACTIVE_STAGES.pop()].disable()
+    STAGE_PROFILERS[ACTIVE_STAGES[-1]].enable()
+
+
+@contextmanager
+def profile_stage(stage: str) -> Iterator[None]:
+    """Profile a stage of the pipeline apart, while profiling (see `start_profiling`).
+
+    Time spent in a nested stage only counts for the nested stage. Stages are only switched by
+    the main thread: `cProfile` profiles all threads, so calls of other threads (e.g. the
+    background writer) count for the stage the main thread is in meanwhile.
+
+    Args:
+        stage (str): name of the stage, used as file name of its profile
+
+    """
+    if not PROFILING.is_set() or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    enter_stage(stage)
+    try:
+        yield
+    finally:
+        if PROFILING.is_set():  # unless stopped within the stage
+            exit_stage()
+
+
+def store_stage_profiles(profilers: dict[str, cProfile.Profile], folder: Path) -> list[Path]:
+    """Store profile of each stage as a `<stage>.pstats` file.
+
+    Notes:
+        Files are read by `pstats`, or drawn as flame graphs by tools such as `snakeviz` or
+        `flameprof`.
+
+    Returns:
+        list[Path]: paths of stored files
+
+    """
+    folder.mkdir(parents=True, exist_ok=True)
+    file_paths = []
+    for stage, profiler in profilers.items():
+        file_path = folder / f"{stage}.pstats"
+        profiler.dump_stats(file_path)
+        file_paths.append(file_path)
+    return file_paths
+
+
+def top_functions(
+    profilers: dict[str, cProfile.Profile],
+    nb_functions: int = NB_TOP_FUNCTIONS,
+) -> list[FunctionProfile]:
+    """Functions with the most own CPU time across all stages, most expensive first."""
+    if not profilers:
+        return []
+
+    stats = pstats.Stats(*profilers.values())
+    function_profiles = [
+        FunctionProfile(
+            function=pstats.func_std_string(function),
+            nb_calls=nb_calls,
+            own_time=own_time,
+            cumulative_time=cumulative_time,
+        )
+        for function, (_, nb_calls, own_time, cumulative_time, _) in stats.stats.items()
+    ]
+    function_profiles.sort(key=lambda profile: profile["own_time"], reverse=True)
+    return function_profiles[:nb_functions]
+
+
+def stop_and_store_profiles(folder: Path, nb_functions: int = NB_TOP_FUNCTIONS) -> None:
+    """Stop profiling, store profile of each stage into `folder`, and log hot functions."""
+    profilers = stop_profiling()
+    store_stage_profiles(profilers, folder)
+
+    stage_times = {stage: pstats.Stats(profiler).total_tt for stage, profiler in profilers.items()}
+    lines = [
+        "CPU time by stage: "
+        + ", ".join(f"{stage} {stage_time:.3f}s" for stage, stage_time in stage_times.items()),
+        f"{'own time':>10} {'cum. time':>10} {'calls':>9}  function",
+        *(
+            f"{profile['own_time']:>9.3f}s {profile['cumulative_time']:>9.3f}s "
+            f"{profile['nb_calls']:>9}  {profile['function']}"
+            for profile in top_functions(profilers, nb_functions)
+        ),
+    ]
+    logger.info(
+        f"Stored CPU profiles of {len(profilers)} stages into {folder}\n" + "\n".join(lines),
+    )
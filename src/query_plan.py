@@ -0,0 +1,167 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import TypedDict
+
+from loguru import logger
+
+from src.eutils_retrieval.api import NCBIDatabase
+from src.eutils_retrieval.query import create_e_queries
+from src.utils import store_data_as_json
+
+QUERY_PLANNER_VERSION = "1"
+"""To increment each time a change in query creation gives different queries for same inputs"""
+
+QUERY_PLANS_FOLDER_NAME = "query_plans"
+
+SUB_QUERY_ID_LENGTH = 16
+
+
+class SubQuery(TypedDict):
+    """One search query of a plan.
+
+    Attributes:
+        id (str): stable identifier, hash of the query
+        query (str): Entrez text query
+
+    """
+
+    id: str
+    query: str
+
+
+class QueryPlan(TypedDict):
+    """All search queries needed to combine devices and indicators, with the inputs used.
+
+    Attributes:
+        key (str): hash of all inputs used to create the plan
+        planner_version (str): version of query creation used
+        devices (list[str]): devices and related terms
+        indicators (list[str]): indicators and related terms
+        year_bounds (list[int | None]): start and end year of publication
+        db (list[str]): names of databases searched
+        sub_queries (list[SubQuery]): queries to search
+
+    """
+
+    key: str
+    planner_version: str
+    devices: list[str]
+    indicators: list[str]
+    year_bounds: list[int | None]
+    db: list[str]
+    sub_queries: list[SubQuery]
+
+
+def sub_query_id(query: str) -> str:
+    """Create a stable identifier for a query, the same across runs and machines."""
+    return hashlib.sha256(query.encode()).hexdigest()[:SUB_QUERY_ID_LENGTH]
+
+
+def db_names(db: tuple[NCBIDatabase, ...] | NCBIDatabase) -> list[str]:
+    """Names of databases, as a list whatever the number of databases given."""
+    return [d.value for d in db] if isinstance(db, tuple) else [db.value]
+
+
+def query_plan_key(  # noqa: PLR0913
+    devices: list[str],
+    indicators: list[str],
+    year_bounds: tuple[int | None, int | None],
+    db: tuple[NCBIDatabase, ...] | NCBIDatabase,
+    *,
+    term_counts: dict[str, int] | None = None,
+    max_results_by_query: int | None = None,
+) -> str:
+    """Hash all inputs changing the queries created for devices and indicators.
+
+    Args:
+        devices (list[str]): devices and related terms
+        indicators (list[str]): indicators and related terms
+        year_bounds (tuple[int, int]): start and end year of publication
+        db (tuple[NCBIDatabase, ...] | NCBIDatabase): databases searched
+        term_counts (dict[str, int], optional): number of articles matching each lowercase term
+        max_results_by_query (int, optional): max number of articles estimated for a query
+
+    Returns:
+        str: hexadecimal hash
+
+    Notes:
+        Only counts changing the queries are used: terms matching no article, and every term count
+        when queries are balanced. Counts growing between runs do not change the plan otherwise.
+
+    """
+    terms = {term.lower() for term in [*devices, *indicators]}
+    planning_term_counts = {
+        term: count
+        for term, count in (term_counts or {}).items()
+        if term in terms and (count == 0 or max_results_by_query is not None)
+    }
+    content = {
+        "planner_version": QUERY_PLANNER_VERSION,
+        "devices": devices,
+        "indicators": indicators,
+        "year_bounds": list(year_bounds),
+        "db": db_names(db),
+        "term_counts": planning_term_counts,
+        "max_results_by_query": max_results_by_query,
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def load_or_create_query_plan(  # noqa: PLR0913
+    devices: list[str],
+    indicators: list[str],
+    year_bounds: tuple[int | None, int | None],
+    db: tuple[NCBIDatabase, ...] | NCBIDatabase,
+    folder: Path,
+    *,
+    term_counts: dict[str, int] | None = None,
+    max_results_by_query: int | None = None,
+) -> QueryPlan:
+    """Load the query plan stored for these inputs, or create and store it.
+
+    Args:
+        devices (list[str]): devices and related terms
+        indicators (list[str]): indicators and related terms
+        year_bounds (tuple[int, int]): start and end year of publication
+        db (tuple[NCBIDatabase, ...] | NCBIDatabase): databases searched
+        folder (Path): folder storing query plans, one json file by plan key
+        term_counts (dict[str, int], optional): number of articles matching each lowercase term
+        max_results_by_query (int, optional): max number of articles estimated for a query
+
+    Returns:
+        QueryPlan: plan with all queries to search
+
+    """
+    key = query_plan_key(
+        devices,
+        indicators,
+        year_bounds,
+        db,
+        term_counts=term_counts,
+        max_results_by_query=max_results_by_query,
+    )
+    file_path = folder / f"{key}.json"
+    if file_path.exists():
+        logger.info(f"Reusing query plan {key[:SUB_QUERY_ID_LENGTH]} stored in {folder}")
+        with file_path.open() as reader:
+            return json.load(reader)
+
+    queries = create_e_queries(
+        devices,
+        indicators,
+        year_bounds=year_bounds,
+        term_counts=term_counts,
+        max_results_by_query=max_results_by_query,
+    )
+    query_plan = QueryPlan(
+        key=key,
+        planner_version=QUERY_PLANNER_VERSION,
+        devices=devices,
+        indicators=indicators,
+        year_bounds=list(year_bounds),
+        db=db_names(db),
+        sub_queries=[SubQuery(id=sub_query_id(query), query=query) for query in queries],
+    )
+    store_data_as_json(query_plan, file_path)
+    return query_plan
@@ -1,22 +1,157 @@
 import time
+from datetime import UTC, datetime
 from pathlib import Path
 
 from loguru import logger
 
-from src.cross_database_search import merge_article_ids, ncbi_search_and_fetch
+from src.article_ids_index import (
+    ArticleIdsIndex,
+    add_article_ids,
+    create_article_ids_index,
+    indexed_article_ids,
+    merge_pending_article_ids,
+)
+from src.article_store import ARTICLE_STORE_FILE_NAME, close_article_store, open_article_store
+from src.background_writer import start_background_writer, stop_background_writer
+from src.columnar_results import COLUMNAR_RESULTS_FOLDER_NAME, store_columnar_results
+from src.cross_database_search import ncbi_search_and_fetch
 from src.eutils_retrieval.api import NCBIDatabase
-from src.eutils_retrieval.query import create_e_queries
-from src.utils import store_data_as_json
+from src.eutils_retrieval.search import ArticleIds
+from src.id_links import ID_LINKS_FILE_NAME, fill_missing_indexed_article_ids_by_links
+from src.incremental import (
+    delta_combinations,
+    entry_dates_since_last_run,
+    load_last_run,
+    store_last_run,
+)
+from src.ndjson import is_ndjson_file, iter_ndjson_records, store_data_as_ndjson
+from src.pmc_ids_mapping import PmcIdsMapping, fill_missing_indexed_article_ids
+from src.profiling import profile_stage
+from src.query_plan import QUERY_PLANS_FOLDER_NAME, load_or_create_query_plan
+from src.run_delta import RUN_DELTA_FILE_NAME, store_run_delta
+from src.term_statistics import TERM_STATISTICS_FILE_NAME, known_term_counts, load_term_statistics
+from src.tracing import trace_span
+from src.utils import load_data_from_json, store_data_as_json
+from src.year_cache import YEAR_CACHE_FOLDER_NAME, ncbi_search_and_fetch_by_year, years_in_bounds
 
-STORE_RESULTS_FILE_NAME = "retrieved_ids.json"
+RESULTS_FILE_STEM = "retrieved_ids"
+STORE_RESULTS_FILE_NAME = f"{RESULTS_FILE_STEM}.json"
 
 
-def ncbi_article_retrieval(
+def store_results(article_ids: list[ArticleIds], results_file: Path) -> None:
+    """Store found article ids, streamed as ndjson (see `open_ndjson_writer`) or as json."""
+    with (
+        trace_span("store results", file=results_file.name, nb_articles=len(article_ids)),
+        profile_stage("store_results"),
+    ):
+        if is_ndjson_file(results_file):
+            store_data_as_ndjson(article_ids, results_file)
+        else:
+            store_data_as_json(article_ids, results_file)
+
+
+def load_results(results_file: Path) -> list[ArticleIds]:
+    """Load article ids stored by `store_results`."""
+    if is_ndjson_file(results_file):
+        return list(iter_ndjson_records(results_file))
+    return load_data_from_json(results_file)
+
+
+def fill_missing_ids(
+    article_ids_index: ArticleIdsIndex,
+    output_folder: Path,
+    pmc_ids_mapping: PmcIdsMapping | None = None,
+    *,
+    link_missing_ids: bool = False,
+) -> bool:
+    """Fill missing ids of indexed articles, offline from a mapping first, then online.
+
+    Returns:
+        bool: whether ids were filled, for indexed article ids to be listed again
+
+    """
+    with (
+        trace_span(
+            "fill missing ids",
+            offline=pmc_ids_mapping is not None,
+            online=link_missing_ids,
+        ),
+        profile_stage("fill_missing_ids"),
+    ):
+        if pmc_ids_mapping is not None:
+            fill_missing_indexed_article_ids(article_ids_index, pmc_ids_mapping)
+        if link_missing_ids:
+            fill_missing_indexed_article_ids_by_links(
+                article_ids_index,
+                output_folder / ID_LINKS_FILE_NAME,
+            )
+    return pmc_ids_mapping is not None or link_missing_ids
+
+
+def store_columns_and_delta(
+    article_ids_index: ArticleIdsIndex,
+    output_folder: Path,
+    *,
+    run_delta_report: bool = False,
+) -> None:
+    """Store indexed article ids as columns, after comparing them with previous run ones."""
+    merge_pending_article_ids(article_ids_index)
+    columns_folder = output_folder / COLUMNAR_RESULTS_FOLDER_NAME
+    if run_delta_report:
+        with trace_span("compute run delta"), profile_stage("compute_run_delta"):
+            store_run_delta(
+                article_ids_index["unique"],
+                previous_folder=columns_folder,
+                file_path=output_folder / RUN_DELTA_FILE_NAME,
+            )
+    with trace_span("store columnar results"), profile_stage("store_columnar_results"):
+        store_columnar_results(article_ids_index["unique"], columns_folder)
+
+
+def last_run_inputs(  # noqa: PLR0913
+    devices_indicators: tuple[list[str], list[str]],
+    year_bounds: tuple[int | None, int | None],
+    db: tuple[NCBIDatabase, ...] | NCBIDatabase,
+    results_file: Path,
+    *,
+    delta: bool = False,
+    since_last_run: bool = False,
+) -> tuple[list[tuple[list[str], list[str]]], tuple[str, str] | None, list[ArticleIds]]:
+    """Restrict a run to what the last run stored in the folder of `results_file` did not search.
+
+    Returns:
+        tuple: devices and indicators combinations to search, entry date range to search (None for
+        all dates), and results of the last run to merge found articles into
+
+    """
+    last_run = load_last_run(results_file.parent) if results_file.exists() else None
+    if delta and last_run:
+        last_run_combinations = delta_combinations(devices_indicators, year_bounds, db, last_run)
+        if last_run_combinations is not None:
+            return last_run_combinations, None, load_results(results_file)
+    elif since_last_run and last_run:
+        entry_date_range = entry_dates_since_last_run(devices_indicators, year_bounds, db, last_run)
+        if entry_date_range is not None:
+            return [devices_indicators], entry_date_range, load_results(results_file)
+    return [devices_indicators], None, []
+
+
+def ncbi_article_retrieval(  # noqa: PLR0913
     devices_indicators: tuple[list[str], list[str]],
     year_bounds: tuple[int | None, int | None],
     db: tuple[NCBIDatabase, ...] | NCBIDatabase,
     output_folder: Path,
     store_intermediate_results: bool = False,
+    *,
+    max_results_by_query: int | None = None,
+    delta: bool = False,
+    since_last_run: bool = False,
+    year_cache: bool = False,
+    pmc_ids_mapping: PmcIdsMapping | None = None,
+    link_missing_ids: bool = False,
+    results_file_name: str = STORE_RESULTS_FILE_NAME,
+    columnar_results: bool = False,
+    run_delta_report: bool = False,
 ) -> None:
     """Retrieve article ids from NCBI Databases.
 
@@ -31,26 +166,154 @@ def ncbi_article_retrieval(
             Can be given to store intermediate findings for each query.
         store_intermediate_results (bool):
             Store intermediate findings for each query and db into output folder sub folder.
+        max_results_by_query (int, optional):
+            Balance queries so that their estimated number of articles stays below this limit.
+        delta (bool):
+            Only search combinations of devices and indicators added since the last run, and merge
+            found articles into its results. Runs on all combinations if last run cannot be
+            completed (see `delta_combinations`).
+        since_last_run (bool):
+            Only search articles added to databases since the last run, and merge them into its
+            results. Runs on all articles if last run had other inputs (see
+            `entry_dates_since_last_run`). Ignored with `delta`.
+        year_cache (bool):
+            Search one publication year at a time and cache results by query, database and year,
+            to reuse them with any other year bounds (see `ncbi_search_and_fetch_by_year`).
+            Ignored without year bounds or when only searching articles added since last run.
+        pmc_ids_mapping (PmcIdsMapping, optional):
+            Offline mapping between PMC and PubMed ids, used to fill missing ids of found articles
+            (see `load_or_build_pmc_ids_mapping`).
+        link_missing_ids (bool):
+            Resolve ids still missing online, by large batches of ELink requests, and cache them
+            in output folder (see `fill_missing_indexed_article_ids_by_links`).
+        results_file_name (str):
+            Name of the results file in output folder. With `.ndjson`, `.ndjson.gz` or
+            `.ndjson.zst` extension, results are streamed one record by line, optionally
+            compressed, and the file is replaced atomically (see `open_ndjson_writer`).
+        columnar_results (bool):
+            Also store results as sorted uint32 columns in output folder, for downstream jobs
+            to memory-map them and check ids by binary search (see `load_columnar_results`).
+        run_delta_report (bool):
+            Store articles added, removed and upgraded since previous run into output folder,
+            compared with its columnar results (see `compute_run_delta`). Implies
+            `columnar_results`, for next run to compare with this one.
+
+    Notes:
+        The number of articles matching each term, given by search responses, is stored in
+        output folder and reused by next runs to not search terms matching no article at all.
+        Query plans are stored in output folder as well, by hash of their inputs.
+        All articles ever found are upserted into a SQLite article store in output folder, with
+        the query, database and runs that found them (see `upsert_article_ids`).
 
     """
     start = time.time()
+    term_statistics_file = output_folder / TERM_STATISTICS_FILE_NAME
+    term_statistics = load_term_statistics(term_statistics_file)
+
+    results_file = output_folder / results_file_name
+
     # 1. determine all queries that corresponds to devices & indicators
-    queries = create_e_queries(
-        *devices_indicators,
-        year_bounds=year_bounds,
+    combinations, entry_date_range, previous_results = last_run_inputs(
+        devices_indicators,
+        year_bounds,
+        db,
+        results_file,
+        delta=delta,
+        since_last_run=since_last_run,
     )
 
+    # with year cache, years are added to queries one at a time
+    years = years_in_bounds(year_bounds) if year_cache and entry_date_range is None else None
+    with trace_span("plan queries") as span_attributes, profile_stage("plan_queries"):
+        query_plans = [
+            load_or_create_query_plan(
+                *combination,
+                year_bounds=(None, None) if years else year_bounds,
+                db=db,
+                folder=output_folder / QUERY_PLANS_FOLDER_NAME,
+                term_counts=known_term_counts(term_statistics, db),
+                max_results_by_query=max_results_by_query,
+            )
+            for combination in combinations
+        ]
+        queries = tuple(
+            sub_query["query"]
+            for query_plan in query_plans
+            for sub_query in query_plan["sub_queries"]
+        )
+        span_attributes["nb_queries"] = len(queries)
+
     # 2. Search all articles and fetch summary across databases
     intermediate_folder = None
     if store_intermediate_results:
         intermediate_folder = output_folder / "intermediate_results"
         intermediate_folder.mkdir(exist_ok=True)
 
-    all_article_ids = ncbi_search_and_fetch(queries, db=db, folder=intermediate_folder)
+    # Deduplicates article records as they arrive, along with previous ones
+    article_ids_index = create_article_ids_index()
+    add_article_ids(article_ids_index, previous_results)
+
+    # intermediate findings are written in background, not to delay next queries
+    intermediate_writer = start_background_writer() if intermediate_folder else None
+    article_store = open_article_store(
+        output_folder / ARTICLE_STORE_FILE_NAME,
+        run_id=datetime.fromtimestamp(start, UTC).isoformat(),
+    )
+    is_searched = False
+    try:
+        with profile_stage("search_and_fetch"):
+            if years:
+                merged_results = ncbi_search_and_fetch_by_year(
+                    queries,
+                    db=db,
+                    years=years,
+                    folder=output_folder / YEAR_CACHE_FOLDER_NAME,
+                    term_statistics=term_statistics,
+                    article_ids_index=article_ids_index,
+                    article_store=article_store,
+                )
+            else:
+                merged_results = ncbi_search_and_fetch(
+                    queries,
+                    db=db,
+                    folder=intermediate_folder,
+                    term_statistics=term_statistics,
+                    entry_date_range=entry_date_range,
+                    article_ids_index=article_ids_index,
+                    article_store=article_store,
+                    intermediate_writer=intermediate_writer,
+                )
+        is_searched = True
+    finally:
+        close_article_store(article_store)
+        if intermediate_writer is not None:
+            # write errors must not hide a search error
+            stop_background_writer(intermediate_writer, raise_errors=is_searched)
+    store_data_as_json(term_statistics, term_statistics_file)
+
+    if fill_missing_ids(
+        article_ids_index,
+        output_folder,
+        pmc_ids_mapping,
+        link_missing_ids=link_missing_ids,
+    ):
+        merged_results = indexed_article_ids(article_ids_index)
 
-    # 3. Deduplicates article records
-    merged_results = merge_article_ids(all_article_ids)
     logger.success(f"Found {len(merged_results)} total results, took {time.time() - start} seconds")
 
-    # 4. Store results into a json file
-    store_data_as_json(merged_results, output_folder / STORE_RESULTS_FILE_NAME)
+    # 3. Store results into a json file
+    store_results(merged_results, results_file)
+    if columnar_results or run_delta_report:
+        store_columns_and_delta(
+            article_ids_index,
+            output_folder,
+            run_delta_report=run_delta_report,
+        )
+    store_last_run(
+        devices_indicators,
+        year_bounds,
+        db,
+        query_plan_keys=[query_plan["key"] for query_plan in query_plans],
+        folder=output_folder,
+        started_at=datetime.fromtimestamp(start, UTC),
+    )
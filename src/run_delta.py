@@ -0,0 +1,127 @@
+from pathlib import Path
+from typing import TypedDict
+
+import numpy as np
+from loguru import logger
+
+from src.columnar_results import (
+    MANIFEST_FILE_NAME,
+    ColumnarResults,
+    contains_pmcids,
+    contains_pmids,
+    load_columnar_results,
+    lookup_pmcids,
+    lookup_pmids,
+)
+from src.packed_article_ids import (
+    NULL_ID,
+    PackedArticleIds,
+    is_in_sorted,
+    sorted_unique,
+    unpack_article_ids,
+)
+from src.utils import store_data_as_json
+
+RUN_DELTA_FILE_NAME = "run_delta.json"
+
+
+class RunDelta(TypedDict):
+    """Changes of found article ids since previous run.
+
+    Attributes:
+        added (PackedArticleIds): articles sharing no id with previous run articles
+        removed (PackedArticleIds): previous run articles sharing no id with current ones
+        upgraded (PackedArticleIds): complete articles only known partially by previous run
+            (pmcid or pmid only)
+
+    """
+
+    added: PackedArticleIds
+    removed: PackedArticleIds
+    upgraded: PackedArticleIds
+
+
+def compute_run_delta(previous: ColumnarResults, current: PackedArticleIds) -> RunDelta:
+    """Compare current article ids with previous run ones.
+
+    Args:
+        previous (ColumnarResults): previous run results, memory-mapped
+        current (PackedArticleIds): current run unique article ids
+
+    Returns:
+        RunDelta: added, removed and upgraded articles
+
+    Notes:
+        Both sides are sorted uint32 columns, compared by vectorized binary searches: O(n log n)
+        without any Python loop nor set of ids, and previous run ids stay on disk.
+
+    """
+    pmcids, pmids = current["pmcids"], current["pmids"]
+    is_in_previous_pmcids = contains_pmcids(previous, pmcids)
+    is_in_previous_pmids = contains_pmids(previous, pmids)
+
+    is_added = ~is_in_previous_pmcids & ~is_in_previous_pmids
+    is_complete = (pmcids != NULL_ID) & (pmids != NULL_ID)
+    is_upgraded = is_complete & (
+        (is_in_previous_pmcids & (lookup_pmids(previous, pmcids) == NULL_ID))
+        | (is_in_previous_pmids & (lookup_pmcids(previous, pmids) == NULL_ID))
+    )
+
+    current_pmcids = sorted_unique(pmcids[pmcids != NULL_ID])
+    current_pmids = sorted_unique(pmids[pmids != NULL_ID])
+    # previous articles with a pmcid (and their pmid if any), then pmid only ones
+    previous_pmcids, pmids_of_previous_pmcids = previous["by_pmcid"]
+    previous_pmids, pmcids_of_previous_pmids = previous["by_pmid"]
+    is_removed_with_pmcid = ~is_in_sorted(previous_pmcids, current_pmcids) & ~(
+        is_in_sorted(pmids_of_previous_pmcids, current_pmids)
+        & (pmids_of_previous_pmcids != NULL_ID)
+    )
+    is_removed_pmid_only = (pmcids_of_previous_pmids == NULL_ID) & ~is_in_sorted(
+        previous_pmids,
+        current_pmids,
+    )
+
+    return RunDelta(
+        added=PackedArticleIds(pmcids=pmcids[is_added], pmids=pmids[is_added]),
+        removed=PackedArticleIds(
+            pmcids=np.concatenate(
+                [
+                    previous_pmcids[is_removed_with_pmcid],
+                    pmcids_of_previous_pmids[is_removed_pmid_only],
+                ],
+            ),
+            pmids=np.concatenate(
+                [
+                    pmids_of_previous_pmcids[is_removed_with_pmcid],
+                    previous_pmids[is_removed_pmid_only],
+                ],
+            ),
+        ),
+        upgraded=PackedArticleIds(pmcids=pmcids[is_upgraded], pmids=pmids[is_upgraded]),
+    )
+
+
+def store_run_delta(current: PackedArticleIds, previous_folder: Path, file_path: Path) -> None:
+    """Store changes of article ids since previous run, if its columnar results exist.
+
+    Args:
+        current (PackedArticleIds): current run unique article ids
+        previous_folder (Path): folder of previous run columnar results (see
+            `store_columnar_results`), to be replaced by current ones only afterwards
+        file_path (Path): json file to store delta into, with the number of articles by change
+
+    """
+    if not (previous_folder / MANIFEST_FILE_NAME).exists():
+        logger.info("No previous columnar results, no run delta to compute")
+        return
+
+    run_delta = compute_run_delta(load_columnar_results(previous_folder), current)
+    counts = {change: int(ids["pmids"].size) for change, ids in run_delta.items()}
+    logger.info(f"Changes since previous run: {counts}")
+    store_data_as_json(
+        {
+            "counts": counts,
+            **{change: unpack_article_ids(ids) for change, ids in run_delta.items()},
+        },
+        file_path,
+    )
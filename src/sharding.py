@@ -0,0 +1,225 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import TypedDict
+
+import numpy as np
+from loguru import logger
+
+from src.article_ids_index import (
+    ArticleIdsIndex,
+    create_article_ids_index,
+    merge_pending_article_ids,
+)
+from src.cross_database_search import (
+    log_conflicting_article_ids,
+    pmc_search_and_fetch,
+    pub_med_search_and_fetch,
+)
+from src.eutils_retrieval.api import NCBIDatabase
+from src.eutils_retrieval.query import add_year_bound_query, create_year_bound_query
+from src.eutils_retrieval.search import ArticleIds
+from src.packed_article_ids import (
+    PackedArticleIds,
+    merge_packed_article_ids,
+    unpack_article_ids,
+)
+from src.query_plan import (
+    QUERY_PLANS_FOLDER_NAME,
+    SUB_QUERY_ID_LENGTH,
+    db_names,
+    load_or_create_query_plan,
+)
+from src.utils import load_data_from_json, store_data_as_json
+from src.year_cache import years_in_bounds
+
+SHARDS_FOLDER_NAME = "shards"
+SHARD_PLAN_FILE_NAME = "shard_plan.json"
+
+
+class ShardTask(TypedDict):
+    """Single search of a shard: one query in one database, for one publication year if bounded.
+
+    Attributes:
+        query (str): Entrez text query, with its publication year
+        db (str): name of the database to search
+
+    """
+
+    query: str
+    db: str
+
+
+class ShardPlan(TypedDict):
+    """Searches of a run split into shards, each one to be run on any node.
+
+    Attributes:
+        query_plan_key (str): key of the query plan the shards were created from
+        shards (list[list[ShardTask]]): searches of each shard
+
+    """
+
+    query_plan_key: str
+    shards: list[list[ShardTask]]
+
+
+def shard_plan_key(shard_plan: ShardPlan) -> str:
+    """Key of a shard plan: its query plan key, and how its searches are dealt out to shards."""
+    content = json.dumps(shard_plan, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()[:SUB_QUERY_ID_LENGTH]
+
+
+def shard_result_path(folder: Path, shard_index: int, plan_key: str) -> Path:
+    """Path of the partial result of a shard for a shard plan key, see `run_shard`."""
+    return folder / f"shard_{shard_index}_{plan_key}.npy"
+
+
+def create_shard_plan(  # noqa: PLR0913, PLR0917
+    devices: list[str],
+    indicators: list[str],
+    year_bounds: tuple[int | None, int | None],
+    db: tuple[NCBIDatabase, ...] | NCBIDatabase,
+    nb_shards: int,
+    folder: Path,
+    *,
+    term_counts: dict[str, int] | None = None,
+    max_results_by_query: int | None = None,
+) -> ShardPlan:
+    """Split all searches of a run into shards, and store them as a work manifest.
+
+    Searches are one by sub-query, database and publication year (date shard), and dealt out to
+    shards in turn so that shards of a same plan get a similar amount of work. Partial results of
+    previous plans in `folder` are deleted.
+
+    Args:
+        devices (list[str]): devices and related terms
+        indicators (list[str]): indicators and related terms
+        year_bounds (tuple[int, int]): start and end year of publication
+        db (tuple[NCBIDatabase, ...] | NCBIDatabase): databases searched
+        nb_shards (int): number of shards to create
+        folder (Path): folder to store the plan into, shared by nodes running shards
+        term_counts (dict[str, int], optional): number of articles matching each lowercase term
+        max_results_by_query (int, optional): max number of articles estimated for a query
+
+    Returns:
+        ShardPlan: plan stored in `folder`
+
+    Raises:
+        ValueError: if `nb_shards` is not positive
+
+    """
+    if nb_shards < 1:
+        msg = f"Number of shards should be positive, got {nb_shards}"
+        raise ValueError(msg)
+
+    years = years_in_bounds(year_bounds)
+    query_plan = load_or_create_query_plan(
+        devices,
+        indicators,
+        year_bounds=(None, None) if years else year_bounds,
+        db=db,
+        folder=folder / QUERY_PLANS_FOLDER_NAME,
+        term_counts=term_counts,
+        max_results_by_query=max_results_by_query,
+    )
+    queries = [sub_query["query"] for sub_query in query_plan["sub_queries"]]
+    if years:
+        queries = [
+            add_year_bound_query(query, create_year_bound_query(year, year))
+            for query in queries
+            for year in years
+        ]
+    tasks = [ShardTask(query=query, db=db_name) for query in queries for db_name in db_names(db)]
+
+    shard_plan = ShardPlan(
+        query_plan_key=query_plan["key"],
+        shards=[tasks[shard_index::nb_shards] for shard_index in range(nb_shards)],
+    )
+    for file_path in folder.glob("shard_*.npy"):
+        logger.debug(f"Deleting partial result {file_path} of a previous shard plan")
+        file_path.unlink()
+    store_data_as_json(shard_plan, folder / SHARD_PLAN_FILE_NAME)
+    logger.info(f"Planned {len(tasks)} searches into {nb_shards} shards, stored in {folder}")
+    return shard_plan
+
+
+def run_shard(folder: Path, shard_index: int) -> None:
+    """Run all searches of a shard, and store its unique article ids as a compact partial result.
+
+    Args:
+        folder (Path): folder of the shard plan (see `create_shard_plan`), partial result is
+            stored into it
+        shard_index (int): index of the shard to run, from 0
+
+    Raises:
+        ValueError: if the shard is not in the plan
+
+    Notes:
+        Partial result is a (2, n) uint32 array of pmcids and pmids (8 bytes by article),
+        written to a temporary file first so that a partial result is always complete. Its name
+        holds the key of the shard plan run (see `shard_plan_key`), checked by `merge_shards`.
+
+    """
+    shard_plan: ShardPlan = load_data_from_json(folder / SHARD_PLAN_FILE_NAME)
+    if not 0 <= shard_index < len(shard_plan["shards"]):
+        msg = f"Shard {shard_index} not in plan of {len(shard_plan['shards'])} shards"
+        raise ValueError(msg)
+
+    search_method_by_db = {
+        NCBIDatabase.PMC: pmc_search_and_fetch,
+        NCBIDatabase.PUB_MED: pub_med_search_and_fetch,
+    }
+    tasks = shard_plan["shards"][shard_index]
+    article_ids_index = create_article_ids_index()
+    for counter, task in enumerate(tasks):
+        search_method_by_db[NCBIDatabase(task["db"])](
+            task["query"],
+            article_ids_index=article_ids_index,
+            prefix_log=f"(shard {shard_index}, {counter + 1}/{len(tasks)}) ",
+        )
+    merge_pending_article_ids(article_ids_index)
+
+    packed_article_ids = article_ids_index["unique"]
+    file_path = shard_result_path(folder, shard_index, shard_plan_key(shard_plan))
+    temporary_path = file_path.with_name(f".tmp-{file_path.name}")
+    np.save(temporary_path, np.stack([packed_article_ids["pmcids"], packed_article_ids["pmids"]]))
+    temporary_path.replace(file_path)
+    logger.success(f"Shard {shard_index} found {packed_article_ids['pmids'].size} unique articles")
+
+
+def merge_shards(folder: Path) -> list[ArticleIds]:
+    """Merge partial results of all shards, with the same semantics as `merge_article_ids`.
+
+    Args:
+        folder (Path): folder of the shard plan and partial results
+
+    Returns:
+        list[ArticleIds]: unique article ids found by all shards
+
+    Raises:
+        ValueError: if a shard has no partial result for the current shard plan yet
+
+    """
+    shard_plan: ShardPlan = load_data_from_json(folder / SHARD_PLAN_FILE_NAME)
+    plan_key = shard_plan_key(shard_plan)
+    file_paths = [
+        shard_result_path(folder, index, plan_key) for index in range(len(shard_plan["shards"]))
+    ]
+    missing_shards = [index for index, path in enumerate(file_paths) if not path.exists()]
+    mismatching_shards = [
+        index for index in missing_shards if any(folder.glob(f"shard_{index}_*.npy"))
+    ]
+    if mismatching_shards:
+        msg = f"Shards {mismatching_shards} were run for another shard plan, run them again"
+        raise ValueError(msg)
+    if missing_shards:
+        msg = f"Shards {missing_shards} have not been run yet"
+        raise ValueError(msg)
+
+    partial_results = [np.load(file_path) for file_path in file_paths]
+    merged = merge_packed_article_ids(
+        *(PackedArticleIds(pmcids=pmcids, pmids=pmids) for pmcids, pmids in partial_results),
+    )
+    log_conflicting_article_ids(ArticleIdsIndex(unique=merged, pending=[], nb_pending=0))
+    logger.success(f"Merged {len(file_paths)} shards into {merged['pmids'].size} unique articles")
+    return unpack_article_ids(merged)
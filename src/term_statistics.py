@@ -0,0 +1,108 @@
+import json
+from datetime import UTC, date, datetime, timedelta
+from pathlib import Path
+
+from loguru import logger
+
+from src.eutils_retrieval.api import NCBIDatabase
+
+TERM_STATISTICS_FILE_NAME = "term_statistics.json"
+
+OBSERVATION_DATES_KEY = "observed_on"
+"""Key of the ISO 8601 dates each count was observed on, by database name then term"""
+
+DEAD_TERM_MAX_AGE = timedelta(days=30)
+"""Age after which a term matching no article is searched again, in case articles were added"""
+
+type TermStatistics = dict[str, dict]
+"""Number of articles matching each lowercase term by database name, and observation dates"""
+
+
+def load_term_statistics(file_path: Path) -> TermStatistics:
+    """Load term statistics stored by a previous run, if any.
+
+    Args:
+        file_path (Path): path of the json file storing statistics
+
+    Returns:
+        TermStatistics: statistics stored, empty if never stored
+
+    """
+    if not file_path.exists():
+        logger.debug(f"No term statistics stored in {file_path}")
+        return {}
+
+    with file_path.open() as reader:
+        return json.load(reader)
+
+
+def update_term_statistics(
+    term_statistics: TermStatistics,
+    db: NCBIDatabase,
+    term_counts: dict[str, int],
+    observed_on: date | None = None,
+) -> None:
+    """Update statistics in place with the number of articles matching terms in `db`.
+
+    Args:
+        term_statistics (TermStatistics): statistics to update
+        db (NCBIDatabase): database searched
+        term_counts (dict[str, int]): number of articles matching each lowercase term
+        observed_on (date, optional): date of the search. Defaults to today (UTC).
+
+    """
+    observed_on = observed_on or datetime.now(UTC).date()
+    term_statistics.setdefault(db.value, {}).update(term_counts)
+    term_statistics.setdefault(OBSERVATION_DATES_KEY, {}).setdefault(db.value, {}).update(
+        dict.fromkeys(term_counts, observed_on.isoformat()),
+    )
+
+
+def merge_term_statistics(term_statistics: TermStatistics, other: TermStatistics) -> None:
+    """Update statistics in place with the counts of `other`, e.g. gathered by another thread."""
+    for db_name, term_counts in other.items():
+        if db_name == OBSERVATION_DATES_KEY:
+            merge_term_statistics(term_statistics.setdefault(db_name, {}), term_counts)
+        else:
+            term_statistics.setdefault(db_name, {}).update(term_counts)
+
+
+def known_term_counts(
+    term_statistics: TermStatistics,
+    db: tuple[NCBIDatabase, ...] | NCBIDatabase,
+    today: date | None = None,
+) -> dict[str, int]:
+    """Get the number of articles matching each term in the databases searched.
+
+    Only terms known for every database are given, with their count in the database where they
+    match the most articles: a term matching no article in PMC could still match some in PubMed.
+    Terms matching no article are left unknown once their count is older than
+    `DEAD_TERM_MAX_AGE` (or undated), so they are searched again and their count updated.
+
+    Args:
+        term_statistics (TermStatistics): statistics stored
+        db (tuple[NCBIDatabase, ...] | NCBIDatabase): databases searched
+        today (date, optional): current date, used to check counts age. Defaults to today (UTC).
+
+    Returns:
+        dict[str, int]: number of articles matching each lowercase term
+
+    """
+    dbs = db if isinstance(db, tuple) else (db,)
+    counts_by_db = [term_statistics.get(d.value, {}) for d in dbs]
+
+    known_terms = set.intersection(*(set(counts) for counts in counts_by_db))
+    known_counts = {term: max(counts[term] for counts in counts_by_db) for term in known_terms}
+
+    oldest_dead_date = ((today or datetime.now(UTC).date()) - DEAD_TERM_MAX_AGE).isoformat()
+    dates_by_db = [term_statistics.get(OBSERVATION_DATES_KEY, {}).get(d.value, {}) for d in dbs]
+    stale_dead_terms = {
+        term
+        for term, count in known_counts.items()
+        if count == 0 and any(dates.get(term, "") < oldest_dead_date for dates in dates_by_db)
+    }
+    if stale_dead_terms:
+        logger.info(f"Searching again {len(stale_dead_terms)} terms matching no article")
+        logger.debug(f"Terms searched again: {sorted(stale_dead_terms)}")
+
+    return {term: count for term, count in known_counts.items() if term not in stale_dead_terms}
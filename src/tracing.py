@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, TypedDict
+
+from loguru import logger
+
+
+class Span(TypedDict):
+    """Timed step of a run, nested in the steps of the same thread running when it started.
+
+    Attributes:
+        name (str): name of the step
+        start_ns (int): start time, from `time.perf_counter_ns`
+        duration_ns (int): duration of the step
+        thread_id (int): native id of the thread running the step
+        thread_name (str): name of the thread running the step
+        attributes (dict): attributes of the step (database, offset, bytes...)
+
+    """
+
+    name: str
+    start_ns: int
+    duration_ns: int
+    thread_id: int
+    thread_name: str
+    attributes: dict[str, Any]
+
+
+TRACED_SPANS: list[Span] = []
+"""Spans ended since `start_tracing`"""
+TRACING = threading.Event()
+"""Set while tracing, spans are not timed otherwise"""
+
+
+def start_tracing() -> None:
+    """Record spans of all threads from now on, until `stop_tracing`."""
+    TRACED_SPANS.clear()
+    TRACING.set()
+
+
+def stop_tracing() -> list[Span]:
+    """Stop recording spans.
+
+    Returns:
+        list[Span]: spans ended since `start_tracing`, in order of end
+
+    """
+    TRACING.clear()
+    spans = TRACED_SPANS.copy()
+    TRACED_SPANS.clear()
+    return spans
+
+
+@contextmanager
+def trace_span(name: str, **attributes: Any) -> Iterator[dict[str, Any]]:  # noqa: ANN401
+    """Time a step of a run as a span, while tracing (see `start_tracing`).
+
+    Spans started within the step by the same thread are nested into it.
+
+    Args:
+        name (str): name of the step
+        **attributes: attributes of the step, known before it runs
+
+    Yields:
+        dict[str, Any]: attributes of the span, to add the ones only known during the step
+
+    """
+    if not TRACING.is_set():
+        yield attributes
+        return
+
+    start_ns = time.perf_counter_ns()
+    try:
+        yield attributes
+    finally:
+        thread = threading.current_thread()
+        TRACED_SPANS.append(
+            Span(
+                name=name,
+                start_ns=start_ns,
+                duration_ns=time.perf_counter_ns() - start_ns,
+                thread_id=thread.native_id or 0,
+                thread_name=thread.name,
+                attributes=attributes,
+            ),
+        )
+
+
+def to_chrome_trace_events(spans: list[Span]) -> list[dict]:
+    """Convert spans into Chrome trace events: a complete event by span, and thread names.
+
+    Notes:
+        See https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+        for the format, opened by Perfetto (https://ui.perfetto.dev) or `chrome://tracing`.
+
+    """
+    pid = os.getpid()
+    start_ns = min((span["start_ns"] for span in spans), default=0)
+    thread_names = {span["thread_id"]: span["thread_name"] for span in spans}
+    return [
+        *(
+            {"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in thread_names.items()
+        ),
+        *(
+            {
+                "ph": "X",
+                "name": span["name"],
+                "pid": pid,
+                "tid": span["thread_id"],
+                "ts": (span["start_ns"] - start_ns) / 1e3,
+                "dur": span["duration_ns"] / 1e3,
+                "args": span["attributes"],
+            }
+            for span in sorted(spans, key=lambda span: span["start_ns"])
+        ),
+    ]
+
+
+def store_chrome_trace(spans: list[Span], file_path: Path) -> None:
+    """Store spans as a Chrome trace-event json file, to open with Perfetto."""
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with file_path.open("w") as trace_writer:
+        json.dump(
+            {"traceEvents": to_chrome_trace_events(spans), "displayTimeUnit": "ms"},
+            trace_writer,
+            default=str,
+        )
+    logger.info(f"Stored {len(spans)} spans into {file_path}")
+
+
+def stop_and_store_trace(file_path: Path) -> None:
+    """Stop tracing, and store spans traced as a Chrome trace-event json file."""
+    store_chrome_trace(stop_tracing(), file_path)
@@ -5,6 +5,8 @@ from pathlib import Path
 
 from loguru import logger
 
+from src.tracing import trace_span
+
 
 def flatten_dict_to_list(d: dict[str, list[str]]) -> list:
     """Flatten a dictionary into a list of its keys and values.
@@ -25,6 +27,7 @@ def add_timer_and_logger(task_description: str) -> Callable:  # pragma: no cover
     Notes:
         You can use the method decorated with an additional argument `prefix_log` to prefix
         each call with a specific value (current run number for example).
+        While tracing, each call is timed as a span as well (see `trace_span`).
 
     Args:
         task_description (str): used to describe the current method task in logs
@@ -33,12 +36,14 @@ def add_timer_and_logger(task_description: str) -> Callable:  # pragma: no cover
 
     def decorator(method: Callable) -> Callable:
         def wrapper(*args, prefix_log: str = "", **kwargs):  # noqa: ANN002, ANN003, ANN202
-            start = time.time()
+            start = time.perf_counter()
 
             logger.info(f"{prefix_log}Starting {task_description}")
-            result = method(*args, **kwargs)
+            with trace_span(task_description):
+                result = method(*args, **kwargs)
             logger.info(
-                f"{prefix_log}Finished {task_description}, took {time.time() - start} seconds",
+                f"{prefix_log}Finished {task_description}, "
+                f"took {time.perf_counter() - start} seconds",
             )
             return result
 
@@ -61,6 +66,22 @@ def store_data_as_json(data: list | dict, file_path: Path) -> None:
 
     logger.debug(f"Writing data into {file_path}")
 
-    file_path.parent.mkdir(exist_ok=True)
-    with file_path.open("w") as json_writer:
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with trace_span("write json", file=file_path.name), file_path.open("w") as json_writer:
         json.dump(data, json_writer, indent=4)
+
+
+def load_data_from_json(file_path: Path) -> list | dict:
+    """Load data stored into a json file.
+
+    Args:
+        file_path (Path): path of file to load (.json extension)
+
+    Returns:
+        dict or list: data stored
+
+    """
+    logger.debug(f"Reading data from {file_path}")
+
+    with file_path.open() as json_reader:
+        return json.load(json_reader)
@@ -0,0 +1,168 @@
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import TypedDict
+
+from loguru import logger
+
+from src.article_ids_index import (
+    ArticleIdsIndex,
+    add_article_ids,
+    create_article_ids_index,
+    indexed_article_ids,
+)
+from src.article_store import ArticleStore, upsert_article_ids
+from src.cross_database_search import (
+    log_conflicting_article_ids,
+    pmc_search_and_fetch,
+    pub_med_search_and_fetch,
+)
+from src.eutils_retrieval.api import NCBIDatabase
+from src.eutils_retrieval.query import add_year_bound_query, create_year_bound_query
+from src.eutils_retrieval.search import ArticleIds
+from src.query_plan import sub_query_id
+from src.term_statistics import TermStatistics
+from src.utils import load_data_from_json, store_data_as_json
+
+YEAR_CACHE_FOLDER_NAME = "year_cache"
+
+VOLATILE_YEAR_MAX_AGE = timedelta(days=1)
+"""Articles are still published for the current year, its results are searched again after"""
+
+
+class CachedYear(TypedDict):
+    """Articles found by a query in a database, for a single publication year.
+
+    Attributes:
+        cached_at (str): ISO 8601 datetime (UTC) of the search
+        article_ids (list[ArticleIds]): articles found
+
+    """
+
+    cached_at: str
+    article_ids: list[ArticleIds]
+
+
+def years_in_bounds(year_bounds: tuple[int | None, int | None]) -> list[int] | None:
+    """List every publication year searched with these bounds (see `create_year_bound_query`).
+
+    Returns:
+        list[int]: years searched, None if not bounded (all years)
+
+    """
+    start_year, end_year = year_bounds
+    if not start_year and not end_year:
+        return None
+    return list(range(start_year or end_year, (end_year or start_year) + 1))
+
+
+def cached_year_path(folder: Path, query: str, db: NCBIDatabase, year: int) -> Path:
+    """Path of the results cached for a query, a database and a publication year."""
+    return folder / db.value / f"{sub_query_id(query)}_{year}.json"
+
+
+def load_cached_year(file_path: Path, year: int, now: datetime) -> list[ArticleIds] | None:
+    """Load articles cached for a year, if they are still valid.
+
+    Years already past when cached are closed and always valid, while results cached during
+    their year are only valid for `VOLATILE_YEAR_MAX_AGE` since articles were still added to it.
+
+    Args:
+        file_path (Path): path of the cached results
+        year (int): publication year of the results
+        now (datetime): current datetime (UTC)
+
+    Returns:
+        list[ArticleIds]: cached articles, None if not cached or outdated
+
+    """
+    if not file_path.exists():
+        return None
+
+    cached_year: CachedYear = load_data_from_json(file_path)
+    cached_at = datetime.fromisoformat(cached_year["cached_at"])
+    if year < cached_at.year:
+        return cached_year["article_ids"]
+
+    if now - cached_at < VOLATILE_YEAR_MAX_AGE:
+        return cached_year["article_ids"]
+
+    logger.debug(f"Results cached in {file_path} are outdated")
+    return None
+
+
+def ncbi_search_and_fetch_by_year(  # noqa: PLR0913
+    queries: tuple[str, ...],
+    db: tuple[NCBIDatabase, ...] | NCBIDatabase,
+    years: list[int],
+    folder: Path,
+    *,
+    term_statistics: TermStatistics | None = None,
+    now: datetime | None = None,
+    article_ids_index: ArticleIdsIndex | None = None,
+    article_store: ArticleStore | None = None,
+) -> list[ArticleIds]:
+    """Search for all articles and fetch summary, one publication year at a time, using a cache.
+
+    Results are cached by query, database and year: a run on any year range only searches years
+    never searched before (or the current year once outdated) and reuses the others.
+
+    Args:
+        queries (list[str]): queries to find specific articles across databases, without years.
+        db (tuple[NCBIDatabase, ...] | NCBIDatabase): Databases source for article search.
+        years (list[int]): publication years to search.
+        folder (Path): folder of the cache.
+        term_statistics (TermStatistics, optional): updated in place with the number of articles
+            matching each term of queries, given by search responses.
+        now (datetime, optional): current datetime (UTC), used to check cache validity.
+        article_ids_index (ArticleIdsIndex, optional): index fed with found article ids, can be
+            given to de-duplicate them with articles previously found.
+        article_store (ArticleStore, optional): if given, found article ids, cached or not, are
+            upserted into it with the query (with year) and database that found them.
+
+    Returns:
+        list[ArticleIds]: all article ids found based on queries, and already in the index.
+
+    """
+    now = now or datetime.now(UTC)
+    dbs = db if isinstance(db, tuple) else (db,)
+    search_method_by_db = {
+        NCBIDatabase.PMC: pmc_search_and_fetch,
+        NCBIDatabase.PUB_MED: pub_med_search_and_fetch,
+    }
+
+    nb_searches = len(queries) * len(dbs) * len(years)
+    logger.info(f"Will run {len(queries)} queries on {[d.value for d in dbs]} for years {years}")
+
+    if article_ids_index is None:
+        article_ids_index = create_article_ids_index()
+    nb_cached = 0
+    for query in queries:
+        for d in dbs:
+            for year in years:
+                file_path = cached_year_path(folder, query, d, year)
+                year_query = add_year_bound_query(query, create_year_bound_query(year, year))
+                article_ids = load_cached_year(file_path, year, now)
+                if article_ids is not None:
+                    nb_cached += 1
+                    add_article_ids(article_ids_index, article_ids)
+                    if article_store is not None:
+                        upsert_article_ids(
+                            article_store,
+                            article_ids,
+                            query_id=sub_query_id(year_query),
+                            db=d,
+                        )
+                else:
+                    article_ids = search_method_by_db[d](
+                        year_query,
+                        term_statistics=term_statistics,
+                        article_ids_index=article_ids_index,
+                        article_store=article_store,
+                        prefix_log=f"({year}) ",
+                    )
+                    cached_year = CachedYear(cached_at=now.isoformat(), article_ids=article_ids)
+                    store_data_as_json(cached_year, file_path)
+
+    logger.info(f"Reused {nb_cached}/{nb_searches} cached results by query, database and year")
+    log_conflicting_article_ids(article_ids_index)
+    return indexed_article_ids(article_ids_index)
@@ -1,4 +1,6 @@
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 
 import httpx
@@ -6,7 +8,20 @@ import pytest
 from httpx import HTTPStatusError
 from pytest_httpx import HTTPXMock
 
-from src.eutils_retrieval.api import NCBIDatabase, NCBIEndpoint, SearchEndpointParams, call_eutils
+from src.eutils_retrieval import api
+from src.eutils_retrieval.api import (
+    LinkEndpointParams,
+    NCBIDatabase,
+    NCBIEndpoint,
+    SearchEndpointParams,
+    call_eutils,
+    close_eutils_clients,
+    eutils_client,
+    nb_coalesced_calls,
+    normalized_params,
+)
+from src.eutils_retrieval.extract import extract_all_db_article_ids
+from src.eutils_retrieval.search import StorageInfos, fetch_stored_articles_by_batch
 
 
 def test_call_eutils(httpx_mock: HTTPXMock):
@@ -29,6 +44,29 @@ def test_call_eutils(httpx_mock: HTTPXMock):
     assert result == {"call": "response"}
 
 
+def test_call_eutils_post(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url=NCBIEndpoint.LINK.full_url(),
+        method="POST",
+        match_content=b"dbfrom=pubmed&db=pmc&linkname=pubmed_pmc&id=1&id=2&retmode=json",
+        json={"call": "response"},
+    )
+
+    result = call_eutils(
+        NCBIEndpoint.LINK,
+        params=LinkEndpointParams(
+            dbfrom=NCBIDatabase.PUB_MED.value,
+            db=NCBIDatabase.PMC.value,
+            linkname="pubmed_pmc",
+            id=["1", "2"],
+            retmode="json",
+        ),
+        retry=0,
+        method="POST",
+    )
+    assert result == {"call": "response"}
+
+
 def test_call_eutils_no_retry_error(httpx_mock: HTTPXMock):
     httpx_mock.add_response(
         status_code=HTTPStatus.REQUEST_TIMEOUT,
@@ -91,3 +129,112 @@ def test_call_eutils_retry(httpx_mock: HTTPXMock):
         retry=2,
     )
     assert result == {"call": "response"}
+
+
+def test_eutils_client_shared():
+    client = eutils_client(retry=0)
+
+    assert eutils_client(retry=0) is client
+    assert eutils_client(retry=1) is not client
+
+    close_eutils_clients()
+    assert client.is_closed
+    assert eutils_client(retry=0) is not client
+
+
+SEARCH_PARAMS = SearchEndpointParams(
+    db=NCBIDatabase.PMC,
+    term="my_query",
+    usehistory="n",
+    retmode="json",
+)
+
+
+def call_eutils_concurrently(nb_calls: int) -> list:
+    """Make identical search calls from several threads, returns their results or errors."""
+
+    def call_search(_: int) -> dict | list | Exception:
+        try:
+            return call_eutils(NCBIEndpoint.SEARCH, SEARCH_PARAMS, retry=0)
+        except httpx.HTTPError as error:
+            return error
+
+    with ThreadPoolExecutor(nb_calls) as executor:
+        return list(executor.map(call_search, range(nb_calls)))
+
+
+def wait_for_coalesced_calls(nb_calls: int, endpoint: NCBIEndpoint = NCBIEndpoint.SEARCH) -> None:
+    while api.COALESCED_CALLS_COUNTS[endpoint] < nb_calls:
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def coalesced_calls_counts(monkeypatch):
+    monkeypatch.setattr(api, "COALESCED_CALLS_COUNTS", dict.fromkeys(NCBIEndpoint, 0))
+
+
+@pytest.mark.usefixtures("coalesced_calls_counts")
+def test_call_eutils_coalesces_identical_calls(httpx_mock: HTTPXMock):
+    def leader_response(_: httpx.Request) -> httpx.Response:
+        wait_for_coalesced_calls(2)
+        return httpx.Response(HTTPStatus.OK, json={"call": "response"})
+
+    httpx_mock.add_callback(leader_response, url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"))
+
+    assert call_eutils_concurrently(3) == [{"call": "response"}] * 3
+    assert len(httpx_mock.get_requests()) == 1
+    assert nb_coalesced_calls() == 2
+
+    # once done, an identical call is sent again
+    httpx_mock.add_response(json={"call": "new_response"})
+    assert call_eutils(NCBIEndpoint.SEARCH, SEARCH_PARAMS, retry=0) == {"call": "new_response"}
+
+
+@pytest.mark.usefixtures("coalesced_calls_counts")
+def test_coalesced_calls_fetch_and_extract(httpx_mock: HTTPXMock):
+    def leader_response(_: httpx.Request) -> httpx.Response:
+        wait_for_coalesced_calls(1, NCBIEndpoint.SUMMARY)
+        article = {"articleids": [{"idtype": "pmcid", "value": "PMC1"}]}
+        return httpx.Response(HTTPStatus.OK, json={"result": {"uids": ["1"], "1": article}})
+
+    httpx_mock.add_callback(leader_response)
+    storage_infos = StorageInfos(
+        db=NCBIDatabase.PMC,
+        total_results=1,
+        web_env="web_env",
+        query_key="1",
+    )
+
+    def fetch_and_extract(_: int) -> list:
+        articles = fetch_stored_articles_by_batch(storage_infos)
+        return extract_all_db_article_ids(articles, db=NCBIDatabase.PMC)  # pops its uids
+
+    with ThreadPoolExecutor(2) as executor:
+        results = list(executor.map(fetch_and_extract, range(2)))
+
+    # each caller extracts from its own response data
+    assert results == [[{"pmcid": "PMC1", "pmid": None}]] * 2
+    assert len(httpx_mock.get_requests()) == 1
+
+
+@pytest.mark.usefixtures("coalesced_calls_counts")
+def test_call_eutils_coalesced_error(httpx_mock: HTTPXMock):
+    def leader_error(_: httpx.Request) -> httpx.Response:
+        wait_for_coalesced_calls(1)
+        msg = "Unable to connect"
+        raise httpx.ConnectError(msg)
+
+    httpx_mock.add_callback(leader_error)
+
+    errors = call_eutils_concurrently(2)
+    assert all(isinstance(error, httpx.ConnectError) for error in errors)
+    assert len(httpx_mock.get_requests()) == 1
+
+
+def test_normalized_params():
+    assert normalized_params({"term": "query", "db": NCBIDatabase.PMC.value, "retmax": 10}) == (
+        ("db", "pmc"),
+        ("retmax", "10"),
+        ("term", "query"),
+    )
+    assert normalized_params({"id": ["2", "1"]}) == (("id", "2"), ("id", "1"))
@@ -0,0 +1,50 @@
+from urllib.parse import parse_qs
+
+from pytest_httpx import HTTPXMock
+
+from src.eutils_retrieval.api import NCBIDatabase, NCBIEndpoint
+from src.eutils_retrieval.link import link_uids
+
+PUB_MED_PMC_LINKS = {
+    "header": {"type": "elink", "version": "0.3"},
+    "linksets": [
+        {
+            "dbfrom": "pubmed",
+            "ids": ["36645057"],
+            "linksetdbs": [{"dbto": "pmc", "linkname": "pubmed_pmc", "links": ["9848274"]}],
+        },
+        {"dbfrom": "pubmed", "ids": ["111111111"]},
+    ],
+}
+
+
+def test_link_uids(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url=NCBIEndpoint.LINK.full_url(), method="POST", json=PUB_MED_PMC_LINKS)
+
+    links = link_uids(["36645057", "111111111"], NCBIDatabase.PUB_MED, NCBIDatabase.PMC)
+
+    assert links == {"36645057": "9848274", "111111111": None}
+    params = parse_qs(httpx_mock.get_request().content.decode())
+    assert params["id"] == ["36645057", "111111111"]
+    assert params["linkname"] == ["pubmed_pmc"]
+
+
+def test_link_uids_batches(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url=NCBIEndpoint.LINK.full_url(), method="POST", json=PUB_MED_PMC_LINKS)
+    httpx_mock.add_response(url=NCBIEndpoint.LINK.full_url(), method="POST", json={})
+
+    links = link_uids(
+        ["36645057", "111111111", "222"],
+        NCBIDatabase.PUB_MED,
+        NCBIDatabase.PMC,
+        batch_size=2,
+    )
+
+    # "222" is missing from the second response: not cached as having no link
+    assert links == {"36645057": "9848274", "111111111": None}
+    assert len(httpx_mock.get_requests()) == 2
+
+
+def test_link_uids_empty(httpx_mock: HTTPXMock):
+    assert link_uids([], NCBIDatabase.PMC, NCBIDatabase.PUB_MED) == {}
+    assert not httpx_mock.get_requests()
@@ -1,11 +1,25 @@
 import pytest
 
+from src.config import (
+    HEMOSTATIC_DEVICES_FLAT,
+    HEMOSTATIC_DEVICES_MINI_FLAT,
+    UROLOGY_INDICATORS_FLAT,
+    UROLOGY_INDICATORS_MINI_FLAT,
+)
 from src.eutils_retrieval.query import (
     biggest_nb_words_possible,
+    contains_words,
     create_complete_combinations_queries,
     create_e_queries,
     create_one_combination_query,
+    create_packed_combinations_queries,
     create_year_bound_query,
+    pack_terms,
+    prune_dead_terms,
+    quoted_term_length,
+    remove_redundant_terms,
+    smallest_capacity_by_nb_groups,
+    url_encoded_length,
 )
 
 TEST_DEVICES = [
@@ -20,23 +34,57 @@ TEST_INDICATORS = ["Urology Indicators", "urological surgery", "vascular surgery
 def test_create_e_queries():
     result = create_e_queries(["a", "b", "c"], ["1", "2", "3"], (2023, 2024), 39)
     assert list(result) == [
-        '(("a" OR "b") AND ("1" OR "2")) AND 2023[PDAT]:2024[PDAT]',
-        '(("a" OR "b") AND ("3")) AND 2023[PDAT]:2024[PDAT]',
-        '(("c") AND ("1" OR "2")) AND 2023[PDAT]:2024[PDAT]',
-        '(("c") AND ("3")) AND 2023[PDAT]:2024[PDAT]',
+        '(("a" OR "b") AND ("1" OR "2" OR "3")) AND 2023[PDAT]:2024[PDAT]',
+        '(("c") AND ("1" OR "2" OR "3")) AND 2023[PDAT]:2024[PDAT]',
     ]
 
 
 def test_create_e_queries_no_bound():
     result = create_e_queries(["a", "b", "c"], ["1", "2", "3"], (None, None), 39)
     assert list(result) == [
-        '("a" OR "b") AND ("1" OR "2")',
-        '("a" OR "b") AND ("3")',
-        '("c") AND ("1" OR "2")',
-        '("c") AND ("3")',
+        '("a" OR "b") AND ("1" OR "2" OR "3")',
+        '("c") AND ("1" OR "2" OR "3")',
     ]
 
 
+def test_create_e_queries_remove_redundancies():
+    result = create_e_queries(["a", "a b", "A"], ["1", "2 1"], (None, None), 1000)
+    assert list(result) == ['("a") AND ("1")']
+
+
+def test_create_e_queries_keep_redundancies():
+    result = create_e_queries(["a", "a b"], ["1"], (None, None), 1000, remove_redundancies=False)
+    assert list(result) == ['("a" OR "a b") AND ("1")']
+
+
+def test_create_e_queries_prune_dead_terms():
+    result = create_e_queries(
+        ["a", "b"],
+        ["1", "2"],
+        (None, None),
+        1000,
+        term_counts={"b": 0, "1": 10},
+    )
+    assert list(result) == ['("a") AND ("1" OR "2")']
+
+
+def test_create_e_queries_only_dead_terms():
+    result = create_e_queries(["a", "b"], ["1"], (None, None), 1000, term_counts={"1": 0})
+    assert result == ()
+
+
+def test_create_e_queries_balanced():
+    result = create_e_queries(
+        ["a", "b", "c"],
+        ["1"],
+        (None, None),
+        1000,
+        term_counts={"a": 60, "b": 50, "c": 30},
+        max_results_by_query=90,
+    )
+    assert list(result) == ['("a" OR "c") AND ("1")', '("b") AND ("1")']
+
+
 @pytest.mark.parametrize(
     ("bounds", "expected"),
     [
@@ -108,3 +156,187 @@ def test_create_complete_combinations_queries_split_twice():
         '("c") AND ("1" OR "2")',
         '("c") AND ("3")',
     ]
+
+
+def test_url_encoded_length():
+    assert url_encoded_length('("a b")') == len("%28%22a+b%22%29")
+
+
+def test_quoted_term_length():
+    assert quoted_term_length("a b") == 5
+    assert quoted_term_length("a b", measure=url_encoded_length) == 9
+
+
+def test_pack_terms():
+    # ("ccc" OR "a") is 14 chars, ("ccc" OR "bb") is 15 chars
+    result = pack_terms(["a", "bb", "ccc"], 14)
+    assert result == [["a", "ccc"], ["bb"]]
+
+
+def test_pack_terms_one_group():
+    assert pack_terms(["a", "bb", "ccc"], 1000) == [["a", "bb", "ccc"]]
+
+
+def test_pack_terms_error():
+    with pytest.raises(ValueError, match="Term ccc cannot fit in a group of max length 6"):
+        pack_terms(["a", "ccc"], 6)
+
+
+def test_smallest_capacity_by_nb_groups():
+    # ("a") is 5 chars, ("a" OR "b") 12 chars, ("a" OR "b" OR "c") 19 chars
+    result = smallest_capacity_by_nb_groups(["a", "b", "c"], 5, 100)
+    assert result == [5, 12, 19]
+
+
+def test_create_packed_combinations_queries():
+    result = create_packed_combinations_queries(["a", "b", "c"], ["1", "2", "3"], 39)
+    assert result == {
+        "device_groups": [["a", "b"], ["c"]],
+        "indicator_groups": [["1", "2", "3"]],
+        "queries": ['("a" OR "b") AND ("1" OR "2" OR "3")', '("c") AND ("1" OR "2" OR "3")'],
+        "fill_ratio": (36 + 29) / (2 * 39),
+    }
+
+
+def test_create_packed_combinations_queries_no_split():
+    result = create_packed_combinations_queries(["a", "b"], ["1", "2"], 1_000_000)
+    assert result["queries"] == ['("a" OR "b") AND ("1" OR "2")']
+
+
+def test_create_packed_combinations_queries_impossible():
+    with pytest.raises(
+        ValueError,
+        match=r"Cannot build query since the maximum length allowed \(2\) is not sufficient",
+    ):
+        create_packed_combinations_queries(["a", "b"], ["1", "2"], 2)
+
+
+@pytest.mark.parametrize("measure", [len, url_encoded_length])
+def test_create_packed_combinations_queries_under_max_length(measure):
+    result = create_packed_combinations_queries(
+        HEMOSTATIC_DEVICES_FLAT,
+        UROLOGY_INDICATORS_FLAT,
+        4000,
+        measure=measure,
+    )
+    assert all(measure(query) < 4000 for query in result["queries"])
+    assert 0 < result["fill_ratio"] <= 1
+    # every combination is searched once
+    assert sorted(d for group in result["device_groups"] for d in group) == sorted(
+        HEMOSTATIC_DEVICES_FLAT,
+    )
+    assert sorted(i for group in result["indicator_groups"] for i in group) == sorted(
+        UROLOGY_INDICATORS_FLAT,
+    )
+
+
+@pytest.mark.parametrize(
+    ("devices", "indicators"),
+    [
+        (HEMOSTATIC_DEVICES_FLAT, UROLOGY_INDICATORS_FLAT),
+        (HEMOSTATIC_DEVICES_MINI_FLAT, UROLOGY_INDICATORS_MINI_FLAT),
+        (UROLOGY_INDICATORS_FLAT, HEMOSTATIC_DEVICES_FLAT),
+        (["a", "bb", "ccc", "dddd", "eeeee"], ["1", "22", "333"]),
+        (TEST_DEVICES, TEST_INDICATORS),
+    ],
+)
+@pytest.mark.parametrize("query_max_length", [100, 150, 250, 500, 1000, 2000, 4000, 10_000])
+def test_create_packed_combinations_queries_never_more_queries(
+    devices,
+    indicators,
+    query_max_length,
+):
+    try:
+        legacy_queries = list(
+            create_complete_combinations_queries(devices, indicators, query_max_length),
+        )
+    except ValueError:
+        pytest.skip("Legacy queries cannot be created for this max length")
+
+    result = create_packed_combinations_queries(devices, indicators, query_max_length)
+    assert len(result["queries"]) <= len(legacy_queries)
+    assert all(len(query) < query_max_length for query in result["queries"])
+
+
+def test_remove_redundant_terms():
+    kept, removed = remove_redundant_terms(
+        [
+            "Thrombin",
+            "Human thrombin",
+            "Evithrom",
+            "Human thrombin",
+            "AMP Plus",
+            "AMP",
+            "vascular graft placement",
+            "vascular graft",
+            "graft vascular",
+            "Gelatin-thrombin",
+        ],
+    )
+    assert kept == [
+        "Thrombin",
+        "Evithrom",
+        "AMP",
+        "vascular graft",
+        "graft vascular",
+        "Gelatin-thrombin",
+    ]
+    assert removed == {
+        "Human thrombin": "Thrombin",
+        "AMP Plus": "AMP",
+        "vascular graft placement": "vascular graft",
+    }
+
+
+def test_remove_redundant_terms_exact_duplicates():
+    kept, removed = remove_redundant_terms(["a", "b", "a", "B"])
+    assert kept == ["a", "b"]
+    assert removed == {"a": "a", "B": "b"}
+
+
+def test_remove_redundant_terms_none():
+    kept, removed = remove_redundant_terms(["a", "b"])
+    assert kept == ["a", "b"]
+    assert removed == {}
+
+
+@pytest.mark.parametrize(
+    ("words", "sub_words", "expected"),
+    [
+        (("a", "b", "c"), ("b", "c"), True),
+        (("a", "b", "c"), ("a", "c"), False),
+        (("a", "b"), ("a", "b"), True),
+        (("a",), ("a", "b"), False),
+    ],
+)
+def test_contains_words(words, sub_words, expected):
+    assert contains_words(words, sub_words) == expected
+
+
+def test_prune_dead_terms():
+    kept, dead = prune_dead_terms(["a", "B", "c", "d"], {"a": 10, "b": 0, "c": 0})
+    assert kept == ["a", "d"]
+    assert dead == ["B", "c"]
+
+
+def test_pack_terms_max_group_count():
+    # most frequent terms open groups, rarest fill them
+    result = pack_terms(
+        ["a", "b", "c", "d", "e"],
+        1000,
+        term_counts={"a": 100, "b": 5, "c": 60, "d": 50, "e": 40},
+        max_group_count=100,
+    )
+    assert result == [["a"], ["b", "d"], ["c", "e"]]
+
+
+def test_create_packed_combinations_queries_max_results_by_query():
+    result = create_packed_combinations_queries(
+        ["a", "b", "c"],
+        ["1", "2"],
+        1000,
+        term_counts={"a": 10, "b": 10, "c": 5},
+        max_results_by_query=15,
+    )
+    assert result["device_groups"] == [["a", "c"], ["b"]]
+    assert result["indicator_groups"] == [["1", "2"]]
@@ -9,8 +9,11 @@ from pytest_httpx import HTTPXMock
 from src.eutils_retrieval.api import NCBIDatabase, NCBIEndpoint
 from src.eutils_retrieval.search import (
     StorageInfos,
+    extract_term_counts,
     fetch_all_stored_articles,
     fetch_stored_articles_by_batch,
+    iter_articles_by_uids,
+    iter_stored_articles,
     search_and_store,
 )
 
@@ -28,9 +31,47 @@ def test_pmc_search_and_store_ok(httpx_mock: HTTPXMock, search_and_store_respons
         "query_key": "my_query_key",
         "web_env": "MCID_FAKE_UUID",
         "db": NCBIDatabase.PMC.value,
+        "term_counts": {
+            "hemoblast": 40,
+            "biom'up": 115,
+            "urological surgery": 5509,
+            "vascular surgery": 57080,
+            "renal transplant": 49752,
+            "kidney transplant": 56721,
+            "prostatectomy": 53418,
+            "nephrectomy": 54413,
+            "nephrolithotomy": 5975,
+            "pyeloplasty": 2641,
+            "ureterectomy": 1525,
+            "cystectomy": 26326,
+        },
     }
 
 
+def test_pmc_search_and_store_uids(httpx_mock: HTTPXMock, search_and_store_response):
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        method="GET",
+        json=search_and_store_response,
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        method="GET",
+        json={
+            **search_and_store_response,
+            "esearchresult": {**search_and_store_response["esearchresult"], "count": "2"},
+        },
+    )
+
+    result = search_and_store("my query", db=NCBIDatabase.PUB_MED, nb_uids=1)
+    assert result["uids"] == ["11111111"]
+    assert httpx_mock.get_request().url.params["retmax"] == "1"
+
+    # all uids do not fit
+    result = search_and_store("my query", db=NCBIDatabase.PUB_MED, nb_uids=1)
+    assert "uids" not in result
+
+
 def test_pmc_search_and_store_no_result(httpx_mock: HTTPXMock, search_and_store_response_none):
     """Handle no document found"""
     httpx_mock.add_response(
@@ -43,9 +84,31 @@ def test_pmc_search_and_store_no_result(httpx_mock: HTTPXMock, search_and_store_
     assert result == {
         "total_results": 0,
         "db": NCBIDatabase.PMC.value,
+        "term_counts": {"hemoblast": 40, "biom'up": 115, "urological surgery": 5509},
     }
 
 
+def test_pmc_search_and_store_entry_date_range(
+    httpx_mock: HTTPXMock,
+    search_and_store_response_none,
+):
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        method="GET",
+        json=search_and_store_response_none,
+    )
+
+    search_and_store(
+        "my query",
+        db=NCBIDatabase.PMC,
+        entry_date_range=("2025/01/01", "2025/01/02"),
+    )
+    params = httpx_mock.get_request().url.params
+    assert params["datetype"] == "edat"
+    assert params["mindate"] == "2025/01/01"
+    assert params["maxdate"] == "2025/01/02"
+
+
 def test_pmc_search_and_store_error(httpx_mock: HTTPXMock):
     """Should not break when any other code than 200 is given back"""
     httpx_mock.add_response(
@@ -58,6 +121,25 @@ def test_pmc_search_and_store_error(httpx_mock: HTTPXMock):
         search_and_store("my query", db=NCBIDatabase.PMC)
 
 
+def test_extract_term_counts():
+    search_result = {
+        "count": "0",
+        "translationstack": [
+            {"term": '"Hemoblast"[All Fields]', "field": "All Fields", "count": "40"},
+            {"term": '"Floseal"[All Fields]', "field": "All Fields", "count": "0"},
+            "OR",
+            "GROUP",
+            {"term": "2023[PubDate]", "field": "PubDate", "count": "0", "explode": "N"},
+            "AND",
+        ],
+    }
+    assert extract_term_counts(search_result) == {"hemoblast": 40, "floseal": 0}
+
+
+def test_extract_term_counts_no_translation():
+    assert extract_term_counts({"count": "0"}) == {}
+
+
 def test_fetch_all_stored_articles(httpx_mock: HTTPXMock):
     httpx_mock.add_response(
         url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
@@ -229,3 +311,51 @@ def test_fetch_all_stored_articles_error(httpx_mock: HTTPXMock):
     )
     with pytest.raises(httpx.HTTPStatusError, match="Client error '418 I'm a teapot' for url"):
         fetch_all_stored_articles(storage_infos)
+
+
+def test_iter_stored_articles(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+        method="GET",
+        json={"result": {"uids": ["bonjour"], "bonjour": 1}},
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+        method="GET",
+        json={"error": "no result"},
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+        method="GET",
+        json={"result": {"uids": ["hello"], "hello": 2}},
+    )
+
+    storage_infos = StorageInfos(
+        query_key="query_key",
+        web_env="web_env",
+        total_results=3,
+        db=NCBIDatabase.PMC,
+    )
+
+    pages = iter_stored_articles(storage_infos, max_allowed_elements=1)
+    assert next(pages) == {"uids": ["bonjour"], "bonjour": 1}
+    assert len(httpx_mock.get_requests()) == 1
+    assert list(pages) == [{"uids": ["hello"], "hello": 2}]
+
+
+def test_iter_articles_by_uids(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+        method="GET",
+        json={"result": {"uids": ["1", "2"], "1": 1, "2": 2}},
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+        method="GET",
+        json={"error": "no result"},
+    )
+
+    pages = list(iter_articles_by_uids(NCBIDatabase.PUB_MED, ["1", "2", "3"], batch_size=2))
+    assert pages == [{"uids": ["1", "2"], "1": 1, "2": 2}]
+    assert [r.url.params["id"] for r in httpx_mock.get_requests()] == ["1,2", "3"]
+    assert "WebEnv" not in httpx_mock.get_requests()[0].url.params
@@ -0,0 +1,92 @@
+from src import article_ids_index
+from src.article_ids_index import (
+    add_article_ids,
+    count_conflicting_article_ids,
+    count_unique_article_ids,
+    create_article_ids_index,
+    indexed_article_ids,
+)
+
+
+def to_article_ids(ids: list[tuple]) -> list[dict]:
+    return [{"pmcid": pmcid, "pmid": pmid} for pmcid, pmid in ids]
+
+
+def test_add_article_ids():
+    index = create_article_ids_index()
+    add_article_ids(
+        index,
+        to_article_ids(
+            [
+                ("PMC1", "1"),
+                ("PMC1", None),  # duplicated pmcid
+                ("PMC11", None),  # duplicated pmcid, found before complete one
+                ("PMC3", None),  #  not duplicated
+                (None, "4"),  # duplicated pmid, found before complete one
+                (None, "2"),  #  not duplicated
+                ("PMC9", "9"),  #  not duplicated
+                ("PMC9", "9"),  #  full duplicate
+                (None, None),  # no id
+            ],
+        ),
+    )
+    assert count_unique_article_ids(index) == 6
+
+    # next page upgrades partial articles
+    add_article_ids(
+        index,
+        to_article_ids([("PMC11", "11"), ("PMC4", "4"), (None, "44"), ("PMC44", "44")]),
+    )
+
+    assert count_unique_article_ids(index) == 7
+    assert indexed_article_ids(index) == to_article_ids(
+        [
+            (None, "2"),
+            ("PMC1", "1"),
+            ("PMC3", None),
+            ("PMC4", "4"),
+            ("PMC9", "9"),
+            ("PMC11", "11"),
+            ("PMC44", "44"),
+        ],
+    )
+    assert count_conflicting_article_ids(index) == 0
+
+
+def test_add_article_ids_many_duplicates():
+    index = create_article_ids_index()
+    ids = [("PMC1", "1"), ("PMC1", None), ("PMC1", "3"), (None, "1"), ("PMC2", "1"), (None, "4")]
+    add_article_ids(index, to_article_ids(ids))
+
+    assert indexed_article_ids(index) == to_article_ids(
+        [(None, "4"), ("PMC1", "1"), ("PMC1", "3"), ("PMC2", "1")],
+    )
+    assert count_conflicting_article_ids(index) == 1
+
+
+def test_add_article_ids_merge_in_batches(monkeypatch):
+    monkeypatch.setattr(article_ids_index, "MIN_PENDING_ARTICLES", 2)
+    index = create_article_ids_index()
+
+    add_article_ids(index, to_article_ids([("PMC1", None)]))
+    assert index["nb_pending"] == 1
+
+    add_article_ids(index, to_article_ids([("PMC1", "1")]))
+    assert index["nb_pending"] == 0
+    assert index["unique"]["pmids"].tolist() == [1]
+
+
+def test_add_article_ids_large_overlap():
+    nb_articles = 200_000
+    complete = [(f"PMC{i}", str(i)) for i in range(1, nb_articles + 1)]
+    partial = [(f"PMC{i}", None) for i in range(1, nb_articles + 1)] + [
+        (None, str(i)) for i in range(1, nb_articles + 1)
+    ]
+
+    index = create_article_ids_index()
+    add_article_ids(index, to_article_ids(partial))
+    add_article_ids(index, to_article_ids(complete))
+    add_article_ids(index, to_article_ids(partial))
+
+    assert count_unique_article_ids(index) == nb_articles
+    assert indexed_article_ids(index) == to_article_ids(complete)
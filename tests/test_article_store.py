@@ -0,0 +1,107 @@
+import sqlite3
+
+from src import article_store as article_store_module
+from src.article_store import (
+    ARTICLE_STORE_FILE_NAME,
+    close_article_store,
+    count_stored_article_ids,
+    iter_stored_article_ids,
+    open_article_store,
+    upsert_article_ids,
+)
+from src.eutils_retrieval.api import NCBIDatabase
+
+
+def stored_rows(file_path) -> list[tuple]:
+    with sqlite3.connect(file_path) as connection:
+        return connection.execute(
+            "SELECT pmcid, pmid, query_id, db, first_seen_run, last_seen_run FROM articles "
+            "ORDER BY pmcid, pmid",
+        ).fetchall()
+
+
+def test_open_article_store(tmp_path):
+    file_path = tmp_path / "store" / ARTICLE_STORE_FILE_NAME
+    article_store = open_article_store(file_path, run_id="run_1")
+
+    journal_mode = article_store["connection"].execute("PRAGMA journal_mode").fetchone()[0]
+    assert journal_mode == "wal"
+    assert count_stored_article_ids(article_store) == 0
+    close_article_store(article_store)
+
+    # reopened without loosing anything
+    article_store = open_article_store(file_path, run_id="run_2")
+    assert count_stored_article_ids(article_store) == 0
+    close_article_store(article_store)
+
+
+def test_upsert_article_ids(tmp_path, monkeypatch):
+    monkeypatch.setattr(article_store_module, "UPSERT_BATCH_SIZE", 2)
+    file_path = tmp_path / ARTICLE_STORE_FILE_NAME
+
+    article_store = open_article_store(file_path, run_id="run_1")
+    upsert_article_ids(
+        article_store,
+        [
+            {"pmcid": "PMC1", "pmid": None},
+            {"pmcid": None, "pmid": "2"},
+            {"pmcid": "PMC3", "pmid": None},
+            {"pmcid": None, "pmid": "3"},
+            {"pmcid": "PMC4", "pmid": "4"},
+            {"pmcid": None, "pmid": None},
+        ],
+        query_id="query_1",
+        db=NCBIDatabase.PMC,
+    )
+    close_article_store(article_store)
+
+    article_store = open_article_store(file_path, run_id="run_2")
+    upsert_article_ids(
+        article_store,
+        [
+            {"pmcid": "PMC1", "pmid": "1"},  # fills missing pmid
+            {"pmcid": "PMC2", "pmid": "2"},  # fills missing pmcid
+            {"pmcid": "PMC3", "pmid": "3"},  # merges both partial articles
+            {"pmcid": None, "pmid": "4"},  # already known
+            {"pmcid": "PMC4", "pmid": "5"},  # conflicts with known article
+            {"pmcid": "PMC6", "pmid": None},  # new
+        ],
+        query_id="query_2",
+    )
+
+    assert list(iter_stored_article_ids(article_store)) == [
+        {"pmcid": "PMC1", "pmid": "1"},
+        {"pmcid": "PMC2", "pmid": "2"},
+        {"pmcid": "PMC3", "pmid": "3"},
+        {"pmcid": "PMC4", "pmid": "4"},
+        {"pmcid": "PMC6", "pmid": None},
+    ]
+    assert count_stored_article_ids(article_store) == 5
+    close_article_store(article_store)
+
+    assert stored_rows(file_path) == [
+        (1, 1, "query_1", "pmc", "run_1", "run_2"),
+        (2, 2, "query_1", "pmc", "run_1", "run_2"),
+        (3, 3, "query_1", "pmc", "run_1", "run_2"),
+        (4, 4, "query_1", "pmc", "run_1", "run_2"),
+        (6, None, "query_2", None, "run_2", "run_2"),
+    ]
+
+
+def test_upsert_article_ids_keeps_oldest_provenance(tmp_path):
+    file_path = tmp_path / ARTICLE_STORE_FILE_NAME
+    for run_id, article_ids, query_id in [
+        ("run_1", [{"pmcid": None, "pmid": "7"}], "query_1"),
+        ("run_2", [{"pmcid": "PMC7", "pmid": None}, {"pmcid": "PMC8", "pmid": None}], "query_2"),
+        ("run_3", [{"pmcid": None, "pmid": "8"}], "query_3"),
+        # merges the pmcid only and pmid only articles
+        ("run_4", [{"pmcid": "PMC7", "pmid": "7"}, {"pmcid": "PMC8", "pmid": "8"}], "query_4"),
+    ]:
+        article_store = open_article_store(file_path, run_id=run_id)
+        upsert_article_ids(article_store, article_ids, query_id=query_id, db=NCBIDatabase.PMC)
+        close_article_store(article_store)
+
+    assert stored_rows(file_path) == [
+        (7, 7, "query_1", "pmc", "run_1", "run_4"),
+        (8, 8, "query_2", "pmc", "run_2", "run_4"),
+    ]
@@ -0,0 +1,68 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.background_writer import (
+    start_background_writer,
+    stop_background_writer,
+    submit_json_write,
+)
+from src.utils import load_data_from_json
+
+
+def test_background_writer(tmp_path: Path):
+    writer = start_background_writer(max_pending_writes=2)
+    for index in range(10):
+        submit_json_write(
+            writer,
+            [{"pmcid": f"PMC{index}", "pmid": None}],
+            tmp_path / f"{index}.json",
+        )
+    stop_background_writer(writer)
+
+    assert not writer["thread"].is_alive()
+    for index in range(10):
+        assert load_data_from_json(tmp_path / f"{index}.json") == [
+            {"pmcid": f"PMC{index}", "pmid": None},
+        ]
+
+
+def test_background_writer_runs_in_another_thread(tmp_path: Path, monkeypatch):
+    writing_threads = []
+    monkeypatch.setattr(
+        "src.background_writer.store_data_as_json",
+        lambda *_: writing_threads.append(threading.current_thread()),
+    )
+    writer = start_background_writer()
+    submit_json_write(writer, {}, tmp_path / "file.json")
+    stop_background_writer(writer)
+
+    assert writing_threads == [writer["thread"]]
+
+
+def test_background_writer_error(tmp_path: Path):
+    writer = start_background_writer()
+    submit_json_write(writer, {}, tmp_path / "file.txt")
+    submit_json_write(writer, {"bonjour": 1}, tmp_path / "file.json")
+
+    with pytest.raises(ValueError, match="should be of json extension"):
+        stop_background_writer(writer)
+    # next writes are not stopped by an error
+    assert load_data_from_json(tmp_path / "file.json") == {"bonjour": 1}
+
+
+def test_background_writer_error_not_raised(tmp_path: Path):
+    writer = start_background_writer()
+    submit_json_write(writer, {}, tmp_path / "file.txt")
+    submit_json_write(writer, {"bonjour": 1}, tmp_path / "file.json")
+
+    stop_background_writer(writer, raise_errors=False)
+    assert not writer["thread"].is_alive()
+    assert load_data_from_json(tmp_path / "file.json") == {"bonjour": 1}
+
+
+def test_submit_json_write_without_writer(tmp_path: Path):
+    submit_json_write(None, {"bonjour": 1}, tmp_path / "file.json")
+
+    assert load_data_from_json(tmp_path / "file.json") == {"bonjour": 1}
@@ -0,0 +1,251 @@
+import re
+from http import HTTPStatus
+
+import httpx
+import pytest
+
+from src import batch_retrieval
+from src.batch_retrieval import (
+    PROFILES_FOLDER_NAME,
+    load_profiles,
+    ncbi_batch_retrieval,
+    plan_profiles_queries,
+    search_db_article_ids,
+)
+from src.eutils_retrieval.api import NCBIDatabase, NCBIEndpoint
+from src.retrieval import STORE_RESULTS_FILE_NAME
+from src.utils import load_data_from_json, store_data_as_json
+
+PROFILES = [
+    {"name": "urology", "devices": {"device_1": []}, "indicators": {"indicator_1": []}},
+    {"name": "urology-copy", "devices": {"device_1": []}, "indicators": {"indicator_1": []}},
+    {"name": "cardiology", "devices": {"device_1": []}, "indicators": {"indicator_2": ["i2"]}},
+]
+
+OVERLAPPING_PROFILES = [
+    {
+        "name": "urology",
+        "devices": {"device_1": []},
+        "indicators": {"indicator_1": ["indicator_2"]},
+    },
+    {
+        "name": "nephrology",
+        "devices": {"device_1": []},
+        "indicators": {"indicator_2": ["Indicator_3"]},
+    },
+]
+
+UIDS_BY_INDICATOR = {
+    "indicator_1": ["1", "2"],
+    "indicator_2": ["2", "3"],
+    "i2": ["5"],
+    "indicator_3": ["3", "4"],
+}
+
+
+def add_ncbi_callbacks(httpx_mock):
+    """Search finds the uids of each indicator in query, summaries give pmcid and pmid of uids."""
+
+    def search_response(request: httpx.Request) -> httpx.Response:
+        term = request.url.params["term"].lower()
+        uids = list(
+            dict.fromkeys(
+                uid
+                for indicator, indicator_uids in UIDS_BY_INDICATOR.items()
+                if f'"{indicator}"' in term
+                for uid in indicator_uids
+            ),
+        )
+        return httpx.Response(
+            HTTPStatus.OK,
+            json={
+                "esearchresult": {
+                    "count": str(len(uids)),
+                    "querykey": "1",
+                    "webenv": ",".join(uids),
+                    "idlist": uids[: int(request.url.params["retmax"])],
+                },
+            },
+        )
+
+    def summary_response(request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        uids = (params.get("id") or params["WebEnv"]).split(",")
+        articles = {
+            uid: {
+                "articleids": [
+                    {"idtype": "pmcid", "value": f"PMC{uid}"},
+                    {"idtype": "pmid", "value": uid},
+                ],
+            }
+            for uid in uids
+        }
+        return httpx.Response(HTTPStatus.OK, json={"result": {"uids": uids, **articles}})
+
+    httpx_mock.add_callback(
+        search_response,
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        is_optional=True,
+        is_reusable=True,
+    )
+    httpx_mock.add_callback(
+        summary_response,
+        url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+        is_optional=True,
+        is_reusable=True,
+    )
+
+
+def load_profile_results(folder, profiles):
+    return {
+        profile["name"]: load_data_from_json(
+            folder / PROFILES_FOLDER_NAME / profile["name"] / STORE_RESULTS_FILE_NAME,
+        )
+        for profile in profiles
+    }
+
+
+def article_ids(*uids):
+    return [{"pmcid": f"PMC{uid}", "pmid": uid} for uid in uids]
+
+
+def test_load_profiles(tmp_path):
+    store_data_as_json(PROFILES, tmp_path / "profiles.json")
+
+    assert load_profiles(tmp_path / "profiles.json") == PROFILES
+
+
+@pytest.mark.parametrize(
+    ("names", "error"),
+    [
+        (["urology", "urology"], "should be unique"),
+        (["urology", "../urology"], "Invalid profile names"),
+    ],
+)
+def test_load_profiles_errors(tmp_path, names, error):
+    store_data_as_json(
+        [{"name": name, "devices": {}, "indicators": {}} for name in names],
+        tmp_path / "profiles.json",
+    )
+
+    with pytest.raises(ValueError, match=error):
+        load_profiles(tmp_path / "profiles.json")
+
+
+def test_ncbi_batch_retrieval(httpx_mock, tmp_path):
+    add_ncbi_callbacks(httpx_mock)
+
+    ncbi_batch_retrieval(PROFILES, (2023, 2023), db=NCBIDatabase.PMC, output_folder=tmp_path)
+
+    # identical query of both urology profiles is searched once
+    assert len(httpx_mock.get_requests(url=re.compile(NCBIEndpoint.SEARCH.full_url()))) == 2
+    assert load_profile_results(tmp_path, PROFILES) == {
+        "urology": article_ids("1", "2"),
+        "urology-copy": article_ids("1", "2"),
+        "cardiology": article_ids("2", "3", "5"),
+    }
+
+
+def test_plan_profiles_queries(tmp_path):
+    cardiology = {"name": "cardiology", "devices": {"device_2": []}, "indicators": {"i2": []}}
+    queries_by_profile = plan_profiles_queries(
+        [*OVERLAPPING_PROFILES, cardiology],
+        (None, None),
+        NCBIDatabase.PMC,
+        tmp_path,
+    )
+
+    # shared indicator is packed once, with the same spelling for both profiles
+    assert queries_by_profile == {
+        "urology": ['("device_1") AND ("indicator_1")', '("device_1") AND ("indicator_2")'],
+        "nephrology": ['("device_1") AND ("indicator_2")', '("device_1") AND ("Indicator_3")'],
+        "cardiology": ['("device_2") AND ("i2")'],
+    }
+
+
+def test_search_db_article_ids_no_result(httpx_mock, search_and_store_response_none, monkeypatch):
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        method="GET",
+        json=search_and_store_response_none,
+        is_reusable=True,
+    )
+    term_statistics = {}
+
+    assert search_db_article_ids("query", NCBIDatabase.PMC, {}) == []
+    assert (
+        search_db_article_ids("query", NCBIDatabase.PMC, {}, term_statistics=term_statistics) == []
+    )
+    assert "pmc" in term_statistics
+
+    monkeypatch.setattr(batch_retrieval, "search_and_store", lambda *_, **__: None)
+    assert search_db_article_ids("query", NCBIDatabase.PMC, {}) == []
+
+
+@pytest.mark.parametrize(
+    ("max_uids", "summary_params"),
+    [
+        # unknown articles summarized by uid
+        ((10_000, 200), [{"id": "1,2"}, {"id": "3"}, {"id": "4"}]),
+        # all stored articles fetched at once, when fetching by uid takes more requests
+        ((10_000, 1), [{"WebEnv": "1,2"}, {"id": "3"}, {"id": "4"}]),
+        # all stored articles fetched when search cannot give all uids
+        ((1, 200), [{"WebEnv": "1,2"}, {"WebEnv": "2,3"}, {"WebEnv": "3,4"}]),
+    ],
+)
+def test_ncbi_batch_retrieval_overlapping_profiles(
+    httpx_mock,
+    tmp_path,
+    monkeypatch,
+    max_uids,
+    summary_params,
+):
+    max_search_uids, max_uids_by_summary = max_uids
+    monkeypatch.setattr(batch_retrieval, "MAX_ALLOWED_SEARCH_UIDS", max_search_uids)
+    monkeypatch.setattr(batch_retrieval, "MAX_UIDS_BY_SUMMARY", max_uids_by_summary)
+    add_ncbi_callbacks(httpx_mock)
+
+    ncbi_batch_retrieval(
+        OVERLAPPING_PROFILES,
+        (None, None),
+        db=NCBIDatabase.PMC,
+        output_folder=tmp_path,
+    )
+
+    # each couple of device and indicator is searched once, for both profiles when shared
+    search_terms = [
+        request.url.params["term"]
+        for request in httpx_mock.get_requests(url=re.compile(NCBIEndpoint.SEARCH.full_url()))
+    ]
+    assert search_terms == [
+        '("device_1") AND ("indicator_1")',
+        '("device_1") AND ("indicator_2")',
+        '("device_1") AND ("Indicator_3")',
+    ]
+    assert [
+        {key: request.url.params[key] for key in ("id", "WebEnv") if key in request.url.params}
+        for request in httpx_mock.get_requests(url=re.compile(NCBIEndpoint.SUMMARY.full_url()))
+    ] == summary_params
+    assert load_profile_results(tmp_path, OVERLAPPING_PROFILES) == {
+        "urology": article_ids("1", "2", "3"),
+        "nephrology": article_ids("2", "3", "4"),
+    }
+
+
+def test_ncbi_batch_retrieval_known_pmids(httpx_mock, tmp_path):
+    add_ncbi_callbacks(httpx_mock)
+
+    ncbi_batch_retrieval(
+        OVERLAPPING_PROFILES,
+        (None, None),
+        db=(NCBIDatabase.PUB_MED, NCBIDatabase.PMC),
+        output_folder=tmp_path,
+    )
+
+    # articles found in PMC with their pmid are not summarized in PubMed
+    summary_requests = httpx_mock.get_requests(url=re.compile(NCBIEndpoint.SUMMARY.full_url()))
+    assert {request.url.params["db"] for request in summary_requests} == {"pmc"}
+    assert load_profile_results(tmp_path, OVERLAPPING_PROFILES) == {
+        "urology": article_ids("1", "2", "3"),
+        "nephrology": article_ids("2", "3", "4"),
+    }
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from src.columnar_results import (
+    MANIFEST_FILE_NAME,
+    contains_pmcids,
+    contains_pmids,
+    load_columnar_results,
+    lookup_pmcids,
+    lookup_pmids,
+    store_columnar_results,
+)
+from src.packed_article_ids import pack_article_ids
+from src.utils import store_data_as_json
+
+ARTICLE_IDS = [
+    {"pmcid": "PMC9848274", "pmid": "36645057"},
+    {"pmcid": "PMC13900", "pmid": None},
+    {"pmcid": None, "pmid": "11250746"},
+    {"pmcid": "PMC102409", "pmid": "10592168"},
+]
+
+
+@pytest.fixture
+def columnar_results(tmp_path):
+    store_columnar_results(pack_article_ids(ARTICLE_IDS), tmp_path)
+    return load_columnar_results(tmp_path)
+
+
+def test_load_columnar_results(columnar_results):
+    assert isinstance(columnar_results["by_pmcid"], np.memmap)
+    assert columnar_results["by_pmcid"].tolist() == [
+        [13900, 102409, 9848274],
+        [0, 10592168, 36645057],
+    ]
+    assert columnar_results["by_pmid"].tolist() == [
+        [10592168, 11250746, 36645057],
+        [102409, 0, 9848274],
+    ]
+    assert columnar_results["manifest"] == {
+        "version": 1,
+        "nb_articles": 4,
+        "nb_pmcids": 3,
+        "nb_pmids": 3,
+    }
+
+
+def test_contains(columnar_results):
+    assert contains_pmcids(columnar_results, ["PMC13900", "PMC1", "PMC9848274"]).tolist() == [
+        True,
+        False,
+        True,
+    ]
+    assert contains_pmids(columnar_results, np.array([11250746, 0, 99999999])).tolist() == [
+        True,
+        False,
+        False,
+    ]
+
+
+def test_lookup(columnar_results):
+    assert lookup_pmids(columnar_results, ["PMC102409", "PMC13900", "PMC1"]).tolist() == [
+        10592168,
+        0,
+        0,
+    ]
+    assert lookup_pmcids(columnar_results, ["36645057", "11250746"]).tolist() == [9848274, 0]
+    assert lookup_pmids(columnar_results, np.array([9848274])).tolist() == [36645057]
+
+
+def test_load_columnar_results_errors(tmp_path):
+    with pytest.raises(ValueError, match="No complete columnar results"):
+        load_columnar_results(tmp_path)
+
+    store_data_as_json({"version": 0}, tmp_path / MANIFEST_FILE_NAME)
+    with pytest.raises(ValueError, match="of version 0 cannot be read"):
+        load_columnar_results(tmp_path)
+
+    # columns replaced while the manifest still describes previous ones
+    store_columnar_results(pack_article_ids(ARTICLE_IDS), tmp_path)
+    store_data_as_json(
+        {"version": 1, "nb_articles": 1, "nb_pmcids": 1, "nb_pmids": 0},
+        tmp_path / MANIFEST_FILE_NAME,
+    )
+    with pytest.raises(ValueError, match="are being replaced"):
+        load_columnar_results(tmp_path)
+
+
+def test_store_columnar_results_while_mapped(columnar_results, tmp_path):
+    store_columnar_results(pack_article_ids(ARTICLE_IDS[:1]), tmp_path)
+
+    # previous columns are still readable by those mapping them
+    assert columnar_results["by_pmcid"][0].tolist() == [13900, 102409, 9848274]
+    assert load_columnar_results(tmp_path)["by_pmcid"].tolist() == [[9848274], [36645057]]
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "by_pmcid.npy",
+        "by_pmid.npy",
+        MANIFEST_FILE_NAME,
+    ]
+
+
+def test_store_columnar_results_empty(tmp_path):
+    store_columnar_results(pack_article_ids([]), tmp_path)
+    results = load_columnar_results(tmp_path)
+
+    assert results["manifest"]["nb_articles"] == 0
+    assert contains_pmids(results, ["1"]).tolist() == [False]
+    assert lookup_pmcids(results, ["1"]).tolist() == [0]
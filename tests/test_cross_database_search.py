@@ -2,8 +2,9 @@ import re
 
 import pytest
 
+from src import cross_database_search
+from src.article_ids_index import add_article_ids, create_article_ids_index
 from src.cross_database_search import (
-    keep_tuple_with_most_infos,
     merge_article_ids,
     ncbi_search_and_fetch,
     pmc_search_and_fetch,
@@ -11,6 +12,8 @@ from src.cross_database_search import (
     pubmed_pmc_cross_search,
 )
 from src.eutils_retrieval.api import NCBIDatabase, NCBIEndpoint
+from src.query_plan import sub_query_id
+from src.term_statistics import OBSERVATION_DATES_KEY
 
 TEST_PUB_MED_ARTICLE_IDS = [
     {"idtype": "pubmed", "value": "36645057"},  # PubMed
@@ -40,8 +43,47 @@ def test_ncbi_search_and_fetch_pmc_only(httpx_mock, search_and_store_response, t
         json={"result": {"uids": ["bonjour"], "bonjour": {"articleids": TEST_PMC_ARTICLE_IDS}}},
     )
 
-    result = ncbi_search_and_fetch(queries=["query"], db=NCBIDatabase.PMC, folder=tmp_path)
+    term_statistics = {}
+    result = ncbi_search_and_fetch(
+        queries=["query"],
+        db=NCBIDatabase.PMC,
+        folder=tmp_path,
+        term_statistics=term_statistics,
+    )
     assert result == [{"pmcid": "PMC2222222222", "pmid": "111111111"}]
+    assert (tmp_path / sub_query_id("query") / "pmc.json").exists()
+    assert list(term_statistics) == ["pmc", OBSERVATION_DATES_KEY]
+    assert term_statistics["pmc"]["hemoblast"] == 40
+
+
+def test_ncbi_search_and_fetch_with_index(httpx_mock, search_and_store_response):
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        method="GET",
+        json=search_and_store_response,
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+        method="GET",
+        json={"result": {"uids": ["bonjour"], "bonjour": {"articleids": TEST_PMC_ARTICLE_IDS}}},
+    )
+
+    # previously found articles, the first one is upgraded by the search
+    article_ids_index = create_article_ids_index()
+    add_article_ids(
+        article_ids_index,
+        [{"pmcid": None, "pmid": "111111111"}, {"pmcid": "PMC1", "pmid": None}],
+    )
+
+    result = ncbi_search_and_fetch(
+        queries=["query"],
+        db=NCBIDatabase.PMC,
+        article_ids_index=article_ids_index,
+    )
+    assert result == [
+        {"pmcid": "PMC1", "pmid": None},
+        {"pmcid": "PMC2222222222", "pmid": "111111111"},
+    ]
 
 
 def test_ncbi_search_and_fetch_pub_med_only(httpx_mock, search_and_store_response, tmp_path):
@@ -82,11 +124,56 @@ def test_pubmed_pmc_cross_search(httpx_mock, search_and_store_response, tmp_path
         json={"result": {"uids": ["bonjour"], "bonjour": {"articleids": TEST_PUB_MED_ARTICLE_IDS}}},
     )
 
-    result = pubmed_pmc_cross_search("query", folder=tmp_path)
+    term_statistics = {}
+    result = pubmed_pmc_cross_search("query", folder=tmp_path, term_statistics=term_statistics)
     assert result == [
         {"pmcid": "PMC2222222222", "pmid": "111111111"},
         {"pmcid": "PMC9848274", "pmid": "36645057"},
     ]
+    assert term_statistics["pmc"] == term_statistics["pubmed"]
+    assert term_statistics["pubmed"]["cystectomy"] == 26326
+
+
+def test_pubmed_pmc_cross_search_skip_known_pmids(httpx_mock, search_and_store_response):
+    for _ in range(2):
+        httpx_mock.add_response(
+            url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+            method="GET",
+            json=search_and_store_response,
+        )
+    # only PMC summary is fetched, it gives the pmid of the article found in PubMed (11111111)
+    pmc_article_ids = [
+        {"idtype": "pmid", "value": "11111111"},
+        {"idtype": "pmcid", "value": "PMC2222222222"},
+    ]
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+        method="GET",
+        json={"result": {"uids": ["bonjour"], "bonjour": {"articleids": pmc_article_ids}}},
+    )
+
+    result = pubmed_pmc_cross_search("query")
+    assert result == [{"pmcid": "PMC2222222222", "pmid": "11111111"}]
+    pub_med_search = httpx_mock.get_requests()[-1]
+    assert pub_med_search.url.params["db"] == "pubmed"
+    assert pub_med_search.url.params["retmax"] == "10000"
+
+
+def test_pub_med_search_and_fetch_known_pmids(httpx_mock, search_and_store_response):
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        method="GET",
+        json=search_and_store_response,
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+        method="GET",
+        json={"result": {"uids": ["bonjour"], "bonjour": {"articleids": TEST_PUB_MED_ARTICLE_IDS}}},
+    )
+
+    result = pub_med_search_and_fetch(query="query", known_pmids={"22222222"})
+    assert result == [{"pmcid": "PMC9848274", "pmid": "36645057"}]
+    assert httpx_mock.get_requests()[-1].url.params["id"] == "11111111"
 
 
 def test_pub_med_search_and_fetch(httpx_mock, search_and_store_response, tmp_path):
@@ -185,23 +272,32 @@ def test_pmc_search_and_fetch_no_fetch_result(httpx_mock, search_and_store_respo
     assert result == []
 
 
+@pytest.mark.parametrize("search_and_fetch", [pmc_search_and_fetch, pub_med_search_and_fetch])
+def test_search_and_fetch_none_search_result(monkeypatch, search_and_fetch):
+    monkeypatch.setattr(cross_database_search, "search_and_store", lambda *_, **__: None)
+
+    term_statistics = {}
+    assert search_and_fetch(query="query", term_statistics=term_statistics) == []
+    assert term_statistics == {}
+
+
 def test_merge_article_ids():
     collection1 = [
-        {"pmcid": 1, "pmid": "a"},
-        {"pmcid": 2, "pmid": None},
-        {"pmcid": 3, "pmid": None},
+        {"pmcid": "PMC1", "pmid": "1"},
+        {"pmcid": "PMC2", "pmid": None},
+        {"pmcid": "PMC3", "pmid": None},
     ]
     collection2 = [
-        {"pmcid": 1, "pmid": "a"},
-        {"pmcid": None, "pmid": "a"},
-        {"pmcid": 2, "pmid": "b"},
-        {"pmcid": None, "pmid": "c"},
+        {"pmcid": "PMC1", "pmid": "1"},
+        {"pmcid": None, "pmid": "1"},
+        {"pmcid": "PMC2", "pmid": "2"},
+        {"pmcid": None, "pmid": "4"},
     ]
     expected = [
-        {"pmcid": 3, "pmid": None},
-        {"pmcid": None, "pmid": "c"},
-        {"pmcid": 1, "pmid": "a"},
-        {"pmcid": 2, "pmid": "b"},
+        {"pmcid": "PMC3", "pmid": None},
+        {"pmcid": None, "pmid": "4"},
+        {"pmcid": "PMC1", "pmid": "1"},
+        {"pmcid": "PMC2", "pmid": "2"},
     ]
 
     result = merge_article_ids(collection1, collection2)
@@ -211,13 +307,13 @@ def test_merge_article_ids():
 
 
 def test_merge_article_ids_no_duplication():
-    collection1 = [{"pmcid": 1, "pmid": "a"}, {"pmcid": 3, "pmid": None}]
-    collection2 = [{"pmcid": 2, "pmid": "b"}, {"pmcid": None, "pmid": "c"}]
+    collection1 = [{"pmcid": "PMC1", "pmid": "1"}, {"pmcid": "PMC3", "pmid": None}]
+    collection2 = [{"pmcid": "PMC2", "pmid": "2"}, {"pmcid": None, "pmid": "4"}]
     expected = [
-        {"pmcid": 3, "pmid": None},
-        {"pmcid": None, "pmid": "c"},
-        {"pmcid": 1, "pmid": "a"},
-        {"pmcid": 2, "pmid": "b"},
+        {"pmcid": "PMC3", "pmid": None},
+        {"pmcid": None, "pmid": "4"},
+        {"pmcid": "PMC1", "pmid": "1"},
+        {"pmcid": "PMC2", "pmid": "2"},
     ]
 
     result = merge_article_ids(collection1, collection2)
@@ -226,36 +322,10 @@ def test_merge_article_ids_no_duplication():
     assert all(r in expected for r in result)
 
 
-def test_keep_tuple_with_most_infos():
-    result = keep_tuple_with_most_infos(
-        {
-            ("a", "b"),
-            ("a", None),  # duplicated first key
-            ("aa", None),  # duplicated first key
-            ("aa", "bb"),
-            ("1", None),  #  not duplicated
-            ("c", "d"),
-            (None, "d"),  # duplicated second key
-            (None, "dd"),  # duplicated second key
-            ("cc", "dd"),
-            (None, "2"),  #  not duplicated
-            ("zz", "zz"),  #  not duplicated
-        },
-    )
-    assert result == {
-        ("a", "b"),
-        ("aa", "bb"),
-        ("c", "d"),
-        ("cc", "dd"),
-        ("1", None),
-        (None, "2"),
-        ("zz", "zz"),
-    }
-
-
-def test_keep_tuple_with_most_infos_error_duplicates():
-    with pytest.raises(ValueError, match="Too many duplicates for 1st key=a"):
-        keep_tuple_with_most_infos({("a", "b"), ("a", None), ("a", "c")})
-
-    with pytest.raises(ValueError, match="Too many duplicates for 2nd key=b"):
-        keep_tuple_with_most_infos({("a", "b"), ("aa", "b"), (None, "b")})
+def test_merge_article_ids_multiple_ids_in_db():
+    collection1 = [{"pmcid": "PMC1", "pmid": "1"}, {"pmcid": "PMC1", "pmid": None}]
+    collection2 = [{"pmcid": "PMC1", "pmid": "2"}]
+
+    result = merge_article_ids(collection1, collection2)
+    assert len(result) == len(collection1)
+    assert all(r in [*collection1, *collection2] for r in result)
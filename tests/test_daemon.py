@@ -0,0 +1,254 @@
+import json
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import UTC, datetime
+from http import HTTPStatus
+
+import pytest
+
+from src import daemon
+from src.daemon import (
+    JobStatus,
+    create_daemon_server,
+    create_daemon_state,
+    evict_finished_jobs,
+    evict_outdated_queries,
+    iter_job_progress,
+    run_job,
+    update_job,
+    validate_job_request,
+)
+from src.eutils_retrieval.api import NCBIDatabase, NCBIEndpoint
+from src.term_statistics import OBSERVATION_DATES_KEY, TERM_STATISTICS_FILE_NAME
+from src.utils import load_data_from_json
+
+JOB_REQUEST = {
+    "devices": ["device_1"],
+    "indicators": ["indicator_1"],
+    "start_year": 2023,
+    "end_year": 2023,
+    "db": [NCBIDatabase.PMC.value],
+}
+
+
+@pytest.fixture
+def daemon_url(tmp_path):
+    state = create_daemon_state(tmp_path)
+    server = create_daemon_server(state, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    state["executor"].shutdown()
+
+
+def request_daemon(url: str, data: dict | None = None) -> tuple[int, list[dict]]:
+    """Send a request to the daemon, returns status and json lines of the response."""
+    request = urllib.request.Request(  # noqa: S310
+        url,
+        data=None if data is None else json.dumps(data).encode(),
+        method="GET" if data is None else "POST",
+    )
+    try:
+        with urllib.request.urlopen(request) as response:  # noqa: S310
+            return response.status, [json.loads(line) for line in response.read().splitlines()]
+    except urllib.error.HTTPError as error:
+        return error.code, [json.loads(error.read())]
+
+
+def add_ncbi_responses(httpx_mock, search_and_store_response):
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        method="GET",
+        json=search_and_store_response,
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+        method="GET",
+        json={
+            "result": {
+                "uids": ["11111111"],  # uid found by search
+                "11111111": {"articleids": [{"idtype": "pmcid", "value": "PMC1"}]},
+            },
+        },
+    )
+
+
+def test_daemon_jobs(httpx_mock, search_and_store_response, daemon_url, tmp_path):
+    add_ncbi_responses(httpx_mock, search_and_store_response)
+
+    status, (job,) = request_daemon(f"{daemon_url}/jobs", JOB_REQUEST)
+    assert status == HTTPStatus.ACCEPTED
+    assert job["status"] == JobStatus.QUEUED
+
+    _, progress = request_daemon(f"{daemon_url}/jobs/{job['id']}/progress")
+    assert progress[-1]["status"] == JobStatus.DONE
+    assert progress[-1]["nb_results"] == 1
+    _, results = request_daemon(f"{daemon_url}/jobs/{job['id']}/results")
+    assert results == [{"pmcid": "PMC1", "pmid": None}]
+    term_statistics = load_data_from_json(tmp_path / TERM_STATISTICS_FILE_NAME)
+    assert term_statistics["pmc"]["hemoblast"] == 40
+
+    # same job reuses articles found by its query, without calling NCBI again
+    _, (second_job,) = request_daemon(f"{daemon_url}/jobs", JOB_REQUEST)
+    _, progress = request_daemon(f"{daemon_url}/jobs/{second_job['id']}/progress")
+    assert progress[-1]["nb_cached_queries"] == 1
+    _, results = request_daemon(f"{daemon_url}/jobs/{second_job['id']}/results")
+    assert results == [{"pmcid": "PMC1", "pmid": None}]
+    assert len(httpx_mock.get_requests()) == 2
+
+    status, jobs = request_daemon(f"{daemon_url}/jobs")
+    assert status == HTTPStatus.OK
+    assert [job["id"] for job in jobs[0]] == [job["id"], second_job["id"]]
+    _, (summary,) = request_daemon(f"{daemon_url}/jobs/{job['id']}?verbose=1")
+    assert summary["status"] == JobStatus.DONE
+
+
+@pytest.mark.parametrize(
+    ("path", "data", "status"),
+    [
+        ("/jobs", {"devices": ["device_1"]}, HTTPStatus.BAD_REQUEST),
+        ("/jobs", [], HTTPStatus.BAD_REQUEST),
+        ("/jobs", {**JOB_REQUEST, "start_year": 2024}, HTTPStatus.BAD_REQUEST),
+        ("/unknown", JOB_REQUEST, HTTPStatus.NOT_FOUND),
+        ("/unknown", None, HTTPStatus.NOT_FOUND),
+        ("/jobs/unknown_id", None, HTTPStatus.NOT_FOUND),
+        ("/jobs/unknown_id/results/more", None, HTTPStatus.NOT_FOUND),
+    ],
+)
+def test_daemon_errors(daemon_url, path, data, status):
+    response_status, (response,) = request_daemon(f"{daemon_url}{path}", data)
+
+    assert response_status == status
+    assert "error" in response
+
+
+def test_daemon_job_not_done(daemon_url, monkeypatch):
+    monkeypatch.setattr(daemon, "run_job", lambda *_: None)  # job stays queued
+    _, (job,) = request_daemon(f"{daemon_url}/jobs", JOB_REQUEST)
+
+    status, _ = request_daemon(f"{daemon_url}/jobs/{job['id']}/results")
+    assert status == HTTPStatus.CONFLICT
+    status, _ = request_daemon(f"{daemon_url}/jobs/{job['id']}/unknown")
+    assert status == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize(
+    ("payload", "error"),
+    [
+        ("devices", TypeError),
+        ({"devices": ["d"], "indicators": []}, ValueError),
+        ({"devices": ["d"], "indicators": ["i"], "db": ["unknown"]}, ValueError),
+        ({"devices": ["d"], "indicators": ["i"], "start_year": "2023"}, TypeError),
+        ({"devices": ["d"], "indicators": ["i"], "end_year": True}, TypeError),
+        ({"devices": ["d"], "indicators": ["i"], "start_year": 2024, "end_year": 2023}, ValueError),
+    ],
+)
+def test_validate_job_request_errors(payload, error):
+    with pytest.raises(error):
+        validate_job_request(payload)
+
+
+def test_run_job_failed(httpx_mock, tmp_path):
+    httpx_mock.add_exception(ValueError("NCBI down"))
+    state = create_daemon_state(tmp_path)
+    state["jobs"]["job"] = {"id": "job", "status": JobStatus.QUEUED}
+
+    run_job(state, "job", validate_job_request(JOB_REQUEST))
+
+    assert state["jobs"]["job"]["status"] == JobStatus.FAILED
+    assert state["jobs"]["job"]["error"] == "NCBI down"
+    state["executor"].shutdown()
+
+
+def test_run_job_merges_term_statistics(httpx_mock, search_and_store_response, tmp_path):
+    add_ncbi_responses(httpx_mock, search_and_store_response)
+    state = create_daemon_state(tmp_path)
+    state["term_statistics"] = {"pmc": {"other_term": 1}, "pubmed": {"hemoblast": 2}}
+    state["jobs"]["job"] = {
+        "id": "job",
+        "status": JobStatus.QUEUED,
+        "nb_done_queries": 0,
+        "nb_cached_queries": 0,
+    }
+
+    run_job(state, "job", validate_job_request(JOB_REQUEST))
+
+    assert state["term_statistics"]["pmc"]["other_term"] == 1
+    assert state["term_statistics"]["pmc"]["hemoblast"] == 40
+    assert state["term_statistics"]["pubmed"] == {"hemoblast": 2}
+    state["executor"].shutdown()
+
+
+def test_run_job_prunes_dead_terms(httpx_mock, search_and_store_response, tmp_path):
+    add_ncbi_responses(httpx_mock, search_and_store_response)
+    state = create_daemon_state(tmp_path)
+    state["term_statistics"] = {
+        "pmc": {"device_2": 0},
+        OBSERVATION_DATES_KEY: {"pmc": {"device_2": datetime.now(UTC).date().isoformat()}},
+    }
+    state["jobs"]["job"] = {
+        "id": "job",
+        "status": JobStatus.QUEUED,
+        "nb_done_queries": 0,
+        "nb_cached_queries": 0,
+    }
+
+    run_job(
+        state,
+        "job",
+        validate_job_request({**JOB_REQUEST, "devices": ["device_1", "device_2"]}),
+    )
+
+    assert state["jobs"]["job"]["status"] == JobStatus.DONE
+    search_request = httpx_mock.get_requests(url=re.compile(NCBIEndpoint.SEARCH.full_url() + ".*"))
+    assert "device_2" not in search_request[0].url.params["term"]
+    state["executor"].shutdown()
+
+
+def test_evict_finished_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(daemon, "MAX_FINISHED_JOBS", 1)
+    state = create_daemon_state(tmp_path)
+    for job_id, status in [
+        ("old", JobStatus.DONE),
+        ("running", JobStatus.RUNNING),
+        ("failed", JobStatus.FAILED),
+        ("new", JobStatus.DONE),
+    ]:
+        state["jobs"][job_id] = {"id": job_id, "status": status}
+
+    evict_finished_jobs(state)
+
+    assert list(state["jobs"]) == ["running", "new"]
+    state["executor"].shutdown()
+
+
+def test_evict_outdated_queries(tmp_path):
+    state = create_daemon_state(tmp_path)
+    now = time.monotonic()
+    state["query_cache"] = {
+        ("old", ("pmc",)): {"cached_at": now - daemon.QUERY_CACHE_MAX_AGE, "article_ids": None},
+        ("new", ("pmc",)): {"cached_at": now, "article_ids": None},
+    }
+
+    evict_outdated_queries(state)
+
+    assert list(state["query_cache"]) == [("new", ("pmc",))]
+    state["executor"].shutdown()
+
+
+def test_iter_job_progress(tmp_path):
+    state = create_daemon_state(tmp_path)
+    state["jobs"]["job"] = {"id": "job", "status": JobStatus.QUEUED}
+    progress = iter_job_progress(state, "job")
+
+    assert next(progress)["status"] == JobStatus.QUEUED
+    for status in (JobStatus.RUNNING, JobStatus.DONE):
+        threading.Timer(0.01, update_job, (state, "job"), {"status": status}).start()
+        assert next(progress)["status"] == status
+    assert next(progress, None) is None
+    state["executor"].shutdown()
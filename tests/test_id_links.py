@@ -0,0 +1,84 @@
+from pytest_httpx import HTTPXMock
+
+from src.article_ids_index import add_article_ids, create_article_ids_index, indexed_article_ids
+from src.eutils_retrieval.api import NCBIEndpoint
+from src.id_links import (
+    IdLinks,
+    fill_missing_indexed_article_ids_by_links,
+    id_links_to_mapping,
+    load_id_links,
+)
+from src.utils import store_data_as_json
+
+
+def test_id_links_to_mapping():
+    mapping = id_links_to_mapping(
+        IdLinks(
+            pubmed_pmc={"36645057": "9848274", "2": None, "1": "5"},
+            pmc_pubmed={"13900": "11250746"},
+        ),
+    )
+
+    assert mapping["by_pmid"].tolist() == [[1, 36645057], [5, 9848274]]
+    assert mapping["by_pmcid"].tolist() == [[13900], [11250746]]
+    assert mapping["by_pmcid"].flags["C_CONTIGUOUS"]
+
+
+def test_fill_missing_indexed_article_ids_by_links(httpx_mock: HTTPXMock, tmp_path):
+    cache_file = tmp_path / "id_links.json"
+    # pmid 111111111 known to have no PMC article
+    store_data_as_json({"pubmed_pmc": {"111111111": None}, "pmc_pubmed": {}}, cache_file)
+    httpx_mock.add_response(
+        url=NCBIEndpoint.LINK.full_url(),
+        method="POST",
+        match_content=b"dbfrom=pmc&db=pubmed&linkname=pmc_pubmed&id=13900&retmode=json",
+        json={
+            "linksets": [
+                {
+                    "ids": ["13900"],
+                    "linksetdbs": [{"linkname": "pmc_pubmed", "links": ["11250746"]}],
+                },
+            ],
+        },
+    )
+    httpx_mock.add_response(
+        url=NCBIEndpoint.LINK.full_url(),
+        method="POST",
+        match_content=b"dbfrom=pubmed&db=pmc&linkname=pubmed_pmc&id=30000000&retmode=json",
+        json={
+            "linksets": [
+                {
+                    "ids": ["30000000"],
+                    "linksetdbs": [{"linkname": "pubmed_pmc", "links": ["7000000"]}],
+                },
+            ],
+        },
+    )
+    index = create_article_ids_index()
+    add_article_ids(
+        index,
+        [
+            {"pmcid": "PMC13900", "pmid": None},
+            {"pmcid": None, "pmid": "30000000"},
+            {"pmcid": None, "pmid": "36645057"},  # dropped, already complete
+            {"pmcid": "PMC9848274", "pmid": "36645057"},
+            {"pmcid": None, "pmid": "111111111"},
+        ],
+    )
+
+    fill_missing_indexed_article_ids_by_links(index, cache_file)
+
+    assert indexed_article_ids(index) == [
+        {"pmcid": None, "pmid": "111111111"},
+        {"pmcid": "PMC13900", "pmid": "11250746"},
+        {"pmcid": "PMC7000000", "pmid": "30000000"},
+        {"pmcid": "PMC9848274", "pmid": "36645057"},
+    ]
+    assert load_id_links(cache_file) == {
+        "pubmed_pmc": {"111111111": None, "30000000": "7000000"},
+        "pmc_pubmed": {"13900": "11250746"},
+    }
+
+    # all links cached, nothing resolved online again
+    fill_missing_indexed_article_ids_by_links(index, cache_file)
+    assert len(httpx_mock.get_requests()) == 2
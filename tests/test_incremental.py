@@ -0,0 +1,108 @@
+from datetime import UTC, date, datetime
+
+from src.eutils_retrieval.api import NCBIDatabase
+from src.incremental import (
+    delta_combinations,
+    entry_dates_since_last_run,
+    load_last_run,
+    store_last_run,
+)
+
+LAST_RUN = {
+    "devices": ["a", "b"],
+    "indicators": ["1", "2"],
+    "year_bounds": [2020, 2025],
+    "db": ["pubmed", "pmc"],
+    "query_plan_keys": ["key"],
+    "started_at": "2025-01-01T00:00:00+00:00",
+}
+
+
+def test_store_and_load_last_run(tmp_path):
+    store_last_run(
+        (["a", "b"], ["1", "2"]),
+        (2020, 2025),
+        (NCBIDatabase.PUB_MED, NCBIDatabase.PMC),
+        query_plan_keys=["key"],
+        folder=tmp_path,
+        started_at=datetime(2025, 1, 1, tzinfo=UTC),
+    )
+    assert load_last_run(tmp_path) == LAST_RUN
+
+
+def test_load_last_run_none(tmp_path):
+    assert load_last_run(tmp_path) is None
+
+
+def test_delta_combinations():
+    result = delta_combinations(
+        (["a", "c", "b"], ["1", "2", "3"]),
+        (2020, 2025),
+        (NCBIDatabase.PUB_MED, NCBIDatabase.PMC),
+        LAST_RUN,
+    )
+    assert result == [(["c"], ["1", "2", "3"]), (["a", "b"], ["3"])]
+
+
+def test_delta_combinations_nothing_new():
+    result = delta_combinations(
+        (["a", "b"], ["1", "2"]),
+        (2020, 2025),
+        (NCBIDatabase.PUB_MED, NCBIDatabase.PMC),
+        LAST_RUN,
+    )
+    assert result == []
+
+
+def test_delta_combinations_other_years_or_db():
+    devices_indicators = (["a", "b", "c"], ["1", "2"])
+    dbs = (NCBIDatabase.PUB_MED, NCBIDatabase.PMC)
+    assert delta_combinations(devices_indicators, (2021, 2025), dbs, LAST_RUN) is None
+    assert delta_combinations(devices_indicators, (2020, 2025), NCBIDatabase.PMC, LAST_RUN) is None
+
+
+def test_delta_combinations_removed_terms():
+    result = delta_combinations(
+        (["a", "c"], ["1", "2"]),
+        (2020, 2025),
+        (NCBIDatabase.PUB_MED, NCBIDatabase.PMC),
+        LAST_RUN,
+    )
+    assert result is None
+
+
+def test_entry_dates_since_last_run():
+    result = entry_dates_since_last_run(
+        (["a", "b"], ["1", "2"]),
+        (2020, 2025),
+        (NCBIDatabase.PUB_MED, NCBIDatabase.PMC),
+        LAST_RUN,
+        today=date(2025, 1, 2),
+    )
+    assert result == ("2025/01/01", "2025/01/02")
+
+
+def test_entry_dates_since_last_run_today():
+    result = entry_dates_since_last_run(
+        (["a", "b"], ["1", "2"]),
+        (2020, 2025),
+        (NCBIDatabase.PUB_MED, NCBIDatabase.PMC),
+        LAST_RUN,
+    )
+    assert result == ("2025/01/01", datetime.now(UTC).strftime("%Y/%m/%d"))
+
+
+def test_entry_dates_since_last_run_other_inputs():
+    dbs = (NCBIDatabase.PUB_MED, NCBIDatabase.PMC)
+    assert entry_dates_since_last_run((["a"], ["1", "2"]), (2020, 2025), dbs, LAST_RUN) is None
+    assert entry_dates_since_last_run((["a", "b"], ["1"]), (2020, 2025), dbs, LAST_RUN) is None
+    assert entry_dates_since_last_run((["a", "b"], ["1", "2"]), (2021, 2025), dbs, LAST_RUN) is None
+    assert (
+        entry_dates_since_last_run(
+            (["a", "b"], ["1", "2"]),
+            (2020, 2025),
+            NCBIDatabase.PMC,
+            LAST_RUN,
+        )
+        is None
+    )
@@ -0,0 +1,103 @@
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+
+from src.ndjson import (
+    is_ndjson_file,
+    iter_ndjson_records,
+    open_ndjson_writer,
+    store_data_as_ndjson,
+    write_ndjson_records,
+)
+
+RECORDS = [{"pmcid": "PMC1", "pmid": "1"}, {"pmcid": None, "pmid": "2"}]
+
+
+@pytest.mark.parametrize(
+    ("file_name", "expected"),
+    [
+        ("results.ndjson", True),
+        ("results.ndjson.gz", True),
+        ("results.ndjson.zst", True),
+        ("results.json", False),
+        ("results.json.gz", False),
+        ("results", False),
+    ],
+)
+def test_is_ndjson_file(file_name, expected):
+    assert is_ndjson_file(Path(file_name)) is expected
+
+
+def test_store_data_as_ndjson(tmp_path: Path):
+    file_path = tmp_path / "sub_folder" / "results.ndjson"
+    store_data_as_ndjson(RECORDS, file_path)
+
+    assert file_path.read_text().splitlines() == [
+        '{"pmcid":"PMC1","pmid":"1"}',
+        '{"pmcid":null,"pmid":"2"}',
+    ]
+    assert list(iter_ndjson_records(file_path)) == RECORDS
+    assert list(file_path.parent.iterdir()) == [file_path]
+
+
+def test_store_data_as_ndjson_gzip(tmp_path: Path):
+    file_path = tmp_path / "results.ndjson.gz"
+    store_data_as_ndjson(iter(RECORDS), file_path)
+
+    with gzip.open(file_path, "rt") as reader:
+        assert [json.loads(line) for line in reader] == RECORDS
+    assert list(iter_ndjson_records(file_path)) == RECORDS
+
+
+def test_open_ndjson_writer_appends(tmp_path: Path):
+    file_path = tmp_path / "results.ndjson"
+    with open_ndjson_writer(file_path) as writer:
+        write_ndjson_records(writer, RECORDS[:1])
+        # nothing visible until writer is closed
+        assert not file_path.exists()
+        write_ndjson_records(writer, RECORDS[1:])
+
+    assert list(iter_ndjson_records(file_path)) == RECORDS
+
+
+def test_open_ndjson_writer_error_keeps_previous_file(tmp_path: Path):
+    file_path = tmp_path / "results.ndjson"
+    store_data_as_ndjson(RECORDS, file_path)
+
+    def failing_write():
+        with open_ndjson_writer(file_path) as writer:
+            write_ndjson_records(writer, [{"pmcid": "PMC3", "pmid": "3"}])
+            raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        failing_write()
+
+    assert list(iter_ndjson_records(file_path)) == RECORDS
+    assert list(tmp_path.iterdir()) == [file_path]
+
+
+def test_open_ndjson_writer_extension_error(tmp_path: Path):
+    with pytest.raises(ValueError, match="should be of ndjson extension"):
+        store_data_as_ndjson(RECORDS, tmp_path / "results.json")
+
+
+def test_store_data_as_ndjson_zstd(tmp_path: Path):
+    file_path = tmp_path / "results.ndjson.zst"
+    try:
+        import zstandard  # noqa: F401, PLC0415
+    except ImportError:
+        with pytest.raises(ValueError, match="Package `zstandard` is needed"):
+            store_data_as_ndjson(RECORDS, file_path)
+        return
+
+    store_data_as_ndjson(RECORDS, file_path)  # pragma: no cover
+    assert list(iter_ndjson_records(file_path)) == RECORDS  # pragma: no cover
+
+
+def test_iter_ndjson_records_skips_blank_lines(tmp_path: Path):
+    file_path = tmp_path / "results.ndjson"
+    file_path.write_text('{"pmcid":"PMC1","pmid":"1"}\n\n')
+
+    assert list(iter_ndjson_records(file_path)) == RECORDS[:1]
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from src.packed_article_ids import (
+    NULL_ID,
+    concatenate_packed_article_ids,
+    count_conflicting_packed_article_ids,
+    create_packed_article_ids,
+    merge_packed_article_ids,
+    pack_article_ids,
+    unpack_article_ids,
+)
+
+ARTICLE_IDS = [
+    {"pmcid": "PMC9848274", "pmid": "36645057"},
+    {"pmcid": "PMC2222222222", "pmid": None},
+    {"pmcid": None, "pmid": "111111111"},
+]
+
+
+def test_pack_article_ids():
+    packed = pack_article_ids(ARTICLE_IDS)
+
+    assert packed["pmcids"].dtype == np.uint32
+    assert packed["pmcids"].tolist() == [9848274, 2222222222, NULL_ID]
+    assert packed["pmids"].tolist() == [36645057, NULL_ID, 111111111]
+    assert unpack_article_ids(packed) == ARTICLE_IDS
+
+
+def test_pack_article_ids_not_numeric():
+    with pytest.raises(ValueError, match="invalid literal"):
+        pack_article_ids([{"pmcid": "PMCa", "pmid": None}])
+
+
+def test_concatenate_packed_article_ids():
+    assert unpack_article_ids(concatenate_packed_article_ids()) == []
+
+    packed = pack_article_ids(ARTICLE_IDS)
+    assert unpack_article_ids(concatenate_packed_article_ids(packed, packed)) == [
+        *ARTICLE_IDS,
+        *ARTICLE_IDS,
+    ]
+
+
+def test_merge_packed_article_ids():
+    result = merge_packed_article_ids(
+        pack_article_ids(
+            [
+                {"pmcid": "PMC1", "pmid": "1"},
+                {"pmcid": "PMC2", "pmid": None},
+                {"pmcid": "PMC3", "pmid": None},
+            ],
+        ),
+        pack_article_ids(
+            [
+                {"pmcid": "PMC1", "pmid": "1"},
+                {"pmcid": None, "pmid": "1"},
+                {"pmcid": "PMC2", "pmid": "2"},
+                {"pmcid": None, "pmid": "4"},
+            ],
+        ),
+        create_packed_article_ids(2),  # no id at all
+    )
+
+    assert unpack_article_ids(result) == [
+        {"pmcid": None, "pmid": "4"},
+        {"pmcid": "PMC1", "pmid": "1"},
+        {"pmcid": "PMC2", "pmid": "2"},
+        {"pmcid": "PMC3", "pmid": None},
+    ]
+    assert count_conflicting_packed_article_ids(result) == 0
+
+
+def test_count_conflicting_packed_article_ids():
+    packed = pack_article_ids(
+        [
+            {"pmcid": "PMC1", "pmid": "1"},
+            {"pmcid": "PMC1", "pmid": "2"},
+            {"pmcid": "PMC2", "pmid": "2"},
+            {"pmcid": "PMC3", "pmid": None},
+        ],
+    )
+    assert count_conflicting_packed_article_ids(packed) == 1
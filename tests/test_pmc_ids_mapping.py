@@ -0,0 +1,91 @@
+import numpy as np
+
+from src.article_ids_index import add_article_ids, create_article_ids_index, indexed_article_ids
+from src.packed_article_ids import pack_article_ids, unpack_article_ids
+from src.pmc_ids_mapping import (
+    BY_PMCID_FILE_NAME,
+    fill_missing_article_ids,
+    fill_missing_indexed_article_ids,
+    load_or_build_pmc_ids_mapping,
+    lookup_ids,
+)
+
+PMC_IDS_CSV = (
+    "Journal Title,ISSN,eISSN,Year,Volume,Issue,Page,DOI,PMCID,PMID,Manuscript Id,Release Date\n"
+    "Breast Cancer Res,1465-5411,,2000,3,1,55,10.1186/bcr271,PMC13900,11250746,,live\n"
+    "Breast Cancer Res,1465-5411,,2000,3,1,61,10.1186/bcr272,PMC13901,11250747,,live\n"
+    "Breast Cancer Res,1465-5411,,2000,3,1,66,10.1186/bcr273,PMC13902,,,live\n"
+    "Nucleic Acids Res,0305-1048,,2000,28,1,1,10.1093/nar/28.1.1,PMC102409,10592168,,live\n"
+)
+
+
+def create_pmc_ids_csv(tmp_path, content=PMC_IDS_CSV):
+    csv_path = tmp_path / "PMC-ids.csv"
+    csv_path.write_text(content)
+    return csv_path
+
+
+def test_load_or_build_pmc_ids_mapping(tmp_path):
+    csv_path = create_pmc_ids_csv(tmp_path)
+    mapping = load_or_build_pmc_ids_mapping(csv_path, tmp_path / "mapping")
+
+    assert isinstance(mapping["by_pmcid"], np.memmap)
+    assert mapping["by_pmcid"].tolist() == [[13900, 13901, 102409], [11250746, 11250747, 10592168]]
+    assert mapping["by_pmid"].tolist() == [[10592168, 11250746, 11250747], [102409, 13900, 13901]]
+
+    # not built again while csv is the same
+    built_at = (tmp_path / "mapping" / BY_PMCID_FILE_NAME).stat().st_mtime_ns
+    load_or_build_pmc_ids_mapping(csv_path, tmp_path / "mapping")
+    assert (tmp_path / "mapping" / BY_PMCID_FILE_NAME).stat().st_mtime_ns == built_at
+
+    # built again once csv changed
+    create_pmc_ids_csv(tmp_path, PMC_IDS_CSV.splitlines()[0])
+    mapping = load_or_build_pmc_ids_mapping(csv_path, tmp_path / "mapping")
+    assert mapping["by_pmcid"].shape == (2, 0)
+
+
+def test_lookup_ids():
+    mapping = np.array([[1, 5, 9], [10, 50, 90]], dtype=np.uint32)
+    ids = np.array([9, 0, 4, 1, 10], dtype=np.uint32)
+
+    assert lookup_ids(mapping, ids).tolist() == [90, 0, 0, 10, 0]
+    assert lookup_ids(np.empty((2, 0), dtype=np.uint32), ids).tolist() == [0] * 5
+
+
+def test_fill_missing_article_ids(tmp_path):
+    mapping = load_or_build_pmc_ids_mapping(create_pmc_ids_csv(tmp_path), tmp_path / "mapping")
+    article_ids = [
+        {"pmcid": "PMC13900", "pmid": None},
+        {"pmcid": None, "pmid": "10592168"},
+        {"pmcid": "PMC13902", "pmid": None},  # no pmid in mapping
+        {"pmcid": None, "pmid": "1"},  # not in mapping
+        {"pmcid": "PMC13901", "pmid": "2"},  # kept as found
+    ]
+
+    result = fill_missing_article_ids(pack_article_ids(article_ids), mapping)
+    assert unpack_article_ids(result) == [
+        {"pmcid": "PMC13900", "pmid": "11250746"},
+        {"pmcid": "PMC102409", "pmid": "10592168"},
+        {"pmcid": "PMC13902", "pmid": None},
+        {"pmcid": None, "pmid": "1"},
+        {"pmcid": "PMC13901", "pmid": "2"},
+    ]
+
+
+def test_fill_missing_indexed_article_ids(tmp_path):
+    mapping = load_or_build_pmc_ids_mapping(create_pmc_ids_csv(tmp_path), tmp_path / "mapping")
+    index = create_article_ids_index()
+    add_article_ids(
+        index,
+        [
+            {"pmcid": "PMC13900", "pmid": None},
+            {"pmcid": None, "pmid": "11250746"},
+            {"pmcid": "PMC13902", "pmid": None},
+        ],
+    )
+
+    fill_missing_indexed_article_ids(index, mapping)
+    assert indexed_article_ids(index) == [
+        {"pmcid": "PMC13900", "pmid": "11250746"},
+        {"pmcid": "PMC13902", "pmid": None},
+    ]
@@ -0,0 +1,92 @@
+import json
+import pstats
+import threading
+
+from src.profiling import (
+    ACTIVE_STAGES,
+    RUN_STAGE,
+    profile_stage,
+    start_profiling,
+    stop_and_store_profiles,
+    stop_profiling,
+    top_functions,
+)
+
+
+def encode_numbers() -> str:
+    return json.dumps(list(range(1000)))
+
+
+def profiled_function_names(profiler) -> set[str]:
+    return {name for _, _, name in pstats.Stats(profiler).stats}
+
+
+def test_profile_stage_not_profiling():
+    with profile_stage("stage"):
+        encode_numbers()
+
+    assert stop_profiling() == {}
+
+
+def test_profile_nested_stages():
+    start_profiling()
+    with profile_stage("plan"):
+        with profile_stage("encode"):
+            encode_numbers()
+        thread = threading.Thread(target=json.dumps, args=([],))
+        thread.start()
+        thread.join()
+    profilers = stop_profiling()
+
+    assert list(profilers) == [RUN_STAGE, "plan", "encode"]
+    # time of a nested stage only counts for the nested stage
+    assert "encode_numbers" in profiled_function_names(profilers["encode"])
+    assert "encode_numbers" not in profiled_function_names(profilers["plan"])
+    # other threads count for the stage of the main thread
+    assert "dumps" in profiled_function_names(profilers["plan"])
+    assert ACTIVE_STAGES == []
+
+
+def test_profile_stage_in_other_thread():
+    start_profiling()
+    thread = threading.Thread(target=lambda: profile_stage("thread").__enter__())
+    thread.start()
+    thread.join()
+
+    assert list(stop_profiling()) == [RUN_STAGE]
+
+
+def test_stop_profiling_within_stage():
+    start_profiling()
+    with profile_stage("encode"):
+        encode_numbers()
+        profilers = stop_profiling()
+
+    assert list(profilers) == [RUN_STAGE, "encode"]
+    assert ACTIVE_STAGES == []
+
+
+def test_top_functions():
+    assert top_functions({}) == []
+
+    start_profiling()
+    with profile_stage("encode"):
+        encode_numbers()
+    functions = top_functions(stop_profiling(), nb_functions=2)
+
+    assert len(functions) == 2
+    assert functions[0]["own_time"] >= functions[1]["own_time"]
+
+
+def test_stop_and_store_profiles(tmp_path):
+    start_profiling()
+    with profile_stage("encode"):
+        encode_numbers()
+    stop_and_store_profiles(tmp_path / "cpu_profiles")
+
+    assert sorted(path.name for path in (tmp_path / "cpu_profiles").iterdir()) == [
+        "encode.pstats",
+        "run.pstats",
+    ]
+    stats = pstats.Stats(str(tmp_path / "cpu_profiles" / "encode.pstats"))
+    assert "encode_numbers" in {name for _, _, name in stats.stats}
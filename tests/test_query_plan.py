@@ -0,0 +1,107 @@
+import json
+
+from src.eutils_retrieval.api import NCBIDatabase
+from src.query_plan import (
+    QUERY_PLANNER_VERSION,
+    db_names,
+    load_or_create_query_plan,
+    query_plan_key,
+    sub_query_id,
+)
+
+
+def test_sub_query_id():
+    assert sub_query_id('("a") AND ("1")') == sub_query_id('("a") AND ("1")')
+    assert sub_query_id('("a") AND ("1")') != sub_query_id('("a") AND ("2")')
+    assert len(sub_query_id('("a") AND ("1")')) == 16
+
+
+def test_db_names():
+    assert db_names(NCBIDatabase.PMC) == ["pmc"]
+    assert db_names((NCBIDatabase.PUB_MED, NCBIDatabase.PMC)) == ["pubmed", "pmc"]
+
+
+def test_query_plan_key():
+    key = query_plan_key(["a"], ["1"], (2023, 2024), NCBIDatabase.PMC)
+    assert key == query_plan_key(["a"], ["1"], (2023, 2024), NCBIDatabase.PMC)
+
+    assert key != query_plan_key(["b"], ["1"], (2023, 2024), NCBIDatabase.PMC)
+    assert key != query_plan_key(["a"], ["2"], (2023, 2024), NCBIDatabase.PMC)
+    assert key != query_plan_key(["a"], ["1"], (2022, 2024), NCBIDatabase.PMC)
+    assert key != query_plan_key(["a"], ["1"], (2023, 2024), NCBIDatabase.PUB_MED)
+    assert key != query_plan_key(
+        ["a"],
+        ["1"],
+        (2023, 2024),
+        NCBIDatabase.PMC,
+        max_results_by_query=10,
+    )
+
+
+def test_query_plan_key_term_counts():
+    key = query_plan_key(["a"], ["1"], (None, None), NCBIDatabase.PMC)
+
+    # counts of terms not in queries, or of terms found, do not change queries
+    assert key == query_plan_key(
+        ["a"],
+        ["1"],
+        (None, None),
+        NCBIDatabase.PMC,
+        term_counts={"a": 10, "z": 0},
+    )
+    # a dead term changes queries
+    assert key != query_plan_key(
+        ["a"],
+        ["1"],
+        (None, None),
+        NCBIDatabase.PMC,
+        term_counts={"a": 0},
+    )
+    # counts are used to balance queries
+    assert query_plan_key(
+        ["a"],
+        ["1"],
+        (None, None),
+        NCBIDatabase.PMC,
+        term_counts={"a": 10},
+        max_results_by_query=10,
+    ) != query_plan_key(
+        ["a"],
+        ["1"],
+        (None, None),
+        NCBIDatabase.PMC,
+        term_counts={"a": 11},
+        max_results_by_query=10,
+    )
+
+
+def test_load_or_create_query_plan(tmp_path):
+    query_plan = load_or_create_query_plan(
+        ["a", "b"],
+        ["1"],
+        (2023, None),
+        NCBIDatabase.PMC,
+        tmp_path,
+    )
+    query = '(("a" OR "b") AND ("1")) AND 2023[PDAT]'
+    assert query_plan == {
+        "key": query_plan_key(["a", "b"], ["1"], (2023, None), NCBIDatabase.PMC),
+        "planner_version": QUERY_PLANNER_VERSION,
+        "devices": ["a", "b"],
+        "indicators": ["1"],
+        "year_bounds": [2023, None],
+        "db": ["pmc"],
+        "sub_queries": [{"id": sub_query_id(query), "query": query}],
+    }
+
+    with (tmp_path / f"{query_plan['key']}.json").open() as reader:
+        assert json.load(reader) == query_plan
+
+
+def test_load_or_create_query_plan_reuse(tmp_path):
+    key = query_plan_key(["a"], ["1"], (None, None), NCBIDatabase.PMC)
+    stored_plan = {"key": key, "sub_queries": [{"id": "stored", "query": "stored query"}]}
+    (tmp_path / f"{key}.json").write_text(json.dumps(stored_plan))
+
+    query_plan = load_or_create_query_plan(["a"], ["1"], (None, None), NCBIDatabase.PMC, tmp_path)
+    assert query_plan == stored_plan
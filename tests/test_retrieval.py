@@ -1,8 +1,28 @@
 import json
 import re
+import sqlite3
+from datetime import UTC, datetime
 
+import pytest
+
+from src import retrieval
+from src.article_store import ARTICLE_STORE_FILE_NAME
+from src.background_writer import submit_json_write
+from src.columnar_results import (
+    COLUMNAR_RESULTS_FOLDER_NAME,
+    contains_pmids,
+    load_columnar_results,
+)
 from src.eutils_retrieval.api import NCBIDatabase, NCBIEndpoint
-from src.retrieval import STORE_RESULTS_FILE_NAME, ncbi_article_retrieval
+from src.id_links import ID_LINKS_FILE_NAME
+from src.incremental import LAST_RUN_FILE_NAME
+from src.ndjson import iter_ndjson_records
+from src.pmc_ids_mapping import load_or_build_pmc_ids_mapping
+from src.query_plan import QUERY_PLANS_FOLDER_NAME
+from src.retrieval import STORE_RESULTS_FILE_NAME, last_run_inputs, ncbi_article_retrieval
+from src.run_delta import RUN_DELTA_FILE_NAME
+from src.term_statistics import OBSERVATION_DATES_KEY, TERM_STATISTICS_FILE_NAME
+from src.utils import load_data_from_json
 
 TEST_PUB_MED_ARTICLE_IDS = [
     {"idtype": "pubmed", "value": "36645057"},  # PubMed
@@ -74,3 +94,395 @@ def test_retrieval(httpx_mock, search_and_store_response, tmp_path):
     ]
     assert len(result) == len(expected)
     assert all(r in expected for r in result)
+
+    with sqlite3.connect(tmp_path / ARTICLE_STORE_FILE_NAME) as connection:
+        stored = connection.execute(
+            "SELECT pmcid, pmid, db FROM articles ORDER BY pmcid",
+        ).fetchall()
+    assert stored == [
+        (123, 666, "pmc"),
+        (9848274, 36645057, "pubmed"),
+        (2222222222, 111111111, "pmc"),
+    ]
+
+
+def test_retrieval_prune_dead_terms(httpx_mock, search_and_store_response_none, tmp_path):
+    (tmp_path / TERM_STATISTICS_FILE_NAME).write_text(
+        json.dumps(
+            {
+                "pmc": {"device_1": 0, "device_2": 3},
+                OBSERVATION_DATES_KEY: {"pmc": {"device_1": datetime.now(UTC).date().isoformat()}},
+            },
+        ),
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        method="GET",
+        json=search_and_store_response_none,
+    )
+
+    ncbi_article_retrieval(
+        [["device_1", "device_2"], ["indicator_1"]],
+        (None, None),
+        db=NCBIDatabase.PMC,
+        output_folder=tmp_path,
+    )
+
+    assert httpx_mock.get_request().url.params["term"] == '("device_2") AND ("indicator_1")'
+    with (tmp_path / TERM_STATISTICS_FILE_NAME).open() as reader:
+        term_statistics = json.load(reader)
+    assert term_statistics["pmc"]["device_1"] == 0
+    assert term_statistics["pmc"]["hemoblast"] == 40
+
+
+def test_retrieval_reuse_query_plan(httpx_mock, search_and_store_response_none, tmp_path):
+    for _ in range(2):
+        httpx_mock.add_response(
+            url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+            method="GET",
+            json=search_and_store_response_none,
+        )
+
+    for _ in range(2):
+        ncbi_article_retrieval(
+            [["device_1"], ["indicator_1"]],
+            (2020, 2021),
+            db=NCBIDatabase.PMC,
+            output_folder=tmp_path,
+        )
+
+    assert len(list((tmp_path / QUERY_PLANS_FOLDER_NAME).iterdir())) == 1
+    assert [r.url.params["term"] for r in httpx_mock.get_requests()] == [
+        '(("device_1") AND ("indicator_1")) AND 2020[PDAT]:2021[PDAT]',
+    ] * 2
+
+
+def test_retrieval_delta(httpx_mock, search_and_store_response, tmp_path):
+    (tmp_path / STORE_RESULTS_FILE_NAME).write_text(
+        json.dumps([{"pmcid": "PMC123", "pmid": None}, {"pmcid": "PMC1", "pmid": "1"}]),
+    )
+    (tmp_path / LAST_RUN_FILE_NAME).write_text(
+        json.dumps(
+            {
+                "devices": ["device_1"],
+                "indicators": ["indicator_1"],
+                "year_bounds": [None, None],
+                "db": ["pmc"],
+                "query_plan_keys": [],
+                "started_at": "2025-01-01T00:00:00+00:00",
+            },
+        ),
+    )
+    for _ in range(2):
+        httpx_mock.add_response(
+            url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+            method="GET",
+            json=search_and_store_response,
+        )
+        httpx_mock.add_response(
+            url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+            method="GET",
+            json={
+                "result": {
+                    "uids": ["duplicates"],
+                    "duplicates": {"articleids": TEST_PMC_ARTICLE_IDS_WITH_DUPLICATES},
+                },
+            },
+        )
+
+    ncbi_article_retrieval(
+        [["device_1", "device_2"], ["indicator_1", "indicator_2"]],
+        (None, None),
+        db=NCBIDatabase.PMC,
+        output_folder=tmp_path,
+        delta=True,
+    )
+
+    search_terms = [
+        r.url.params["term"]
+        for r in httpx_mock.get_requests()
+        if r.url.path.endswith(NCBIEndpoint.SEARCH.value)
+    ]
+    assert search_terms == [
+        '("device_2") AND ("indicator_1" OR "indicator_2")',
+        '("device_1") AND ("indicator_2")',
+    ]
+
+    with (tmp_path / STORE_RESULTS_FILE_NAME).open() as reader:
+        result = json.load(reader)
+    expected = [{"pmcid": "PMC123", "pmid": "666"}, {"pmcid": "PMC1", "pmid": "1"}]
+    assert len(result) == len(expected)
+    assert all(r in expected for r in result)
+
+    with (tmp_path / LAST_RUN_FILE_NAME).open() as reader:
+        last_run = json.load(reader)
+    assert last_run["devices"] == ["device_1", "device_2"]
+    assert len(last_run["query_plan_keys"]) == 2
+
+
+def test_retrieval_delta_cannot_complete(httpx_mock, search_and_store_response_none, tmp_path):
+    (tmp_path / STORE_RESULTS_FILE_NAME).write_text(json.dumps([{"pmcid": "PMC1", "pmid": "1"}]))
+    (tmp_path / LAST_RUN_FILE_NAME).write_text(
+        json.dumps(
+            {
+                "devices": ["device_1"],
+                "indicators": ["indicator_1"],
+                "year_bounds": [2020, None],
+                "db": ["pmc"],
+                "query_plan_keys": [],
+                "started_at": "2025-01-01T00:00:00+00:00",
+            },
+        ),
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        method="GET",
+        json=search_and_store_response_none,
+    )
+
+    ncbi_article_retrieval(
+        [["device_1", "device_2"], ["indicator_1"]],
+        (None, None),
+        db=NCBIDatabase.PMC,
+        output_folder=tmp_path,
+        delta=True,
+    )
+
+    assert httpx_mock.get_request().url.params["term"] == (
+        '("device_1" OR "device_2") AND ("indicator_1")'
+    )
+    with (tmp_path / STORE_RESULTS_FILE_NAME).open() as reader:
+        assert json.load(reader) == []
+
+
+def test_retrieval_since_last_run(httpx_mock, search_and_store_response, tmp_path):
+    (tmp_path / STORE_RESULTS_FILE_NAME).write_text(json.dumps([{"pmcid": "PMC1", "pmid": "1"}]))
+    (tmp_path / LAST_RUN_FILE_NAME).write_text(
+        json.dumps(
+            {
+                "devices": ["device_1"],
+                "indicators": ["indicator_1"],
+                "year_bounds": [2020, 2025],
+                "db": ["pmc"],
+                "query_plan_keys": [],
+                "started_at": "2025-01-01T10:00:00+00:00",
+            },
+        ),
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        method="GET",
+        json=search_and_store_response,
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+        method="GET",
+        json={"result": {"uids": ["pmc_only"], "pmc_only": {"articleids": TEST_PMC_ARTICLE_IDS}}},
+    )
+
+    ncbi_article_retrieval(
+        [["device_1"], ["indicator_1"]],
+        (2020, 2025),
+        db=NCBIDatabase.PMC,
+        output_folder=tmp_path,
+        since_last_run=True,
+    )
+
+    search_params = httpx_mock.get_requests()[0].url.params
+    assert search_params["datetype"] == "edat"
+    assert search_params["mindate"] == "2025/01/01"
+
+    with (tmp_path / STORE_RESULTS_FILE_NAME).open() as reader:
+        result = json.load(reader)
+    expected = [{"pmcid": "PMC1", "pmid": "1"}, {"pmcid": "PMC2222222222", "pmid": "111111111"}]
+    assert len(result) == len(expected)
+    assert all(r in expected for r in result)
+
+    # next run searches again from the start of this one, as the run of found articles
+    with sqlite3.connect(tmp_path / ARTICLE_STORE_FILE_NAME) as connection:
+        (run_id,) = connection.execute("SELECT DISTINCT first_seen_run FROM articles").fetchone()
+    assert load_data_from_json(tmp_path / LAST_RUN_FILE_NAME)["started_at"] == run_id
+
+
+def test_last_run_inputs_other_terms(tmp_path):
+    (tmp_path / STORE_RESULTS_FILE_NAME).write_text(json.dumps([{"pmcid": "PMC1", "pmid": "1"}]))
+    (tmp_path / LAST_RUN_FILE_NAME).write_text(
+        json.dumps(
+            {
+                "devices": ["device_1"],
+                "indicators": ["indicator_1"],
+                "year_bounds": [2020, 2025],
+                "db": ["pmc"],
+                "query_plan_keys": [],
+                "started_at": "2025-01-01T10:00:00+00:00",
+            },
+        ),
+    )
+    devices_indicators = (["device_2"], ["indicator_1"])
+
+    # last run searched other terms: all articles are searched, without its results
+    assert last_run_inputs(
+        devices_indicators,
+        (2020, 2025),
+        NCBIDatabase.PMC,
+        tmp_path / STORE_RESULTS_FILE_NAME,
+        since_last_run=True,
+    ) == ([devices_indicators], None, [])
+
+
+def test_retrieval_year_cache(httpx_mock, search_and_store_response_none, tmp_path):
+    # 2 years x 2 databases searched once, then all cached
+    for _ in range(4):
+        httpx_mock.add_response(
+            url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+            method="GET",
+            json=search_and_store_response_none,
+        )
+
+    for year_bounds in ((2020, 2021), (2021, 2021), (2020, 2021)):
+        ncbi_article_retrieval(
+            [["device_1"], ["indicator_1"]],
+            year_bounds,
+            db=(NCBIDatabase.PMC, NCBIDatabase.PUB_MED),
+            output_folder=tmp_path,
+            year_cache=True,
+        )
+
+    assert [r.url.params["term"] for r in httpx_mock.get_requests()] == [
+        '(("device_1") AND ("indicator_1")) AND 2020[PDAT]:2020[PDAT]',
+        '(("device_1") AND ("indicator_1")) AND 2021[PDAT]:2021[PDAT]',
+    ] * 2
+
+
+def test_retrieval_pmc_ids_mapping(httpx_mock, search_and_store_response, tmp_path):
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        method="GET",
+        json=search_and_store_response,
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+        method="GET",
+        json={
+            "result": {
+                "uids": ["pmc_only"],
+                "pmc_only": {"articleids": [{"idtype": "pmcid", "value": "PMC13900"}]},
+            },
+        },
+    )
+    csv_path = tmp_path / "PMC-ids.csv"
+    csv_path.write_text("PMCID,PMID\nPMC13900,11250746\n")
+
+    ncbi_article_retrieval(
+        [["device_1"], ["indicator_1"]],
+        (2023, 2023),
+        db=NCBIDatabase.PMC,
+        output_folder=tmp_path,
+        pmc_ids_mapping=load_or_build_pmc_ids_mapping(csv_path, tmp_path / "mapping"),
+        columnar_results=True,
+    )
+
+    with (tmp_path / STORE_RESULTS_FILE_NAME).open() as reader:
+        assert json.load(reader) == [{"pmcid": "PMC13900", "pmid": "11250746"}]
+    columnar_results = load_columnar_results(tmp_path / COLUMNAR_RESULTS_FOLDER_NAME)
+    assert contains_pmids(columnar_results, ["11250746"]).tolist() == [True]
+
+
+def test_retrieval_link_missing_ids(httpx_mock, search_and_store_response, tmp_path):
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        method="GET",
+        json=search_and_store_response,
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+        method="GET",
+        json={
+            "result": {
+                "uids": ["pmc_only"],
+                "pmc_only": {"articleids": [{"idtype": "pmcid", "value": "PMC13900"}]},
+            },
+        },
+    )
+    httpx_mock.add_response(
+        url=NCBIEndpoint.LINK.full_url(),
+        method="POST",
+        json={
+            "linksets": [
+                {
+                    "ids": ["13900"],
+                    "linksetdbs": [{"linkname": "pmc_pubmed", "links": ["11250746"]}],
+                },
+            ],
+        },
+    )
+
+    ncbi_article_retrieval(
+        [["device_1"], ["indicator_1"]],
+        (2023, 2023),
+        db=NCBIDatabase.PMC,
+        output_folder=tmp_path,
+        link_missing_ids=True,
+    )
+
+    with (tmp_path / STORE_RESULTS_FILE_NAME).open() as reader:
+        assert json.load(reader) == [{"pmcid": "PMC13900", "pmid": "11250746"}]
+    assert (tmp_path / ID_LINKS_FILE_NAME).exists()
+
+
+def test_retrieval_ndjson_results(httpx_mock, search_and_store_response, tmp_path):
+    for _ in range(2):
+        httpx_mock.add_response(
+            url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+            method="GET",
+            json=search_and_store_response,
+        )
+    for pmcid in ("PMC13900", "PMC13901"):
+        httpx_mock.add_response(
+            url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+            method="GET",
+            json={
+                "result": {
+                    "uids": ["pmc_only"],
+                    "pmc_only": {"articleids": [{"idtype": "pmcid", "value": pmcid}]},
+                },
+            },
+        )
+
+    for indicator in ("indicator_1", "indicator_2"):
+        ncbi_article_retrieval(
+            [["device_1"], ["indicator_1", indicator]],
+            (2023, 2023),
+            db=NCBIDatabase.PMC,
+            output_folder=tmp_path,
+            delta=True,
+            results_file_name="retrieved_ids.ndjson.gz",
+            run_delta_report=True,
+        )
+
+    # second run merges its results into first run ones, read back from ndjson
+    assert list(iter_ndjson_records(tmp_path / "retrieved_ids.ndjson.gz")) == [
+        {"pmcid": "PMC13900", "pmid": None},
+        {"pmcid": "PMC13901", "pmid": None},
+    ]
+    assert load_data_from_json(tmp_path / RUN_DELTA_FILE_NAME)["added"] == [
+        {"pmcid": "PMC13901", "pmid": None},
+    ]
+
+
+def test_retrieval_search_error_not_hidden_by_write_error(monkeypatch, tmp_path):
+    def failing_search(*_, intermediate_writer, **__):
+        submit_json_write(intermediate_writer, {}, tmp_path / "not_json.txt")  # write error
+        message = "search error"
+        raise RuntimeError(message)
+
+    monkeypatch.setattr(retrieval, "ncbi_search_and_fetch", failing_search)
+
+    with pytest.raises(RuntimeError, match="search error"):
+        ncbi_article_retrieval(
+            [["device_1"], ["indicator_1"]],
+            (2020, 2025),
+            db=NCBIDatabase.PMC,
+            output_folder=tmp_path,
+            store_intermediate_results=True,
+        )
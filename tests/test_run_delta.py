@@ -0,0 +1,74 @@
+from src.columnar_results import load_columnar_results, store_columnar_results
+from src.packed_article_ids import pack_article_ids, unpack_article_ids
+from src.run_delta import compute_run_delta, store_run_delta
+from src.utils import load_data_from_json
+
+PREVIOUS_ARTICLE_IDS = [
+    {"pmcid": "PMC1", "pmid": "1"},  # kept
+    {"pmcid": "PMC2", "pmid": None},  # upgraded
+    {"pmcid": None, "pmid": "3"},  # upgraded
+    {"pmcid": "PMC4", "pmid": "4"},  # removed
+    {"pmcid": "PMC5", "pmid": None},  # removed
+    {"pmcid": None, "pmid": "6"},  # removed
+    {"pmcid": "PMC7", "pmid": "7"},  # kept, by its pmid only
+]
+CURRENT_ARTICLE_IDS = [
+    {"pmcid": "PMC1", "pmid": "1"},
+    {"pmcid": "PMC2", "pmid": "2"},
+    {"pmcid": "PMC3", "pmid": "3"},
+    {"pmcid": None, "pmid": "7"},
+    {"pmcid": "PMC8", "pmid": None},  # added
+    {"pmcid": None, "pmid": "9"},  # added
+]
+
+
+def test_compute_run_delta(tmp_path):
+    store_columnar_results(pack_article_ids(PREVIOUS_ARTICLE_IDS), tmp_path)
+
+    run_delta = compute_run_delta(
+        load_columnar_results(tmp_path),
+        pack_article_ids(CURRENT_ARTICLE_IDS),
+    )
+
+    assert unpack_article_ids(run_delta["added"]) == [
+        {"pmcid": "PMC8", "pmid": None},
+        {"pmcid": None, "pmid": "9"},
+    ]
+    assert unpack_article_ids(run_delta["removed"]) == [
+        {"pmcid": "PMC4", "pmid": "4"},
+        {"pmcid": "PMC5", "pmid": None},
+        {"pmcid": None, "pmid": "6"},
+    ]
+    assert unpack_article_ids(run_delta["upgraded"]) == [
+        {"pmcid": "PMC2", "pmid": "2"},
+        {"pmcid": "PMC3", "pmid": "3"},
+    ]
+
+
+def test_compute_run_delta_no_previous_articles(tmp_path):
+    store_columnar_results(pack_article_ids([]), tmp_path)
+
+    run_delta = compute_run_delta(
+        load_columnar_results(tmp_path),
+        pack_article_ids(CURRENT_ARTICLE_IDS),
+    )
+
+    assert unpack_article_ids(run_delta["added"]) == CURRENT_ARTICLE_IDS
+    assert unpack_article_ids(run_delta["removed"]) == []
+    assert unpack_article_ids(run_delta["upgraded"]) == []
+
+
+def test_store_run_delta(tmp_path):
+    delta_file = tmp_path / "run_delta.json"
+    store_run_delta(pack_article_ids(CURRENT_ARTICLE_IDS), tmp_path / "columns", delta_file)
+    assert not delta_file.exists()
+
+    store_columnar_results(pack_article_ids(PREVIOUS_ARTICLE_IDS), tmp_path / "columns")
+    store_run_delta(pack_article_ids(CURRENT_ARTICLE_IDS), tmp_path / "columns", delta_file)
+
+    run_delta = load_data_from_json(delta_file)
+    assert run_delta["counts"] == {"added": 2, "removed": 3, "upgraded": 2}
+    assert run_delta["added"] == [
+        {"pmcid": "PMC8", "pmid": None},
+        {"pmcid": None, "pmid": "9"},
+    ]
@@ -0,0 +1,140 @@
+import re
+
+import numpy as np
+import pytest
+
+from src.eutils_retrieval.api import NCBIDatabase, NCBIEndpoint
+from src.packed_article_ids import pack_article_ids
+from src.sharding import (
+    SHARD_PLAN_FILE_NAME,
+    create_shard_plan,
+    merge_shards,
+    run_shard,
+    shard_plan_key,
+    shard_result_path,
+)
+from src.utils import load_data_from_json
+
+
+def test_create_shard_plan(tmp_path):
+    shard_plan = create_shard_plan(
+        ["device_1"],
+        ["indicator_1"],
+        year_bounds=(2023, 2024),
+        db=(NCBIDatabase.PUB_MED, NCBIDatabase.PMC),
+        nb_shards=3,
+        folder=tmp_path,
+    )
+
+    assert load_data_from_json(tmp_path / SHARD_PLAN_FILE_NAME) == shard_plan
+    # 1 sub-query x 2 years x 2 dbs, dealt out in turn
+    assert [len(tasks) for tasks in shard_plan["shards"]] == [2, 1, 1]
+    tasks = [task for tasks in shard_plan["shards"] for task in tasks]
+    assert sorted((task["db"], task["query"].split(" AND ")[-1]) for task in tasks) == [
+        ("pmc", "2023[PDAT]:2023[PDAT]"),
+        ("pmc", "2024[PDAT]:2024[PDAT]"),
+        ("pubmed", "2023[PDAT]:2023[PDAT]"),
+        ("pubmed", "2024[PDAT]:2024[PDAT]"),
+    ]
+
+
+def test_create_shard_plan_without_years(tmp_path):
+    shard_plan = create_shard_plan(
+        ["device_1"],
+        ["indicator_1"],
+        year_bounds=(None, None),
+        db=NCBIDatabase.PMC,
+        nb_shards=2,
+        folder=tmp_path,
+    )
+
+    assert [len(tasks) for tasks in shard_plan["shards"]] == [1, 0]
+    assert "PDAT" not in shard_plan["shards"][0][0]["query"]
+
+
+def test_create_shard_plan_error(tmp_path):
+    with pytest.raises(ValueError, match="should be positive"):
+        create_shard_plan(["d"], ["i"], (None, None), NCBIDatabase.PMC, 0, tmp_path)
+
+
+def test_run_and_merge_shards(httpx_mock, search_and_store_response, tmp_path):
+    create_shard_plan(
+        ["device_1"],
+        ["indicator_1"],
+        year_bounds=(2023, 2024),
+        db=NCBIDatabase.PMC,
+        nb_shards=2,
+        folder=tmp_path,
+    )
+    for _ in range(2):
+        httpx_mock.add_response(
+            url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+            method="GET",
+            json=search_and_store_response,
+        )
+    for article_ids in (
+        [{"idtype": "pmcid", "value": "PMC1"}],
+        [{"idtype": "pmcid", "value": "PMC1"}, {"idtype": "pmid", "value": "1"}],
+    ):
+        httpx_mock.add_response(
+            url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+            method="GET",
+            json={"result": {"uids": ["article"], "article": {"articleids": article_ids}}},
+        )
+
+    with pytest.raises(ValueError, match=r"Shards \[0, 1\] have not been run yet"):
+        merge_shards(tmp_path)
+
+    run_shard(tmp_path, 0)
+    plan_key = shard_plan_key(load_data_from_json(tmp_path / SHARD_PLAN_FILE_NAME))
+    assert np.load(shard_result_path(tmp_path, 0, plan_key)).tolist() == [[1], [0]]
+    run_shard(tmp_path, 1)
+
+    assert merge_shards(tmp_path) == [{"pmcid": "PMC1", "pmid": "1"}]
+
+
+def test_run_shard_error(tmp_path):
+    create_shard_plan(["d"], ["i"], (None, None), NCBIDatabase.PMC, 1, tmp_path)
+
+    with pytest.raises(ValueError, match="Shard 1 not in plan of 1 shards"):
+        run_shard(tmp_path, 1)
+
+
+def save_partial_result(folder, shard_index, plan_key, article_ids):
+    packed = pack_article_ids(article_ids)
+    np.save(
+        shard_result_path(folder, shard_index, plan_key),
+        np.stack([packed["pmcids"], packed["pmids"]]),
+    )
+
+
+def test_merge_shards_conflicts(tmp_path):
+    plan_key = shard_plan_key(
+        create_shard_plan(["d"], ["i"], (None, None), NCBIDatabase.PMC, 2, tmp_path),
+    )
+    save_partial_result(tmp_path, 0, plan_key, [{"pmcid": "PMC1", "pmid": "1"}])
+    save_partial_result(tmp_path, 1, plan_key, [{"pmcid": "PMC1", "pmid": "2"}])
+
+    assert merge_shards(tmp_path) == [
+        {"pmcid": "PMC1", "pmid": "1"},
+        {"pmcid": "PMC1", "pmid": "2"},
+    ]
+
+
+def test_merge_shards_of_another_plan(tmp_path):
+    plan_key = shard_plan_key(
+        create_shard_plan(["d"], ["i"], (None, None), NCBIDatabase.PMC, 2, tmp_path),
+    )
+    save_partial_result(tmp_path, 0, plan_key, [{"pmcid": "PMC1", "pmid": "1"}])
+
+    # a new plan deletes partial results of the previous one
+    plan_key = shard_plan_key(
+        create_shard_plan(["d"], ["i"], (None, None), NCBIDatabase.PMC, 3, tmp_path),
+    )
+    assert not list(tmp_path.glob("shard_*.npy"))
+
+    # a node still running the previous plan
+    save_partial_result(tmp_path, 0, plan_key, [{"pmcid": "PMC1", "pmid": "1"}])
+    save_partial_result(tmp_path, 1, "previous", [{"pmcid": "PMC1", "pmid": "1"}])
+    with pytest.raises(ValueError, match=r"Shards \[1\] were run for another shard plan"):
+        merge_shards(tmp_path)
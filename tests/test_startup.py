@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from benchmarks.bench_startup import (
+    LAZY_MODULES,
+    MAIN_IMPORT_TIME_BUDGET,
+    MAIN_IMPORT_TIME_LIMIT,
+    MAIN_MAX_IMPORTED_MODULES,
+    measure_import,
+)
+
+CHECK_STARTUP_TIME_VARIABLE = "CHECK_STARTUP_TIME"
+"""Environment variable enabling the strict import time check, only reliable on an idle machine"""
+
+
+def test_main_imports():
+    import_time, imported_modules = measure_import("main")
+
+    assert not imported_modules.intersection(LAZY_MODULES)
+    assert len(imported_modules) <= MAIN_MAX_IMPORTED_MODULES
+    assert import_time < MAIN_IMPORT_TIME_LIMIT
+
+
+@pytest.mark.skipif(
+    not os.environ.get(CHECK_STARTUP_TIME_VARIABLE),
+    reason=f"import time is only checked with {CHECK_STARTUP_TIME_VARIABLE}=1",
+)
+def test_main_import_time():
+    import_time, _ = measure_import("main")
+
+    assert import_time < MAIN_IMPORT_TIME_BUDGET
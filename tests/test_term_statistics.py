@@ -0,0 +1,93 @@
+import json
+from datetime import date
+
+from src.eutils_retrieval.api import NCBIDatabase
+from src.term_statistics import (
+    OBSERVATION_DATES_KEY,
+    known_term_counts,
+    load_term_statistics,
+    merge_term_statistics,
+    update_term_statistics,
+)
+
+TODAY = date(2026, 10, 18)
+
+
+def test_load_term_statistics(tmp_path):
+    file_path = tmp_path / "term_statistics.json"
+    file_path.write_text(json.dumps({"pmc": {"hemoblast": 40}}))
+
+    assert load_term_statistics(file_path) == {"pmc": {"hemoblast": 40}}
+
+
+def test_load_term_statistics_no_file(tmp_path):
+    assert load_term_statistics(tmp_path / "term_statistics.json") == {}
+
+
+def test_update_term_statistics():
+    term_statistics = {"pmc": {"hemoblast": 40, "floseal": 0}}
+    update_term_statistics(term_statistics, NCBIDatabase.PMC, {"floseal": 1}, TODAY)
+    update_term_statistics(term_statistics, NCBIDatabase.PUB_MED, {"hemoblast": 12}, TODAY)
+
+    assert term_statistics == {
+        "pmc": {"hemoblast": 40, "floseal": 1},
+        "pubmed": {"hemoblast": 12},
+        OBSERVATION_DATES_KEY: {
+            "pmc": {"floseal": "2026-10-18"},
+            "pubmed": {"hemoblast": "2026-10-18"},
+        },
+    }
+
+
+def test_merge_term_statistics():
+    term_statistics = {
+        "pmc": {"hemoblast": 40},
+        OBSERVATION_DATES_KEY: {"pmc": {"hemoblast": "2026-10-01"}},
+    }
+    other = {
+        "pmc": {"floseal": 0},
+        OBSERVATION_DATES_KEY: {"pmc": {"floseal": "2026-10-18"}},
+    }
+    merge_term_statistics(term_statistics, other)
+
+    assert term_statistics == {
+        "pmc": {"hemoblast": 40, "floseal": 0},
+        OBSERVATION_DATES_KEY: {"pmc": {"hemoblast": "2026-10-01", "floseal": "2026-10-18"}},
+    }
+
+
+def test_known_term_counts():
+    term_statistics = {
+        "pmc": {"hemoblast": 40, "floseal": 0, "gelfoam": 0},
+        "pubmed": {"hemoblast": 12, "floseal": 3},
+        OBSERVATION_DATES_KEY: {"pmc": {"floseal": "2026-10-18", "gelfoam": "2026-10-18"}},
+    }
+
+    assert known_term_counts(term_statistics, NCBIDatabase.PMC, TODAY) == {
+        "hemoblast": 40,
+        "floseal": 0,
+        "gelfoam": 0,
+    }
+    assert known_term_counts(
+        term_statistics,
+        (NCBIDatabase.PMC, NCBIDatabase.PUB_MED),
+        TODAY,
+    ) == {"hemoblast": 40, "floseal": 3}
+
+
+def test_known_term_counts_stale_dead_terms():
+    term_statistics = {
+        "pmc": {"hemoblast": 40, "floseal": 0, "gelfoam": 0, "surgicel": 0},
+        OBSERVATION_DATES_KEY: {
+            "pmc": {"hemoblast": "2020-01-01", "floseal": "2026-10-01", "gelfoam": "2026-09-01"},
+        },
+    }
+
+    assert known_term_counts(term_statistics, NCBIDatabase.PMC, TODAY) == {
+        "hemoblast": 40,
+        "floseal": 0,
+    }
+
+
+def test_known_term_counts_empty():
+    assert known_term_counts({}, (NCBIDatabase.PMC, NCBIDatabase.PUB_MED)) == {}
@@ -0,0 +1,101 @@
+import json
+import re
+import threading
+
+from src.eutils_retrieval.api import NCBIDatabase, NCBIEndpoint, call_eutils
+from src.tracing import (
+    TRACED_SPANS,
+    start_tracing,
+    stop_and_store_trace,
+    stop_tracing,
+    to_chrome_trace_events,
+    trace_span,
+)
+
+
+def test_trace_span_not_tracing():
+    with trace_span("step", db="pmc") as span_attributes:
+        span_attributes["bytes"] = 10
+
+    assert span_attributes == {"db": "pmc", "bytes": 10}
+    assert TRACED_SPANS == []
+
+
+def write_in_background():
+    with trace_span("background write"):
+        pass
+
+
+def test_trace_nested_spans():
+    start_tracing()
+    with trace_span("run"):
+        with trace_span("query", query_id="1") as span_attributes:
+            span_attributes["nb_results"] = 2
+        with trace_span("write"):
+            thread = threading.Thread(target=write_in_background, name="writer")
+            thread.start()
+            thread.join()
+    spans = stop_tracing()
+
+    assert [span["name"] for span in spans] == ["query", "background write", "write", "run"]
+    query, background_write, write, run = spans
+    assert query["attributes"] == {"query_id": "1", "nb_results": 2}
+    # nested spans start and end within their parent span
+    assert run["start_ns"] <= query["start_ns"]
+    assert query["start_ns"] + query["duration_ns"] <= write["start_ns"]
+    assert write["start_ns"] + write["duration_ns"] <= run["start_ns"] + run["duration_ns"]
+    assert background_write["thread_name"] == "writer"
+    assert background_write["thread_id"] != run["thread_id"]
+    assert TRACED_SPANS == []
+
+
+def test_to_chrome_trace_events():
+    spans = [
+        {
+            "name": name,
+            "start_ns": start_ns,
+            "duration_ns": 2_000,
+            "thread_id": thread_id,
+            "thread_name": f"thread_{thread_id}",
+            "attributes": {"db": "pmc"},
+        }
+        for name, start_ns, thread_id in (("write", 3_000, 2), ("run", 1_000, 1))
+    ]
+
+    events = to_chrome_trace_events(spans)
+
+    assert [(event["ph"], event["tid"]) for event in events] == [
+        ("M", 2),
+        ("M", 1),
+        ("X", 1),
+        ("X", 2),
+    ]
+    assert events[0]["args"] == {"name": "thread_2"}
+    assert events[2] | {"pid": None} == {
+        "ph": "X",
+        "name": "run",
+        "pid": None,
+        "tid": 1,
+        "ts": 0.0,
+        "dur": 2.0,
+        "args": {"db": "pmc"},
+    }
+    assert events[3]["ts"] == 2.0
+
+
+def test_stop_and_store_trace(httpx_mock, tmp_path):
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        json={"call": "response"},
+    )
+    start_tracing()
+    call_eutils(
+        NCBIEndpoint.SEARCH,
+        {"db": NCBIDatabase.PMC.value, "term": "query", "usehistory": "n", "retmode": "json"},
+    )
+    stop_and_store_trace(tmp_path / "trace.json")
+
+    trace = json.loads((tmp_path / "trace.json").read_text())
+    complete_events = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert [event["name"] for event in complete_events] == ["GET esearch.fcgi", "decode json"]
+    assert complete_events[0]["args"] == {"status_code": 200, "bytes": 19, "retries": 0}
@@ -3,7 +3,7 @@ from pathlib import Path
 
 import pytest
 
-from src.utils import flatten_dict_to_list, store_data_as_json
+from src.utils import flatten_dict_to_list, load_data_from_json, store_data_as_json
 
 
 def test_flatten_dict_to_list():
@@ -35,3 +35,10 @@ def test_store_data_as_json_error(tmp_path: Path):
 
     with pytest.raises(ValueError, match="should be of json extension"):
         store_data_as_json(data, file_path)
+
+
+def test_load_data_from_json(tmp_path: Path):
+    file_path = tmp_path / "file.json"
+    file_path.write_text(json.dumps([{"pmcid": "PMC1", "pmid": None}]))
+
+    assert load_data_from_json(file_path) == [{"pmcid": "PMC1", "pmid": None}]
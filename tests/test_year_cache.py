@@ -0,0 +1,119 @@
+import json
+import re
+from datetime import UTC, datetime
+
+import pytest
+
+from src.eutils_retrieval.api import NCBIDatabase, NCBIEndpoint
+from src.query_plan import sub_query_id
+from src.year_cache import (
+    cached_year_path,
+    load_cached_year,
+    ncbi_search_and_fetch_by_year,
+    years_in_bounds,
+)
+
+NOW = datetime(2025, 6, 1, 12, tzinfo=UTC)
+
+TEST_PMC_ARTICLE_IDS = [
+    {"idtype": "pmid", "value": "111111111"},
+    {"idtype": "pmcid", "value": "PMC2222222222"},
+]
+
+
+@pytest.mark.parametrize(
+    ("bounds", "expected"),
+    [
+        ((None, None), None),
+        ((2023, None), [2023]),
+        ((None, 2023), [2023]),
+        ((2021, 2023), [2021, 2022, 2023]),
+    ],
+)
+def test_years_in_bounds(bounds, expected):
+    assert years_in_bounds(bounds) == expected
+
+
+def test_cached_year_path(tmp_path):
+    result = cached_year_path(tmp_path, "query", NCBIDatabase.PMC, 2023)
+    assert result == tmp_path / "pmc" / f"{sub_query_id('query')}_2023.json"
+
+
+def test_load_cached_year_none(tmp_path):
+    assert load_cached_year(tmp_path / "file.json", 2023, NOW) is None
+
+
+@pytest.mark.parametrize(
+    ("year", "cached_at", "expected"),
+    [
+        # years past when cached are closed
+        (2024, "2025-01-02T00:00:00+00:00", [{"pmcid": "PMC1", "pmid": None}]),
+        # current year is volatile
+        (2025, "2025-06-01T00:00:00+00:00", [{"pmcid": "PMC1", "pmid": None}]),
+        (2025, "2025-05-31T00:00:00+00:00", None),
+    ],
+)
+def test_load_cached_year(tmp_path, year, cached_at, expected):
+    file_path = tmp_path / "file.json"
+    file_path.write_text(
+        json.dumps({"cached_at": cached_at, "article_ids": [{"pmcid": "PMC1", "pmid": None}]}),
+    )
+    assert load_cached_year(file_path, year, NOW) == expected
+
+
+def test_load_cached_year_after_new_year(tmp_path):
+    file_path = tmp_path / "file.json"
+    file_path.write_text(
+        json.dumps(
+            {"cached_at": "2024-12-31T23:00:00+00:00", "article_ids": [{"pmcid": "PMC1"}]},
+        ),
+    )
+
+    # cached while 2024 was still current: articles published late in 2024 may be missing
+    assert load_cached_year(file_path, 2024, datetime(2025, 1, 2, tzinfo=UTC)) is None
+
+
+def test_ncbi_search_and_fetch_by_year(httpx_mock, search_and_store_response, tmp_path):
+    # 2024 is cached for PMC, only 2025 is searched
+    cached_2024 = cached_year_path(tmp_path, "query", NCBIDatabase.PMC, 2024)
+    cached_2024.parent.mkdir()
+    cached_2024.write_text(
+        json.dumps(
+            {
+                "cached_at": "2025-01-15T00:00:00+00:00",
+                "article_ids": [{"pmcid": "PMC1", "pmid": "1"}],
+            },
+        ),
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SEARCH.full_url() + "?.*"),
+        method="GET",
+        json=search_and_store_response,
+    )
+    httpx_mock.add_response(
+        url=re.compile(NCBIEndpoint.SUMMARY.full_url() + "?.*"),
+        method="GET",
+        json={"result": {"uids": ["pmc_only"], "pmc_only": {"articleids": TEST_PMC_ARTICLE_IDS}}},
+    )
+
+    term_statistics = {}
+    result = ncbi_search_and_fetch_by_year(
+        ("query",),
+        NCBIDatabase.PMC,
+        [2024, 2025],
+        tmp_path,
+        term_statistics=term_statistics,
+        now=NOW,
+    )
+
+    expected = [{"pmcid": "PMC1", "pmid": "1"}, {"pmcid": "PMC2222222222", "pmid": "111111111"}]
+    assert len(result) == len(expected)
+    assert all(r in expected for r in result)
+    assert httpx_mock.get_requests()[0].url.params["term"] == "(query) AND 2025[PDAT]:2025[PDAT]"
+    assert term_statistics["pmc"]["hemoblast"] == 40
+
+    with cached_year_path(tmp_path, "query", NCBIDatabase.PMC, 2025).open() as reader:
+        assert json.load(reader) == {
+            "cached_at": NOW.isoformat(),
+            "article_ids": [{"pmcid": "PMC2222222222", "pmid": "111111111"}],
+        }